@@ -0,0 +1,562 @@
+import gc
+import heapq
+import json
+import math
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Optional, Union
+
+DEFAULT_LIMIT = 100
+"""The number of documents a search returns if the query has no limit, like Toshi"""
+
+# The BM25 parameters of tantivy
+_K1 = 1.2
+_B = 0.75
+
+# Runs of alphanumeric characters, like tantivy's SimpleTokenizer
+_WORD = re.compile(r"[^\W_]+")
+_MAX_TOKEN_LENGTH = 40
+
+
+class EngineError(Exception):
+    """A request the engine refuses, with the HTTP status Toshi would answer."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class _TextField:
+    """The postings and field lengths of an indexed text field."""
+
+    def __init__(self, tokenizer: str, positions: bool):
+        self.tokenizer = tokenizer
+        self.positions = positions
+        # term -> (doc ids, positions or term frequency per doc)
+        self.postings: dict[str, tuple[array, list]] = {}
+        self.lengths = array("l")
+        self.total_length = 0
+
+    def tokenize(self, value: Any) -> list[str]:
+        if isinstance(value, list):
+            return [t for v in value for t in self.tokenize(v)]
+        text = value if isinstance(value, str) else str(value)
+        if self.tokenizer == "raw":
+            return [text]
+        if self.tokenizer == "whitespace":
+            return text.split()
+        return [t for t in _WORD.findall(text.lower()) if len(t) <= _MAX_TOKEN_LENGTH]
+
+    def add(self, doc_id: int, value: Any):
+        tokens = [] if value is None else self.tokenize(value)
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+
+        occurrences: dict[str, list[int]] = {}
+        for position, token in enumerate(tokens):
+            found = occurrences.get(token)
+            if found is None:
+                occurrences[token] = [position]
+            else:
+                found.append(position)
+
+        postings = self.postings
+        keep_positions = self.positions
+        for term, positions in occurrences.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("l"), [])
+            entry[0].append(doc_id)
+            entry[1].append(tuple(positions) if keep_positions else len(positions))
+
+    def bm25(self, doc_freq: int, num_docs: int):
+        """Returns a function scoring a term frequency in a document."""
+        idf = math.log(1.0 + (num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        average_length = self.total_length / max(len(self.lengths), 1) or 1.0
+        lengths = self.lengths
+
+        def score(doc_id: int, tf: int) -> float:
+            norm = _K1 * (1.0 - _B + _B * lengths[doc_id] / average_length)
+            return idf * tf * (_K1 + 1.0) / (tf + norm)
+
+        return score
+
+    def term_scores(self, term: str, num_docs: int) -> dict[int, float]:
+        entry = self.postings.get(term)
+        if entry is None:
+            return {}
+        doc_ids, occurrences = entry
+        score = self.bm25(len(doc_ids), num_docs)
+        if self.positions:
+            return {d: score(d, len(o)) for d, o in zip(doc_ids, occurrences)}
+        return {d: score(d, tf) for d, tf in zip(doc_ids, occurrences)}
+
+    def matching_terms(self, predicate) -> dict[int, float]:
+        # Automaton queries score every match the same, like tantivy
+        matches: dict[int, float] = {}
+        for term, (doc_ids, _) in self.postings.items():
+            if predicate(term):
+                matches.update(dict.fromkeys(doc_ids, 1.0))
+        return matches
+
+    def phrase_scores(
+        self, terms: list[str], offsets: list[int], num_docs: int
+    ) -> dict[int, float]:
+        if not self.positions:
+            raise EngineError(400, "Phrase queries need a field indexed with positions")
+        entries = [self.postings.get(t) for t in terms]
+        if any(entry is None for entry in entries):
+            return {}
+
+        # Narrow the candidates starting from the rarest term
+        order = sorted(range(len(terms)), key=lambda i: len(entries[i][0]))
+        candidates: Optional[dict[int, list[tuple]]] = None
+        for i in order:
+            doc_ids, positions = entries[i]
+            if candidates is None:
+                candidates = {d: [p] for d, p in zip(doc_ids, positions)}
+                continue
+            narrowed = {}
+            for d, p in zip(doc_ids, positions):
+                found = candidates.get(d)
+                if found is not None:
+                    found.append(p)
+                    narrowed[d] = found
+            candidates = narrowed
+
+        # The positions of every candidate are in the order of `order`
+        relative = [offsets[i] for i in order]
+        idf = sum(
+            math.log(1.0 + (num_docs - len(e[0]) + 0.5) / (len(e[0]) + 0.5))
+            for e in entries
+        )
+        average_length = self.total_length / max(len(self.lengths), 1) or 1.0
+        scores = {}
+        for d, positions in candidates.items():
+            starts = {p - relative[0] for p in positions[0]}
+            for offset, term_positions in zip(relative[1:], positions[1:]):
+                starts &= {p - offset for p in term_positions}
+                if not starts:
+                    break
+            if starts:
+                tf = len(starts)
+                norm = _K1 * (1.0 - _B + _B * self.lengths[d] / average_length)
+                scores[d] = idf * tf * (_K1 + 1.0) / (tf + norm)
+        return scores
+
+
+class _NumericField:
+    """The values of an indexed numeric field, sorted for range lookups."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.values: list = []
+        self._sorted: Optional[tuple[list, array]] = None
+
+    def parse(self, term: Any):
+        """Converts a term, which is a string in term queries, to a field value."""
+        try:
+            if self.kind == "bool":
+                return term if isinstance(term, bool) else str(term).lower() == "true"
+            if self.kind == "f64":
+                return float(term)
+            return int(term)
+        except ValueError:
+            raise EngineError(400, f"Invalid {self.kind} value: {term!r}")
+
+    def add(self, doc_id: int, value: Any):
+        self.values.append(None if value is None else self.parse(value))
+        self._sorted = None
+
+    def range(
+        self, lower: Any, lower_inclusive: bool, upper: Any, upper_inclusive: bool
+    ) -> array:
+        if self._sorted is None:
+            pairs = sorted((v, d) for d, v in enumerate(self.values) if v is not None)
+            self._sorted = ([v for v, _ in pairs], array("l", (d for _, d in pairs)))
+        keys, doc_ids = self._sorted
+        start = 0
+        if lower is not None:
+            start = (bisect_left if lower_inclusive else bisect_right)(keys, lower)
+        stop = len(keys)
+        if upper is not None:
+            stop = (bisect_right if upper_inclusive else bisect_left)(keys, upper)
+        return doc_ids[start:stop]
+
+
+class _FacetField:
+    """The facet paths of a facet field."""
+
+    def __init__(self):
+        self.values: list[Optional[str]] = []
+
+    def add(self, doc_id: int, value: Any):
+        self.values.append(None if value is None else str(value))
+
+    def matching(self, facet: str) -> dict[int, float]:
+        # A facet matches its descendants too
+        prefix = facet.rstrip("/") + "/"
+        return {
+            d: 1.0
+            for d, v in enumerate(self.values)
+            if v is not None and (v == facet or v.startswith(prefix))
+        }
+
+    def counts(self, root: str, doc_ids: Iterable[int]) -> dict[str, int]:
+        """Counts the documents by the child of `root` their facet is under."""
+        prefix = root.rstrip("/") + "/"
+        counts: dict[str, int] = {}
+        for d in doc_ids:
+            value = self.values[d]
+            if value is not None and value.startswith(prefix):
+                child = prefix + value[len(prefix) :].split("/", 1)[0]
+                counts[child] = counts.get(child, 0) + 1
+        return counts
+
+
+class _Index:
+    def __init__(self, name: str, schema: list[dict]):
+        self.name = name
+        self.schema = schema
+        self.text: dict[str, _TextField] = {}
+        self.numeric: dict[str, _NumericField] = {}
+        self.facets: dict[str, _FacetField] = {}
+        self.stored_fields: list[str] = []
+        self.fields: set[str] = set()
+
+        for field in schema:
+            name, kind, options = field["name"], field["type"], field["options"]
+            self.fields.add(name)
+            if options.get("stored"):
+                self.stored_fields.append(name)
+            if kind == "text":
+                indexing = options.get("indexing")
+                if indexing is not None:
+                    self.text[name] = _TextField(
+                        indexing.get("tokenizer") or "default",
+                        indexing.get("record") == "position",
+                    )
+            elif kind in ("i64", "u64", "f64", "bool"):
+                if options.get("indexed"):
+                    self.numeric[name] = _NumericField(kind)
+            elif kind == "facet":
+                self.facets[name] = _FacetField()
+            else:
+                raise EngineError(400, f"Unknown field type: {kind}")
+
+        # Stored fields by doc id, None once deleted
+        self.stored: list[Optional[dict]] = []
+        self.num_deleted = 0
+        # Additions and deletions wait for the next commit, like in Toshi
+        self.pending: list[tuple[str, Any]] = []
+        self.opstamp = 0
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.stored) - self.num_deleted
+
+    def commit(self):
+        # The postings are millions of long-lived containers, which would make the
+        # garbage collector traverse them again and again while they are built
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._apply_pending()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.pending = []
+        self.opstamp += 1
+
+    def _apply_pending(self):
+        for operation, payload in self.pending:
+            if operation == "add":
+                self._add(payload)
+            else:
+                for field_name, term in payload.items():
+                    self._delete(self.term_scores(field_name, term))
+
+    def _add(self, document: dict):
+        doc_id = len(self.stored)
+        for name, field in self.text.items():
+            field.add(doc_id, document.get(name))
+        for name, field in self.numeric.items():
+            field.add(doc_id, document.get(name))
+        for name, field in self.facets.items():
+            field.add(doc_id, document.get(name))
+        self.stored.append(
+            {k: document[k] for k in self.stored_fields if k in document}
+        )
+
+    def _delete(self, matches: dict[int, float]):
+        for d in matches:
+            if self.stored[d] is not None:
+                self.stored[d] = None
+                self.num_deleted += 1
+
+    def evaluate(self, query: Union[dict, str, None]) -> dict[int, float]:
+        """Returns the scores of the live documents matching a query."""
+        matches = self._evaluate(query)
+        if self.num_deleted:
+            stored = self.stored
+            matches = {d: s for d, s in matches.items() if stored[d] is not None}
+        return matches
+
+    def _evaluate(self, query: Union[dict, str, None]) -> dict[int, float]:
+        if query is None or query == "all":
+            return dict.fromkeys(range(len(self.stored)), 1.0)
+        if not isinstance(query, dict) or len(query) != 1:
+            raise EngineError(400, f"Invalid query: {query!r}")
+
+        ((kind, clause),) = query.items()
+        if kind == "bool":
+            return self._bool(clause)
+        if not isinstance(clause, dict) or len(clause) != 1:
+            raise EngineError(400, f"Invalid {kind} query: {clause!r}")
+        ((field_name, value),) = clause.items()
+
+        if kind == "term":
+            return self.term_scores(field_name, value)
+        if kind == "range":
+            return self._range(field_name, value)
+        if kind == "regex":
+            try:
+                pattern = re.compile(value)
+            except re.error as e:
+                raise EngineError(400, f"Invalid regex: {e}")
+            return self._text(field_name).matching_terms(pattern.fullmatch)
+        if kind == "fuzzy":
+            term, distance = value["value"], value["distance"]
+            transposition = value.get("transposition", False)
+            return self._text(field_name).matching_terms(
+                lambda t: _within_distance(term, t, distance, transposition)
+            )
+        if kind == "phrase":
+            terms = value["terms"]
+            offsets = value.get("offsets") or list(range(len(terms)))
+            if len(offsets) != len(terms):
+                raise EngineError(400, "Phrase offsets and terms differ in length")
+            return self._text(field_name).phrase_scores(terms, offsets, self.num_docs)
+        raise EngineError(400, f"Unknown query type: {kind}")
+
+    def term_scores(self, field_name: str, term: Any) -> dict[int, float]:
+        if field_name in self.text:
+            return self.text[field_name].term_scores(str(term), self.num_docs)
+        if field_name in self.numeric:
+            field = self.numeric[field_name]
+            value = field.parse(term)
+            return dict.fromkeys(field.range(value, True, value, True), 1.0)
+        if field_name in self.facets:
+            return self.facets[field_name].matching(str(term))
+        raise self._not_indexed(field_name)
+
+    def _range(self, field_name: str, bounds: dict) -> dict[int, float]:
+        field = self.numeric.get(field_name)
+        if field is None:
+            raise self._not_indexed(field_name)
+        lower, lower_inclusive = bounds.get("gte"), True
+        if "gt" in bounds:
+            lower, lower_inclusive = bounds["gt"], False
+        upper, upper_inclusive = bounds.get("lte"), True
+        if "lt" in bounds:
+            upper, upper_inclusive = bounds["lt"], False
+        lower = None if lower is None else field.parse(lower)
+        upper = None if upper is None else field.parse(upper)
+        doc_ids = field.range(lower, lower_inclusive, upper, upper_inclusive)
+        return dict.fromkeys(doc_ids, 1.0)
+
+    def _bool(self, clause: dict) -> dict[int, float]:
+        must = [self._evaluate(q) for q in clause.get("must", [])]
+        should = [self._evaluate(q) for q in clause.get("should", [])]
+        must_not = [self._evaluate(q) for q in clause.get("must_not", [])]
+
+        if must:
+            must.sort(key=len)
+            scores = dict(must[0])
+            for other in must[1:]:
+                scores = {d: s + other[d] for d, s in scores.items() if d in other}
+            for other in should:
+                for d, s in other.items():
+                    if d in scores:
+                        scores[d] += s
+        elif should:
+            # Without a must clause, a document needs to match one should clause
+            scores = {}
+            for other in should:
+                for d, s in other.items():
+                    scores[d] = scores.get(d, 0.0) + s
+        else:
+            return {}
+
+        for other in must_not:
+            for d in other:
+                scores.pop(d, None)
+        return scores
+
+    def _text(self, field_name: str) -> _TextField:
+        field = self.text.get(field_name)
+        if field is None:
+            raise self._not_indexed(field_name)
+        return field
+
+    def _not_indexed(self, field_name: str) -> EngineError:
+        if field_name not in self.fields:
+            return EngineError(400, f"Unknown field: {field_name}")
+        return EngineError(400, f"Field {field_name} is not indexed")
+
+
+class Engine:
+    """
+    An in-memory search engine with the semantics of Toshi's HTTP API.
+
+    It keeps an inverted index per text field, sorted values per numeric field and
+    paths per facet field, and evaluates term, range, regex, fuzzy, phrase and bool
+    queries with tantivy's BM25 scoring. Like in Toshi, additions and deletions
+    take effect on the next commit. The methods take and return the JSON bodies of
+    the corresponding endpoints, so `make_engine_app` only routes requests.
+
+    Tokenizers other than `raw` and `whitespace` tokenize like `default`, so
+    stemming tokenizers don't stem.
+    """
+
+    def __init__(self):
+        self._indexes: dict[str, _Index] = {}
+
+    def create_index(self, name: str, schema: list[dict]):
+        if name in self._indexes:
+            raise EngineError(400, f"Index {name} already exists")
+        try:
+            self._indexes[name] = _Index(name, schema)
+        except (KeyError, TypeError, AttributeError) as e:
+            raise EngineError(400, f"Invalid schema: {e!r}")
+
+    def list_indexes(self) -> list[str]:
+        return sorted(self._indexes)
+
+    def summary(self, name: str) -> dict:
+        index = self._index(name)
+        schema = json.loads(json.dumps(index.schema))
+        # The options as Toshi reports them
+        for field in schema:
+            if field["type"] == "text":
+                field["options"].setdefault("fast", False)
+            elif field["type"] == "facet":
+                field["options"] = {"stored": field["options"].get("stored", False)}
+        segments = []
+        if index.stored:
+            segments.append(
+                {"max_doc": len(index.stored), "num_deleted_docs": index.num_deleted}
+            )
+        return {
+            "summaries": {
+                "index_settings": {
+                    "docstore_compression": "lz4",
+                    "docstore_blocksize": 16384,
+                },
+                "segments": segments,
+                "schema": schema,
+                "opstamp": index.opstamp,
+            }
+        }
+
+    def add_document(self, name: str, body: dict):
+        index = self._index(name)
+        index.pending.append(("add", body["document"]))
+        if body.get("options", {}).get("commit"):
+            index.commit()
+
+    def bulk_insert(self, name: str, lines: Iterable[Union[str, bytes]]) -> int:
+        """Adds one document per NDJSON line and returns their number."""
+        index = self._index(name)
+        documents = []
+        for line in lines:
+            if line.strip():
+                try:
+                    documents.append(("add", json.loads(line)))
+                except ValueError as e:
+                    raise EngineError(400, f"Invalid document: {e}")
+        index.pending.extend(documents)
+        return len(documents)
+
+    def flush(self, name: str):
+        self._index(name).commit()
+
+    def delete_terms(self, name: str, body: dict) -> dict:
+        """Deletes the documents matching any of the terms on the next commit."""
+        index = self._index(name)
+        terms = body["terms"]
+        affected: set[int] = set()
+        for field_name, term in terms.items():
+            affected.update(index.evaluate({"term": {field_name: term}}))
+        index.pending.append(("delete", terms))
+        if body.get("options", {}).get("commit"):
+            index.commit()
+        return {"docs_affected": len(affected)}
+
+    def search(self, name: str, body: dict) -> dict:
+        index = self._index(name)
+        matches = index.evaluate(body.get("query"))
+        limit = body.get("limit") or DEFAULT_LIMIT
+        top = heapq.nsmallest(limit, matches.items(), key=lambda m: (-m[1], m[0]))
+        # Like Toshi, report the returned documents as hits
+        response = {
+            "hits": len(top),
+            "docs": [{"score": s, "doc": index.stored[d]} for d, s in top],
+        }
+
+        facets = []
+        for field_name, roots in (body.get("facets") or {}).items():
+            field = index.facets.get(field_name)
+            if field is None:
+                raise index._not_indexed(field_name)
+            for root in roots:
+                counts = field.counts(root, matches)
+                facets.extend(
+                    {"field": child, "value": count}
+                    for child, count in sorted(counts.items(), key=lambda c: -c[1])
+                )
+        response["facets"] = facets
+        return response
+
+    def all_documents(self, name: str) -> dict:
+        index = self._index(name)
+        docs = [{"score": 1.0, "doc": doc} for doc in index.stored if doc is not None]
+        return {"hits": len(docs), "docs": docs}
+
+    def _index(self, name: str) -> _Index:
+        index = self._indexes.get(name)
+        if index is None:
+            raise EngineError(404, f"Unknown index: {name}")
+        return index
+
+
+def _within_distance(a: str, b: str, max_distance: int, transposition: bool) -> bool:
+    """Whether the edit distance of two strings is at most `max_distance`."""
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    if a == b:
+        return True
+    # The optimal string alignment distance, row by row with an early exit
+    previous2: Optional[list[int]] = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = ca != cb
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost
+            )
+            if (
+                transposition
+                and previous2 is not None
+                and j > 1
+                and ca == b[j - 2]
+                and a[i - 2] == cb
+            ):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return False
+        previous2, previous = previous, current
+    return previous[-1] <= max_distance
@@ -0,0 +1,285 @@
+"""
+Micro-benchmarks of the CPU-bound hot paths of the clients.
+
+Run them with `python -m benchmarks.micro` from the repository root. The timings are
+compared against the baselines in `benchmarks/baselines.json`, and the command fails
+if a case got slower by more than the threshold. `--update` stores new baselines.
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+from benchmarks.engine import Engine
+from benchmarks.suite import BenchDocument, bench_index, make_documents
+from toshi_client.client import _decode_search_result
+from toshi_client.index.index_summary import IndexSummary
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.phrase_query import PhraseQuery
+from toshi_client.query.range_query import RangeQuery
+from toshi_client.query.term_query import TermQuery
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+DEFAULT_THRESHOLD = 0.2
+"""The relative slowdown beyond which a case counts as a regression"""
+
+
+@dataclass
+class Comparison:
+    name: str
+    baseline_ns: Optional[float]
+    """The baseline time per call, None for cases without a baseline"""
+    current_ns: float
+    change: Optional[float]
+    """The change of the relative time per call, e.g. 0.25 for 25% slower"""
+    regressed: bool
+
+
+def _calibration():
+    # A fixed amount of interpreter work, to factor out the speed of the machine
+    total = 0
+    for i in range(1000):
+        total += i * i
+    return total
+
+
+def cases() -> dict[str, Callable[[], object]]:
+    """Returns the benchmarked calls by name."""
+    bool_query = (
+        BoolQuery()
+        .must_match(TermQuery("lorem", "lyrics"))
+        .must_match(RangeQuery("year", gte=1970, lt=2000))
+        .must_match(PhraseQuery("lyrics", ["lorem", "ipsum"]))
+        .should_match(TermQuery("song", "song"))
+        .must_not_match(TermQuery("dolor", "lyrics"))
+    )
+    range_query = RangeQuery("year", gte=1970, lte=2000, limit=100)
+    facet_query = FacetQuery("genre", [f"/genre/{i}" for i in range(10)])
+
+    documents = make_documents(2, 256)
+    document, other = documents
+    hits = [{"score": 1.0, "doc": d.to_json()} for d in make_documents(100, 256)]
+    response = {"hits": 100, "docs": hits, "facets": []}
+
+    engine = Engine()
+    index = bench_index()
+    engine.create_index(index.name, json.loads(json.dumps(index.to_json())))
+    summary = json.dumps(engine.summary(index.name)["summaries"])
+
+    return {
+        "query.bool_to_json": bool_query.to_json,
+        "query.range_to_json": range_query.to_json,
+        "query.facet_to_json": facet_query.to_json,
+        "decode.search_result_100": lambda: _decode_search_result(
+            response, BenchDocument, False, False
+        ),
+        "decode.search_result_100_scored": lambda: _decode_search_result(
+            response, BenchDocument, True, False
+        ),
+        "document.to_json": document.to_json,
+        "document.eq": lambda: document == other,
+        # from_json consumes its input, so the parsing of the response is included
+        "index_summary.from_json": lambda: IndexSummary.from_json(
+            index.name, json.loads(summary)
+        ),
+    }
+
+
+@dataclass
+class Timing:
+    ns: float
+    """The best time per call in nanoseconds"""
+    relative: float
+    """The best time per call divided by the best time of the calibration call"""
+
+
+def measure(
+    call: Callable[[], object], min_time: float = 0.02, repeat: int = 25
+) -> Timing:
+    """
+    Times a call, alternating with a calibration call.
+
+    Since the batches of both calls alternate, a machine that slows down for a while
+    slows down both, and the relative time stays comparable across runs and
+    machines.
+
+    Parameters
+    ----------
+    call : Callable[[], object]
+        The benchmarked call.
+    min_time : float, default=0.02
+        The minimum number of seconds of one timed batch of calls.
+    repeat : int, default=25
+        The number of timed batches of each call, the fastest of which counts.
+
+    Returns
+    -------
+    Timing
+        The time per call.
+    """
+    timer, calibration = timeit.Timer(call), timeit.Timer(_calibration)
+    number, calibration_number = _batch_size(timer, min_time), _batch_size(
+        calibration, min_time
+    )
+    best, best_calibration = float("inf"), float("inf")
+    for _ in range(repeat):
+        best_calibration = min(
+            best_calibration,
+            calibration.timeit(calibration_number) / calibration_number,
+        )
+        best = min(best, timer.timeit(number) / number)
+    return Timing(ns=best * 1e9, relative=best / best_calibration)
+
+
+def _batch_size(timer: timeit.Timer, min_time: float) -> int:
+    number = 1
+    while (elapsed := timer.timeit(number)) < min_time:
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    return number
+
+
+def run(
+    names: Optional[list[str]] = None, min_time: float = 0.02, repeat: int = 25
+) -> dict[str, Timing]:
+    """
+    Runs the micro-benchmarks.
+
+    Parameters
+    ----------
+    names : list[str], optional
+        Only the cases whose name contains one of these are run, all if not given.
+    min_time : float, default=0.02
+        The minimum number of seconds of one timed batch of calls.
+    repeat : int, default=25
+        The number of timed batches per case.
+
+    Returns
+    -------
+    dict[str, Timing]
+        The timing of every case.
+    """
+    return {
+        name: measure(call, min_time, repeat)
+        for name, call in cases().items()
+        if names is None or any(n in name for n in names)
+    }
+
+
+def compare(
+    results: dict[str, Timing],
+    baselines: dict[str, Timing],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[Comparison]:
+    """
+    Compares the relative times of results of `run` against baselines.
+
+    Parameters
+    ----------
+    results : dict[str, Timing]
+        The results of `run`.
+    baselines : dict[str, Timing]
+        Earlier results of `run`.
+    threshold : float, default=DEFAULT_THRESHOLD
+        The relative slowdown beyond which a case counts as a regression.
+
+    Returns
+    -------
+    list[Comparison]
+        The comparison of every case in the results.
+    """
+    comparisons = []
+    for name, current in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            comparisons.append(Comparison(name, None, current.ns, None, False))
+            continue
+        change = current.relative / baseline.relative - 1.0
+        comparisons.append(
+            Comparison(name, baseline.ns, current.ns, change, change > threshold)
+        )
+    return comparisons
+
+
+def load_baselines(path: str = BASELINES_PATH) -> dict[str, Timing]:
+    """Returns the stored baselines, empty if there are none."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {name: Timing(**timing) for name, timing in json.load(f).items()}
+
+
+def store_baselines(baselines: dict[str, Timing], path: str = BASELINES_PATH):
+    with open(path, "w") as f:
+        json.dump(
+            {name: asdict(timing) for name, timing in sorted(baselines.items())},
+            f,
+            indent=2,
+        )
+        f.write("\n")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Runs the micro-benchmarks and compares them against baselines."
+    )
+    parser.add_argument("names", nargs="*", help="Run the cases containing a name")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-time", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=25)
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="Measure regressed cases again up to this many times",
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="Store the results as the baselines"
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.names or None, args.min_time, args.repeat)
+
+    baselines = load_baselines(args.baselines)
+    if args.update:
+        # Cases that weren't run keep their baselines
+        baselines = {**baselines, **results}
+        store_baselines(baselines, args.baselines)
+
+    # A busy machine makes cases look slower, never faster, so regressed cases are
+    # measured again and their best timing counts
+    for _ in range(args.retries):
+        regressed = [
+            c.name for c in compare(results, baselines, args.threshold) if c.regressed
+        ]
+        if not regressed:
+            break
+        for name, timing in run(regressed, args.min_time, args.repeat).items():
+            if timing.relative < results[name].relative:
+                results[name] = timing
+
+    regressions = 0
+    for c in compare(results, baselines, args.threshold):
+        change = "new" if c.change is None else f"{c.change:+.1%}"
+        flag = "  REGRESSION" if c.regressed else ""
+        print(f"{c.name:<36} {c.current_ns:>12.0f} ns  {change:>8}{flag}")
+        regressions += c.regressed
+
+    if regressions:
+        print(
+            f"{regressions} case(s) slower than the baseline by more than "
+            f"{args.threshold:.0%}",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Optional
+
+from aiohttp import web
+
+from benchmarks.engine import Engine, EngineError
+
+
+class StandInServer:
+    """
+    A local server answering the Toshi HTTP API with canned responses.
+
+    It doesn't index anything, it only answers like Toshi would, so the overhead of
+    the clients can be measured without Docker or network. The server runs in a
+    child process, so it neither competes with the client for the GIL nor shows up
+    in the client's allocations.
+
+    Parameters
+    ----------
+    latency : float, default=0.0
+        Seconds every response is delayed, to simulate the server's work.
+    hits : int, default=10
+        The number of documents in every search response.
+    doc_size : int, default=256
+        The length of the text field of the returned documents.
+    engine : bool, default=False
+        If True, requests are served by an in-memory `Engine`, which indexes the
+        documents and evaluates queries, instead of canned responses.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        hits: int = 10,
+        doc_size: int = 256,
+        engine: bool = False,
+    ):
+        self.latency = latency
+        self.hits = hits
+        self.doc_size = doc_size
+        self.engine = engine
+        self.url = ""
+        self._process: Optional[multiprocessing.Process] = None
+
+    def start(self) -> str:
+        """Starts the server and returns its URL."""
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        self._process = context.Process(
+            target=_serve,
+            args=(sender, self.latency, self.hits, self.doc_size, self.engine),
+            name="toshi-stand-in",
+            daemon=True,
+        )
+        self._process.start()
+        sender.close()
+        port = receiver.recv()
+        receiver.close()
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    def stop(self):
+        """Stops the server."""
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self) -> "StandInServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def make_app(
+    latency: float = 0.0, hits: int = 10, doc_size: int = 256
+) -> web.Application:
+    """
+    Builds the application of the stand-in server.
+
+    Parameters
+    ----------
+    latency : float, default=0.0
+        Seconds every response is delayed.
+    hits : int, default=10
+        The number of documents in every search response.
+    doc_size : int, default=256
+        The length of the text field of the returned documents.
+
+    Returns
+    -------
+    web.Application
+        The application, e.g. to be served by an `aiohttp.web.AppRunner`.
+    """
+    doc = {"idx": 1, "year": 2000, "lyrics": "x" * doc_size, "song": "song"}
+    search_body = json.dumps(
+        {
+            "hits": hits,
+            "docs": [{"score": 1.0, "doc": doc} for _ in range(hits)],
+            "facets": [],
+        }
+    ).encode()
+
+    def respond(status: int = 200, body: Optional[bytes] = None):
+        async def handler(request: web.Request) -> web.Response:
+            # The body is read like Toshi would, so uploads take their time
+            await request.read()
+            if latency:
+                await asyncio.sleep(latency)
+            return web.Response(
+                status=status, body=body, content_type="application/json"
+            )
+
+        return handler
+
+    app = web.Application(client_max_size=1024**3)
+    app.router.add_get("/_list/", respond(body=b'["bench"]'))
+    app.router.add_put("/{index}/_create", respond(201))
+    app.router.add_get(
+        "/{index}/_summary", respond(body=b'{"summaries": {"segments": []}}')
+    )
+    app.router.add_get("/{index}/_flush/", respond())
+    app.router.add_post("/{index}/_bulk", respond(201))
+    app.router.add_post("/{index}/", respond(body=search_body))
+    app.router.add_put("/{index}/", respond(201))
+    app.router.add_delete("/{index}/", respond(body=b'{"docs_affected": 0}'))
+    return app
+
+
+def make_engine_app(engine: Engine, latency: float = 0.0) -> web.Application:
+    """
+    Builds an application serving the Toshi HTTP API from an engine.
+
+    Parameters
+    ----------
+    engine : Engine
+        The engine holding the indexes.
+    latency : float, default=0.0
+        Seconds every response is delayed, on top of the engine's work.
+
+    Returns
+    -------
+    web.Application
+        The application, e.g. to be served by an `aiohttp.web.AppRunner`.
+    """
+
+    def respond(call, status: int = 200):
+        async def handler(request: web.Request) -> web.Response:
+            body = await request.read()
+            if latency:
+                await asyncio.sleep(latency)
+            try:
+                result = call(request.match_info.get("index"), body)
+            except EngineError as e:
+                return web.json_response({"message": e.message}, status=e.status)
+            except (ValueError, KeyError) as e:
+                return web.json_response(
+                    {"message": f"Invalid request: {e!r}"}, status=400
+                )
+            if result is None:
+                return web.Response(status=status)
+            return web.json_response(result, status=status)
+
+        return handler
+
+    app = web.Application(client_max_size=1024**3)
+    app.router.add_get("/_list/", respond(lambda _, __: engine.list_indexes()))
+    app.router.add_put(
+        "/{index}/_create",
+        respond(lambda name, body: engine.create_index(name, json.loads(body)), 201),
+    )
+    app.router.add_get(
+        "/{index}/_summary", respond(lambda name, _: engine.summary(name))
+    )
+    app.router.add_get("/{index}/_flush/", respond(lambda name, _: engine.flush(name)))
+    app.router.add_post(
+        "/{index}/_bulk",
+        respond(lambda name, body: engine.bulk_insert(name, body.splitlines()), 201),
+    )
+    app.router.add_get("/{index}/", respond(lambda name, _: engine.all_documents(name)))
+    app.router.add_post(
+        "/{index}/", respond(lambda name, body: engine.search(name, json.loads(body)))
+    )
+    app.router.add_put(
+        "/{index}/",
+        respond(lambda name, body: engine.add_document(name, json.loads(body)), 201),
+    )
+    app.router.add_delete(
+        "/{index}/",
+        respond(lambda name, body: engine.delete_terms(name, json.loads(body))),
+    )
+    return app
+
+
+def _serve(sender: Connection, latency: float, hits: int, doc_size: int, engine: bool):
+    async def run():
+        if engine:
+            app = make_engine_app(Engine(), latency)
+        else:
+            app = make_app(latency, hits, doc_size)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        sender.send(runner.addresses[0][1])
+        sender.close()
+        # Runs until the process is terminated
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
@@ -0,0 +1,338 @@
+"""
+Benchmarks the clients against a local stand-in server.
+
+Run it with `python -m benchmarks.suite --output results.json` from the repository
+root. See `python -m benchmarks.suite --help` for the workload options.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+from benchmarks.stand_in_server import StandInServer
+from toshi_client.client import AsyncToshiClient, ToshiClient
+from toshi_client.index.field_options import TextOptionIndexing
+from toshi_client.index.index import Index
+from toshi_client.index.index_builder import IndexBuilder
+from toshi_client.models.document import Document
+from toshi_client.query.term_query import TermQuery
+
+
+class BenchDocument(Document):
+    @staticmethod
+    def index_name() -> str:
+        return "bench"
+
+    def __init__(self, idx: int, year: int, lyrics: str, song: str):
+        self.idx = idx
+        self.year = year
+        self.lyrics = lyrics
+        self.song = song
+
+
+def bench_index() -> Index:
+    """Returns the schema of the `BenchDocument` index."""
+    builder = IndexBuilder()
+    builder.add_u64_field(name="idx", stored=True, indexed=True)
+    builder.add_i64_field(name="year", stored=True, indexed=True)
+    builder.add_text_field(name="lyrics", stored=True, indexing=TextOptionIndexing())
+    builder.add_text_field(name="song", stored=True, indexing=TextOptionIndexing())
+    return builder.build(BenchDocument.index_name())
+
+
+def make_documents(num_docs: int, doc_size: int) -> list[BenchDocument]:
+    """Returns documents whose text field has `doc_size` characters."""
+    text = ("lorem ipsum " * (doc_size // 12 + 1))[:doc_size]
+    return [
+        BenchDocument(idx=i, year=1970 + i % 50, lyrics=text, song=f"song {i}")
+        for i in range(num_docs)
+    ]
+
+
+def percentiles(latencies: list[float]) -> dict[str, float]:
+    """Returns the mean, p50, p95, p99 and max of latencies in seconds."""
+    if not latencies:
+        return dict(mean=0.0, p50=0.0, p95=0.0, p99=0.0, max=0.0)
+    ordered = sorted(latencies)
+
+    def at(q: float) -> float:
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    return dict(
+        mean=sum(ordered) / len(ordered),
+        p50=at(0.5),
+        p95=at(0.95),
+        p99=at(0.99),
+        max=ordered[-1],
+    )
+
+
+def allocated_bytes(call: Callable[[], None], repeat: int) -> float:
+    """
+    Returns the mean peak of memory allocated by one call, in bytes.
+
+    Python doesn't count allocations, so tracemalloc's peak of traced memory above
+    the memory traced before the call stands in for them. Tracing slows the calls
+    down a lot, which is why it is measured apart from the timings.
+    """
+    tracemalloc.start()
+    try:
+        call()  # warms up caches and connection pools
+        total = 0
+        for _ in range(repeat):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            call()
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - before
+    finally:
+        tracemalloc.stop()
+    return total / repeat
+
+
+def bench_sync(
+    url: str,
+    documents: list[BenchDocument],
+    chunk_size: Optional[int],
+    hits: int,
+    searches: int,
+    alloc_repeat: int,
+) -> dict:
+    """Benchmarks `bulk_insert_documents` and `search` of `ToshiClient`."""
+    client = ToshiClient(url)
+    query = TermQuery("lorem", "lyrics", limit=hits)
+
+    def bulk():
+        client.bulk_insert_documents(documents, chunk_size=chunk_size)
+
+    def search():
+        client.search(query, BenchDocument)
+
+    bulk()
+    started = time.perf_counter()
+    bulk()
+    bulk_seconds = time.perf_counter() - started
+
+    search()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(searches):
+        t = time.perf_counter()
+        search()
+        latencies.append(time.perf_counter() - t)
+    search_seconds = time.perf_counter() - started
+
+    return dict(
+        bulk_insert_documents=dict(
+            seconds=bulk_seconds,
+            docs_per_sec=len(documents) / bulk_seconds,
+            alloc_bytes_per_request=allocated_bytes(bulk, alloc_repeat),
+        ),
+        search=dict(
+            requests_per_sec=searches / search_seconds,
+            alloc_bytes_per_request=allocated_bytes(search, alloc_repeat),
+            **percentiles(latencies),
+        ),
+    )
+
+
+def bench_async(
+    url: str,
+    documents: list[BenchDocument],
+    chunk_size: Optional[int],
+    hits: int,
+    searches: int,
+    concurrency: int,
+    alloc_repeat: int,
+) -> dict:
+    """Benchmarks `bulk_insert_documents` and `search` of `AsyncToshiClient`."""
+    client = AsyncToshiClient(url)
+    query = TermQuery("lorem", "lyrics", limit=hits)
+
+    async def bulk():
+        await client.bulk_insert_documents(documents, chunk_size=chunk_size)
+
+    async def search():
+        await client.search(query, BenchDocument)
+
+    async def timed_searches(count: int, latencies: list[float]):
+        for _ in range(count):
+            t = time.perf_counter()
+            await search()
+            latencies.append(time.perf_counter() - t)
+
+    async def run() -> dict:
+        await bulk()
+        started = time.perf_counter()
+        await bulk()
+        bulk_seconds = time.perf_counter() - started
+
+        await search()
+        latencies = []
+        per_task, rest = divmod(searches, concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(
+            *[
+                timed_searches(per_task + (i < rest), latencies)
+                for i in range(concurrency)
+            ]
+        )
+        search_seconds = time.perf_counter() - started
+        return dict(
+            bulk_insert_documents=dict(
+                seconds=bulk_seconds, docs_per_sec=len(documents) / bulk_seconds
+            ),
+            search=dict(
+                requests_per_sec=searches / search_seconds, **percentiles(latencies)
+            ),
+        )
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(run())
+        results["bulk_insert_documents"]["alloc_bytes_per_request"] = allocated_bytes(
+            lambda: loop.run_until_complete(bulk()), alloc_repeat
+        )
+        results["search"]["alloc_bytes_per_request"] = allocated_bytes(
+            lambda: loop.run_until_complete(search()), alloc_repeat
+        )
+    finally:
+        loop.close()
+    return results
+
+
+def run(
+    latency: float = 0.0,
+    num_docs: int = 10000,
+    doc_size: int = 256,
+    hits: int = 10,
+    chunk_size: Optional[int] = None,
+    searches: int = 1000,
+    concurrency: int = 8,
+    alloc_repeat: int = 20,
+    engine: bool = False,
+) -> dict:
+    """
+    Runs the benchmarks of both clients against a fresh stand-in server.
+
+    Parameters
+    ----------
+    latency : float, default=0.0
+        Seconds the server delays every response.
+    num_docs : int, default=10000
+        The number of documents per `bulk_insert_documents` call.
+    doc_size : int, default=256
+        The length of the text field of inserted and returned documents.
+    hits : int, default=10
+        The number of documents in every search response, the limit of the searches
+        when run against the engine.
+    chunk_size : int, optional
+        The number of documents per `_bulk` request, all in one if not given.
+    searches : int, default=1000
+        The number of timed searches per client.
+    concurrency : int, default=8
+        The number of concurrent searches of the async client.
+    alloc_repeat : int, default=20
+        The number of calls the allocations are averaged over.
+    engine : bool, default=False
+        If True, the server indexes the documents with an in-memory `Engine` and
+        evaluates the searches, instead of answering with canned responses. The
+        documents are inserted and committed once before the benchmarks.
+
+    Returns
+    -------
+    dict
+        The configuration, environment and results, ready to be dumped as JSON.
+    """
+    config = dict(
+        latency=latency,
+        num_docs=num_docs,
+        doc_size=doc_size,
+        hits=hits,
+        chunk_size=chunk_size,
+        searches=searches,
+        concurrency=concurrency,
+        alloc_repeat=alloc_repeat,
+        engine=engine,
+    )
+    documents = make_documents(num_docs, doc_size)
+    with StandInServer(
+        latency=latency, hits=hits, doc_size=doc_size, engine=engine
+    ) as server:
+        if engine:
+            client = ToshiClient(server.url)
+            client.create_index(bench_index())
+            client.bulk_insert_documents(documents, commit=True)
+        results = {
+            "sync": bench_sync(
+                server.url, documents, chunk_size, hits, searches, alloc_repeat
+            ),
+            "async": bench_async(
+                server.url,
+                documents,
+                chunk_size,
+                hits,
+                searches,
+                concurrency,
+                alloc_repeat,
+            ),
+        }
+    return dict(
+        config=config,
+        environment=dict(
+            python=sys.version.split()[0],
+            implementation=platform.python_implementation(),
+            platform=platform.platform(),
+        ),
+        results=results,
+    )
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the Toshi clients against a local stand-in server."
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--doc-size", type=int, default=256)
+    parser.add_argument("--hits", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--searches", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--alloc-repeat", type=int, default=20)
+    parser.add_argument(
+        "--engine",
+        action="store_true",
+        help="Index the documents and evaluate searches instead of canned responses",
+    )
+    parser.add_argument(
+        "--output", help="The file to write the JSON results to, stdout if not given"
+    )
+    args = parser.parse_args(argv)
+
+    report = run(
+        latency=args.latency,
+        num_docs=args.docs,
+        doc_size=args.doc_size,
+        hits=args.hits,
+        chunk_size=args.chunk_size,
+        searches=args.searches,
+        concurrency=args.concurrency,
+        alloc_repeat=args.alloc_repeat,
+        engine=args.engine,
+    )
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
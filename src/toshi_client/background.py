@@ -0,0 +1,142 @@
+import asyncio
+import functools
+import threading
+from typing import Any, Coroutine, Iterator
+
+import aiohttp
+
+from toshi_client.client import AsyncToshiClient
+from toshi_client.errors import ToshiClientError
+from toshi_client.models.document import Document
+
+
+def _blocking(name: str):
+    """Wraps the `AsyncToshiClient` method `name` in a method waiting for its result."""
+    method = getattr(AsyncToshiClient, name)
+
+    @functools.wraps(method)
+    def call(self: "BackgroundToshiClient", *args: Any, **kwargs: Any):
+        return self._run(method(self.client, *args, **kwargs))
+
+    return call
+
+
+class BackgroundToshiClient:
+    """
+    A blocking client running an `AsyncToshiClient` on a background event loop.
+
+    The calls of all threads run on one event loop thread and share its connection
+    pool. Fan-out calls like `msearch`, `mget` or chunked bulk inserts send their
+    requests concurrently, and identical searches running at the same time share one
+    request. The methods take the parameters of the `AsyncToshiClient` methods of the
+    same names and block until the call completes.
+
+    Parameters
+    ----------
+    url : str
+        The base URL of the Toshi search server.
+    max_connections : int, default=100
+        The maximum number of open connections to the server.
+    **options
+        The further keyword arguments of `AsyncToshiClient`, e.g. a `cache` or
+        `metrics`. `single_flight` defaults to True.
+    """
+
+    def __init__(self, url: str, max_connections: int = 100, **options: Any):
+        options.setdefault("single_flight", True)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="toshi-background-client", daemon=True
+        )
+        self._thread.start()
+        self._closed = False
+        # The session belongs to the event loop, so it is opened there
+        self._session = self._run(_open_session(max_connections))
+        self.client = AsyncToshiClient(url, session=self._session, **options)
+        """The client running on the event loop"""
+
+    create_index = _blocking("create_index")
+    get_index_summary = _blocking("get_index_summary")
+    add_document = _blocking("add_document")
+    bulk_insert_documents = _blocking("bulk_insert_documents")
+    bulk_insert_columns = _blocking("bulk_insert_columns")
+    bulk_load = _blocking("bulk_load")
+    get_documents = _blocking("get_documents")
+    delete_term = _blocking("delete_term")
+    delete_terms = _blocking("delete_terms")
+    list_indexes = _blocking("list_indexes")
+    flush = _blocking("flush")
+    search = _blocking("search")
+    federated_search = _blocking("federated_search")
+    mget = _blocking("mget")
+    msearch = _blocking("msearch")
+
+    def iter_search(self, *args: Any, **kwargs: Any) -> Iterator[Document]:
+        """
+        Iterates over all documents matching a query, page by page.
+
+        Takes the parameters of `AsyncToshiClient.iter_search`. The documents are
+        handed over from the event loop in batches, the next page is prefetched
+        while a batch is consumed.
+
+        Yields
+        ------
+        Document
+            The documents matching the query.
+        """
+        pages = self.client.iter_search(*args, **kwargs)
+        try:
+            while True:
+                batch = self._run(_next_batch(pages, 1000))
+                yield from batch
+                if len(batch) < 1000:
+                    return
+        finally:
+            if not self._closed:
+                self._run(pages.aclose())
+
+    def close(self):
+        """Closes the client and its connections and stops the event loop thread."""
+        if self._closed:
+            return
+        self._run(self.client.close())
+        self._run(self._session.close())
+        self._closed = True
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self) -> "BackgroundToshiClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self, call: Coroutine):
+        if self._closed:
+            call.close()
+            raise ToshiClientError("The client is closed")
+        if threading.current_thread() is self._thread:
+            call.close()
+            # Waiting on the event loop thread would wait for itself forever
+            raise RuntimeError("Blocking calls can't be made from the event loop")
+        future = asyncio.run_coroutine_threadsafe(call, self._loop)
+        try:
+            return future.result()
+        except BaseException:
+            # E.g. a KeyboardInterrupt of the waiting thread cancels the call
+            future.cancel()
+            raise
+
+
+async def _open_session(max_connections: int) -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max_connections))
+
+
+async def _next_batch(items, size: int) -> list:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            break
+    return batch
@@ -0,0 +1,405 @@
+"""
+The `toshi-bench` load generator, which replays a recorded log against a server.
+
+The log holds one JSON object per line, each one request:
+
+    {"op": "search", "index": "lyrics", "body": {"query": {...}, "limit": 10}}
+    {"op": "add", "index": "lyrics", "document": {...}}
+    {"op": "bulk", "index": "lyrics", "documents": [{...}, ...]}
+    {"op": "delete", "index": "lyrics", "terms": {"artist": "nirvana"}}
+    {"op": "flush", "index": "lyrics"}
+
+The `body` of a search is the JSON the clients send, facets included.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Optional, Type
+
+import aiohttp
+
+from toshi_client.client import AsyncToshiClient
+from toshi_client.models.document import Document
+from toshi_client.models.query import Query
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.term_query import TermQuery
+
+OPERATIONS = ("search", "add", "bulk", "delete", "flush")
+
+
+@dataclass
+class Operation:
+    kind: str
+    """One of `OPERATIONS`"""
+    index_name: str
+    record: dict
+    """The record of the log"""
+
+
+@dataclass
+class Sample:
+    kind: str
+    latency: float
+    """The seconds from when the request was due until it completed"""
+    service_time: float
+    """The seconds from when the request was sent until it completed"""
+    ok: bool
+
+
+@dataclass
+class LatencyReport:
+    operation: str
+    count: int
+    errors: int
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+    p999: float
+    max: float
+
+
+class _RecordedQuery(Query):
+    """A query replaying the recorded JSON of a search."""
+
+    def __init__(self, body: dict):
+        super().__init__(field_name=None, limit=body.get("limit"))
+        self._body = {k: v for k, v in body.items() if k != "facets"}
+
+    def to_json(self) -> dict:
+        return dict(self._body)
+
+
+class _RecordedDocument(Document):
+    """A document with the fields of a record."""
+
+    def __init__(self, **fields: Any):
+        self.__dict__.update(fields)
+
+
+@functools.lru_cache(maxsize=None)
+def _document_type(index_name: str) -> Type[_RecordedDocument]:
+    """Returns the type of the recorded documents of an index."""
+    return type(
+        "_RecordedDocument",
+        (_RecordedDocument,),
+        {"index_name": staticmethod(lambda: index_name)},
+    )
+
+
+def read_log(path: str) -> list[Operation]:
+    """
+    Reads a recorded log.
+
+    Parameters
+    ----------
+    path : str
+        The NDJSON file, one request per line.
+
+    Returns
+    -------
+    list[Operation]
+        The requests in the order of the log.
+
+    Raises
+    ------
+    ValueError
+        If a line isn't a valid record.
+    """
+    operations = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind, index_name = record["op"], record["index"]
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"Invalid record on line {number}: {e!r}")
+            if kind not in OPERATIONS:
+                raise ValueError(f"Unknown operation {kind!r} on line {number}")
+            operations.append(Operation(kind, index_name, record))
+    return operations
+
+
+async def execute(client: AsyncToshiClient, operation: Operation):
+    """Sends one recorded request with the client."""
+    record, index_name = operation.record, operation.index_name
+    document_type = _document_type(index_name)
+    if operation.kind == "search":
+        body = record["body"]
+        facet_query = [
+            FacetQuery(name, paths) for name, paths in body.get("facets", {}).items()
+        ]
+        await client.search(
+            _RecordedQuery(body),
+            document_type,
+            facet_query=facet_query or None,
+            index_name=index_name,
+        )
+    elif operation.kind == "add":
+        await client.add_document(
+            document_type(**record["document"]), index_name=index_name
+        )
+    elif operation.kind == "bulk":
+        documents = [document_type(**d) for d in record["documents"]]
+        await client.bulk_insert_documents(documents, index_name=index_name)
+    elif operation.kind == "delete":
+        term_queries = [TermQuery(t, f) for f, t in record["terms"].items()]
+        await client.delete_term(term_queries, index_name)
+    else:
+        await client.flush(index_name)
+
+
+async def run_open_loop(
+    client: AsyncToshiClient,
+    operations: list[Operation],
+    rate: float,
+    max_in_flight: int = 1024,
+) -> list[Sample]:
+    """
+    Sends the requests at a fixed rate, whether earlier requests completed or not.
+
+    The latency of a request is measured from when it was due by the schedule, not
+    from when it was sent. A request delayed by a slow server, a full in-flight limit
+    or a busy event loop thus counts the delay, instead of the delay going unnoticed
+    as coordinated omission.
+
+    Parameters
+    ----------
+    client : AsyncToshiClient
+        The client sending the requests.
+    operations : list[Operation]
+        The requests.
+    rate : float
+        The requests per second.
+    max_in_flight : int, default=1024
+        The maximum number of requests waiting for a response.
+
+    Returns
+    -------
+    list[Sample]
+        The samples in the order the requests completed.
+    """
+    samples: list[Sample] = []
+    semaphore = asyncio.Semaphore(max_in_flight)
+    started = time.perf_counter()
+    tasks = []
+    for i, operation in enumerate(operations):
+        due = started + i / rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(
+            asyncio.create_task(_send(client, operation, due, semaphore, samples))
+        )
+    await asyncio.gather(*tasks)
+    return samples
+
+
+async def run_closed_loop(
+    client: AsyncToshiClient, operations: list[Operation], concurrency: int
+) -> list[Sample]:
+    """
+    Sends the requests from workers, each waiting for its response before sending
+    the next request.
+
+    A slow response holds back the requests of its worker, so the latency is the
+    service time, and the load adapts to the server.
+
+    Parameters
+    ----------
+    client : AsyncToshiClient
+        The client sending the requests.
+    operations : list[Operation]
+        The requests.
+    concurrency : int
+        The number of workers.
+
+    Returns
+    -------
+    list[Sample]
+        The samples in the order the requests completed.
+    """
+    samples: list[Sample] = []
+    pending = iter(operations)
+
+    async def worker():
+        for operation in pending:
+            await _send(client, operation, time.perf_counter(), None, samples)
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return samples
+
+
+async def _send(
+    client: AsyncToshiClient,
+    operation: Operation,
+    due: float,
+    semaphore: Optional[asyncio.Semaphore],
+    samples: list[Sample],
+):
+    if semaphore is not None:
+        await semaphore.acquire()
+    sent = time.perf_counter()
+    ok = True
+    try:
+        await execute(client, operation)
+    except Exception:
+        ok = False
+    finally:
+        if semaphore is not None:
+            semaphore.release()
+    completed = time.perf_counter()
+    samples.append(Sample(operation.kind, completed - due, completed - sent, ok))
+
+
+def latency_report(operation: str, samples: list[Sample]) -> LatencyReport:
+    """Summarizes the latencies of samples."""
+    latencies = sorted(s.latency for s in samples)
+
+    def at(q: float) -> float:
+        if not latencies:
+            return 0.0
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+    return LatencyReport(
+        operation=operation,
+        count=len(samples),
+        errors=sum(not s.ok for s in samples),
+        mean=sum(latencies) / len(latencies) if latencies else 0.0,
+        p50=at(0.5),
+        p90=at(0.9),
+        p99=at(0.99),
+        p999=at(0.999),
+        max=latencies[-1] if latencies else 0.0,
+    )
+
+
+async def replay(
+    url: str,
+    operations: list[Operation],
+    mode: str = "closed",
+    rate: float = 100.0,
+    concurrency: int = 8,
+    max_in_flight: int = 1024,
+) -> dict:
+    """
+    Replays requests against a server and reports their latencies.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the server.
+    operations : list[Operation]
+        The requests.
+    mode : str, default="closed"
+        `open` for a fixed arrival rate, `closed` for a fixed number of workers.
+    rate : float, default=100.0
+        The requests per second in open mode.
+    concurrency : int, default=8
+        The number of workers in closed mode.
+    max_in_flight : int, default=1024
+        The maximum number of requests waiting for a response in open mode.
+
+    Returns
+    -------
+    dict
+        The run settings, the throughput and a `LatencyReport` per operation and
+        over all requests.
+    """
+    connector = aiohttp.TCPConnector(limit=max(concurrency, max_in_flight))
+    # All requests share one session, and so its connection pool
+    async with aiohttp.ClientSession(connector=connector) as session:
+        client = AsyncToshiClient(url, session=session)
+        started = time.perf_counter()
+        if mode == "open":
+            samples = await run_open_loop(client, operations, rate, max_in_flight)
+        elif mode == "closed":
+            samples = await run_closed_loop(client, operations, concurrency)
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+        elapsed = time.perf_counter() - started
+
+    by_kind: dict[str, list[Sample]] = {}
+    for s in samples:
+        by_kind.setdefault(s.kind, []).append(s)
+    return {
+        "mode": mode,
+        "rate": rate if mode == "open" else None,
+        "concurrency": concurrency if mode == "closed" else None,
+        "requests": len(samples),
+        "seconds": elapsed,
+        "throughput": len(samples) / elapsed if elapsed else 0.0,
+        "latency": asdict(latency_report("all", samples)),
+        "service_time": asdict(
+            latency_report(
+                "all", [Sample(s.kind, s.service_time, 0.0, s.ok) for s in samples]
+            )
+        ),
+        "operations": {
+            kind: asdict(latency_report(kind, kind_samples))
+            for kind, kind_samples in sorted(by_kind.items())
+        },
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="toshi-bench",
+        description="Replays a recorded NDJSON log of requests against a Toshi server.",
+    )
+    parser.add_argument("log", help="The NDJSON log to replay")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument(
+        "--mode",
+        choices=("open", "closed"),
+        default="closed",
+        help="open sends at a fixed rate, closed from a fixed number of workers",
+    )
+    parser.add_argument("--rate", type=float, default=100.0, help="Requests/s (open)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Workers (closed)")
+    parser.add_argument("--max-in-flight", type=int, default=1024)
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Replay the log this many times"
+    )
+    parser.add_argument("--output", help="The file to write the JSON report to")
+    args = parser.parse_args(argv)
+
+    operations = read_log(args.log) * args.repeat
+    report = asyncio.run(
+        replay(
+            args.url,
+            operations,
+            mode=args.mode,
+            rate=args.rate,
+            concurrency=args.concurrency,
+            max_in_flight=args.max_in_flight,
+        )
+    )
+
+    print(
+        f"{report['requests']} requests in {report['seconds']:.2f}s "
+        f"({report['throughput']:.1f}/s)"
+    )
+    print(
+        f"{'operation':<10} {'count':>8} {'errors':>7} "
+        + " ".join(f"{p:>9}" for p in ("p50", "p90", "p99", "p99.9", "max"))
+    )
+    for r in [report["latency"], *report["operations"].values()]:
+        print(
+            f"{r['operation']:<10} {r['count']:>8} {r['errors']:>7} "
+            + " ".join(
+                f"{r[p] * 1000:>7.2f}ms" for p in ("p50", "p90", "p99", "p999", "max")
+            )
+        )
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    return 1 if report["latency"]["errors"] else 0
@@ -0,0 +1,231 @@
+import asyncio
+import json
+from collections import deque
+from concurrent.futures import Executor, Future
+from itertools import islice
+from json.encoder import encode_basestring_ascii
+from typing import AsyncIterator, Iterable, Iterator, Optional, Sequence
+
+from toshi_client.index.enums import IndexFieldTypes
+from toshi_client.index.index import Index
+from toshi_client.models.document import Document
+
+_BOOLS = {True: "true", False: "false"}
+
+
+def column_length(columns: dict[str, Sequence]) -> int:
+    """
+    Returns the number of rows of equally long columns.
+
+    Raises
+    ------
+    ValueError
+        If the columns differ in length.
+    """
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("All columns must have the same length.")
+    return lengths.pop() if lengths else 0
+
+
+def ndjson_lines(
+    index: Index,
+    columns: dict[str, Sequence],
+    num_rows: int,
+    skip: Optional[set[int]] = None,
+) -> Iterator[str]:
+    """
+    Formats columns as the lines of a `_bulk` body, one JSON document per row.
+
+    Every column is encoded at once with the formatter of its field type, the rows
+    are only joined from the encoded columns. No object is built per row.
+
+    Parameters
+    ----------
+    index : Index
+        The schema of the written index. Columns of other fields are rejected.
+    columns : dict[str, Sequence]
+        The values per field name, as lists or NumPy arrays. `None` marks a missing
+        value, which is left out of the document.
+    num_rows : int
+        The number of rows.
+    skip : set[int], optional
+        Rows to leave out, e.g. the ones rejected by a `DocumentValidator`.
+
+    Yields
+    ------
+    str
+        The JSON document of a row.
+    """
+    fields = {f.name: f for f in index.fields}
+    for name in columns:
+        if name not in fields:
+            raise ValueError(f"The column {name} is not part of index {index.name}.")
+
+    if skip:
+        # Skipped rows may hold values of the wrong type, which can't be encoded
+        kept = [i for i in range(num_rows) if i not in skip]
+        columns = {name: _take(values, kept) for name, values in columns.items()}
+        num_rows = len(kept)
+
+    encoded = [
+        _encode_column(name, fields[name].type, values)
+        for name, values in columns.items()
+    ]
+    if not encoded:
+        rows = iter([()] * num_rows)
+    else:
+        rows = zip(*encoded)
+
+    for parts in rows:
+        yield "{" + ",".join(filter(None, parts)) + "}"
+
+
+def ndjson_chunks(lines: Iterable[str], chunk_size: Optional[int]) -> Iterator[str]:
+    """
+    Groups NDJSON lines into `_bulk` bodies.
+
+    Parameters
+    ----------
+    lines : Iterable[str]
+        The JSON documents, consumed lazily.
+    chunk_size : int, optional
+        The number of documents per body. All documents go into one body if not
+        given.
+
+    Yields
+    ------
+    str
+        The body of one `_bulk` request.
+
+    Raises
+    ------
+    ValueError
+        If `chunk_size` is less than 1.
+    """
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield "\n".join(chunk)
+
+
+def _encode_column(
+    name: str, field_type: IndexFieldTypes, values: Sequence
+) -> list[str]:
+    if hasattr(values, "tolist"):
+        # NumPy arrays hand out their values as Python scalars in one C call
+        values = values.tolist()
+    prefix = f"{encode_basestring_ascii(name)}:"
+
+    types = set(map(type, values))
+    if type(None) in types or list in types:
+        return ["" if v is None else prefix + json.dumps(v) for v in values]
+
+    if field_type in (IndexFieldTypes.TEXT, IndexFieldTypes.FACET) and types == {str}:
+        encoded = map(encode_basestring_ascii, values)
+    elif field_type == IndexFieldTypes.BOOL and types == {bool}:
+        encoded = map(_BOOLS.__getitem__, values)
+    elif field_type in (
+        IndexFieldTypes.TEXT,
+        IndexFieldTypes.FACET,
+        IndexFieldTypes.BOOL,
+    ):
+        # Unvalidated columns of mixed types are encoded like documents would be
+        encoded = map(json.dumps, values)
+    elif field_type == IndexFieldTypes.F64:
+        encoded = map(repr, values)
+    else:
+        encoded = map(str, values)
+    return [prefix + v for v in encoded]
+
+
+def _take(values: Sequence, rows: list[int]) -> Sequence:
+    if hasattr(values, "take"):
+        # NumPy arrays pick the rows in one C call
+        return values.take(rows)
+    return [values[i] for i in rows]
+
+
+def serialize_documents(documents: list[Document]) -> bytes:
+    """
+    Encodes documents as a `_bulk` body.
+
+    This is a module level function, so it can run in a `ProcessPoolExecutor`.
+    """
+    return "\n".join([json.dumps(doc.to_json()) for doc in documents]).encode()
+
+
+def serialize_in_pool(
+    executor: Executor, documents: Iterable[Document], chunk_size: int, max_pending: int
+) -> Iterator[bytes]:
+    """
+    Encodes documents as `_bulk` bodies in an executor, ahead of the consumer.
+
+    Up to `max_pending` chunks are encoded while the caller sends the previous
+    ones. The bodies are yielded in the order of the documents.
+
+    Parameters
+    ----------
+    executor : Executor
+        The executor encoding the chunks, usually a `ProcessPoolExecutor`.
+    documents : Iterable[Document]
+        The documents, consumed lazily. They must be picklable for a process pool.
+    chunk_size : int
+        The number of documents per body.
+    max_pending : int
+        The number of chunks submitted ahead of the consumer.
+
+    Yields
+    ------
+    bytes
+        The body of one `_bulk` request.
+    """
+    documents = iter(documents)
+    pending: deque[Future] = deque()
+    try:
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(islice(documents, chunk_size))
+                if not chunk:
+                    break
+                pending.append(executor.submit(serialize_documents, chunk))
+            if not pending:
+                return
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def aserialize_in_pool(
+    executor: Executor, documents: Iterable[Document], chunk_size: int, max_pending: int
+) -> AsyncIterator[bytes]:
+    """
+    Encodes documents as `_bulk` bodies in an executor, ahead of the consumer.
+
+    The asynchronous version of `serialize_in_pool`, which doesn't block the event
+    loop while waiting for a chunk.
+    """
+    loop = asyncio.get_running_loop()
+    documents = iter(documents)
+    pending: deque[asyncio.Future] = deque()
+    try:
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(islice(documents, chunk_size))
+                if not chunk:
+                    break
+                pending.append(
+                    loop.run_in_executor(executor, serialize_documents, chunk)
+                )
+            if not pending:
+                return
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,45 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from toshi_client.cache.search_cache import SearchCache
+
+
+class MemorySearchCache(SearchCache):
+    """
+    An in-process LRU cache for search responses.
+
+    Parameters
+    ----------
+    max_entries : int, default=1024
+        The maximum number of cached responses.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, index_name: str, key: str, response: dict):
+        with self._lock:
+            self._entries[key] = (index_name, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, index_name: str):
+        with self._lock:
+            for key in [k for k, v in self._entries.items() if v[0] == index_name]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
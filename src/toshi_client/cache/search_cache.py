@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class SearchCache(ABC):
+    """
+    Base class for caches holding raw search responses.
+
+    Entries are keyed by the index name and the serialized search body, and are
+    grouped per index so that writes to an index can invalidate them.
+
+    `AsyncToshiClient` uses the coroutine variants `aget`, `aset` and `ainvalidate`.
+    By default they call the blocking methods directly, caches doing I/O run them in
+    the default executor of the event loop instead.
+    """
+
+    _blocking_io = False
+    """Whether the methods block on I/O, so their coroutines run them in an executor"""
+
+    @staticmethod
+    def make_key(index_name: str, body: str) -> str:
+        """
+        Builds the cache key for a search request.
+
+        Parameters
+        ----------
+        index_name : str
+            The name of the searched index.
+        body : str
+            The serialized search body as sent to the server.
+
+        Returns
+        -------
+        str
+            The cache key.
+        """
+        return hashlib.sha256(f"{index_name}\n{body}".encode()).hexdigest()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the cached search response for `key` or None."""
+        pass
+
+    @abstractmethod
+    def set(self, index_name: str, key: str, response: dict):
+        """Stores a search response for `key`."""
+        pass
+
+    @abstractmethod
+    def invalidate(self, index_name: str):
+        """Drops all cached responses of the given index."""
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """Drops all cached responses."""
+        pass
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """Returns the cached search response for `key` or None."""
+        return await self._call(self.get, key)
+
+    async def aset(self, index_name: str, key: str, response: dict):
+        """Stores a search response for `key`."""
+        await self._call(self.set, index_name, key, response)
+
+    async def ainvalidate(self, index_name: str):
+        """Drops all cached responses of the given index."""
+        await self._call(self.invalidate, index_name)
+
+    def close(self):
+        """Releases resources held by the cache."""
+        pass
+
+    async def _call(self, method, *args):
+        if not self._blocking_io:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
@@ -0,0 +1,170 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from toshi_client.cache.search_cache import SearchCache
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteSearchCache(SearchCache):
+    """
+    A persistent search cache backed by a SQLite database in WAL mode.
+
+    Several processes on one host can share the same database file, so a freshly
+    started worker is served from the cache the other workers already warmed.
+    The size cap is enforced by a background thread which evicts the least
+    recently used entries. To keep reads from writing to the shared database, the
+    access time of an entry is only refreshed once it is older than
+    `touch_interval`. `AsyncToshiClient` runs the lookups in an executor, so a locked
+    database doesn't block its event loop.
+
+    Errors of the database, e.g. a database locked by another process for too long,
+    are logged and degrade to cache misses.
+
+    Parameters
+    ----------
+    path : Union[str, Path]
+        The location of the database file. It is created if it does not exist.
+    max_entries : int, default=10000
+        The maximum number of cached responses kept after an eviction run.
+    eviction_interval : float, default=30.0
+        Seconds between two eviction runs.
+    touch_interval : float, default=10.0
+        Seconds after which a read refreshes the access time of an entry.
+    """
+
+    _blocking_io = True
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_entries: int = 10000,
+        eviction_interval: float = 30.0,
+        touch_interval: float = 10.0,
+    ):
+        self._path = str(path)
+        self._max_entries = max_entries
+        self._touch_interval = touch_interval
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, "
+                "index_name TEXT NOT NULL, "
+                "response TEXT NOT NULL, "
+                "accessed REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS search_cache_index_name "
+                "ON search_cache (index_name)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS search_cache_accessed "
+                "ON search_cache (accessed)"
+            )
+
+        self._stop = threading.Event()
+        self._evictor = threading.Thread(
+            target=self._evict_periodically,
+            args=(eviction_interval,),
+            name="toshi-sqlite-cache-evictor",
+            daemon=True,
+        )
+        self._evictor.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only used by its thread, but closed by whichever thread calls close()
+            conn = sqlite3.connect(
+                self._path, timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, accessed FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            now = time.time()
+            if row[1] <= now - self._touch_interval:
+                conn.execute(
+                    "UPDATE search_cache SET accessed = ? WHERE key = ?", (now, key)
+                )
+        except sqlite3.OperationalError as e:
+            logger.warning("Search cache lookup failed: %s", e)
+            return None
+        return json.loads(row[0])
+
+    def set(self, index_name: str, key: str, response: dict):
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO search_cache "
+                "(key, index_name, response, accessed) VALUES (?, ?, ?, ?)",
+                (key, index_name, json.dumps(response), time.time()),
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning("Storing a search response failed: %s", e)
+
+    def invalidate(self, index_name: str):
+        try:
+            self._connection().execute(
+                "DELETE FROM search_cache WHERE index_name = ?", (index_name,)
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning("Invalidating the index %s failed: %s", index_name, e)
+
+    def clear(self):
+        try:
+            self._connection().execute("DELETE FROM search_cache")
+        except sqlite3.OperationalError as e:
+            logger.warning("Clearing the search cache failed: %s", e)
+
+    def evict(self):
+        """Removes the least recently used entries exceeding `max_entries`."""
+        conn = self._connection()
+        (count,) = conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()
+        if count <= self._max_entries:
+            return
+
+        conn.execute(
+            "DELETE FROM search_cache WHERE key IN "
+            "(SELECT key FROM search_cache ORDER BY accessed LIMIT ?)",
+            (count - self._max_entries,),
+        )
+
+    def close(self):
+        self._stop.set()
+        self._evictor.join()
+
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def _evict_periodically(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.evict()
+            except sqlite3.OperationalError:
+                # The database is locked by another process, retry next round
+                continue
@@ -0,0 +1,304 @@
+import asyncio
+import threading
+from typing import Optional, TYPE_CHECKING
+
+from toshi_client.index.index import Index
+from toshi_client.index.index_summary import IndexSummary
+
+if TYPE_CHECKING:
+    from toshi_client.client import ToshiClient, AsyncToshiClient
+
+
+class _CatalogState:
+    """
+    Holds the cached catalog data.
+
+    Refreshes build new containers and swap them in, so readers never observe a
+    partially refreshed catalog and never have to take a lock.
+
+    Every invalidation starts a new generation. Data loaded in an older generation
+    may predate the invalidation, so it is discarded instead of stored.
+    """
+
+    def __init__(self):
+        self.indexes: Optional[list[str]] = None
+        self.summaries: dict[str, IndexSummary] = {}
+        self.generation = 0
+
+    def replace(
+        self, indexes: list[str], summaries: dict[str, IndexSummary], generation: int
+    ):
+        if generation != self.generation:
+            return
+        self.summaries = {
+            name: summary for name, summary in summaries.items() if name in indexes
+        }
+        self.indexes = indexes
+
+    def store_indexes(self, indexes: list[str], generation: int):
+        if generation == self.generation:
+            self.indexes = indexes
+
+    def store_summary(self, name: str, summary: IndexSummary, generation: int):
+        if generation == self.generation:
+            self.summaries = {**self.summaries, name: summary}
+
+    def drop(self, name: Optional[str]):
+        self.generation += 1
+        if name is None:
+            self.indexes = None
+            self.summaries = {}
+        else:
+            self.indexes = None
+            self.summaries = {k: v for k, v in self.summaries.items() if k != name}
+
+
+class IndexCatalog:
+    """
+    Caches the index list and index schemas of a Toshi server.
+
+    The cached data is refreshed on a background thread. Reads are served from
+    the cache and only hit the server if the requested entry was never loaded.
+
+    Parameters
+    ----------
+    client : ToshiClient
+        The client used to load the catalog.
+    refresh_interval : float, default=60.0
+        Seconds between two background refreshes.
+    """
+
+    def __init__(self, client: "ToshiClient", refresh_interval: float = 60.0):
+        self._client = client
+        self._state = _CatalogState()
+        self._stop = threading.Event()
+        self._refresher = threading.Thread(
+            target=self._refresh_periodically,
+            args=(refresh_interval,),
+            name="toshi-index-catalog",
+            daemon=True,
+        )
+        self._refresher.start()
+
+    def list_indexes(self) -> list[str]:
+        """
+        Returns the names of all indexes on the server.
+
+        Returns
+        -------
+        list[str]
+            The list of index names.
+        """
+        indexes = self._state.indexes
+        if indexes is None:
+            generation = self._state.generation
+            indexes = self._client.list_indexes()
+            self._state.store_indexes(indexes, generation)
+        return list(indexes)
+
+    def get_index_summary(self, name: str) -> IndexSummary:
+        """
+        Returns the cached summary of an index.
+
+        Parameters
+        ----------
+        name : str
+            The name of the index.
+
+        Returns
+        -------
+        IndexSummary
+            The summary of the index.
+        """
+        summary = self._state.summaries.get(name)
+        if summary is None:
+            generation = self._state.generation
+            summary = self._client.get_index_summary(name, include_size=False)
+            self._state.store_summary(name, summary, generation)
+        return summary
+
+    def get_index(self, name: str) -> Index:
+        """
+        Returns the cached schema of an index.
+
+        Parameters
+        ----------
+        name : str
+            The name of the index.
+
+        Returns
+        -------
+        Index
+            The schema of the index.
+        """
+        return self.get_index_summary(name).index
+
+    def invalidate(self, name: Optional[str] = None):
+        """
+        Drops cached data so that the next read loads it from the server.
+
+        Parameters
+        ----------
+        name : str, optional
+            The index whose summary is dropped. Drops everything if not given.
+        """
+        self._state.drop(name)
+
+    def refresh(self):
+        """Reloads the index list and all cached summaries from the server."""
+        generation = self._state.generation
+        indexes = self._client.list_indexes()
+        summaries = {}
+        for name in self._state.summaries:
+            if name in indexes:
+                summaries[name] = self._client.get_index_summary(
+                    name, include_size=False
+                )
+        self._state.replace(indexes, summaries, generation)
+
+    def close(self):
+        """Stops the background refresh."""
+        self._stop.set()
+        self._refresher.join()
+
+    def __enter__(self) -> "IndexCatalog":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _refresh_periodically(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Keep serving the stale catalog until the server is reachable again
+                continue
+
+
+class AsyncIndexCatalog:
+    """
+    Caches the index list and index schemas of a Toshi server.
+
+    The cached data is refreshed by a background task, which is started on the
+    first read. Reads are served from the cache and only hit the server if the
+    requested entry was never loaded.
+
+    Parameters
+    ----------
+    client : AsyncToshiClient
+        The client used to load the catalog.
+    refresh_interval : float, default=60.0
+        Seconds between two background refreshes.
+    """
+
+    def __init__(self, client: "AsyncToshiClient", refresh_interval: float = 60.0):
+        self._client = client
+        self._refresh_interval = refresh_interval
+        self._state = _CatalogState()
+        self._refresher: Optional[asyncio.Task] = None
+
+    async def list_indexes(self) -> list[str]:
+        """
+        Returns the names of all indexes on the server.
+
+        Returns
+        -------
+        list[str]
+            The list of index names.
+        """
+        self._ensure_refresher()
+        indexes = self._state.indexes
+        if indexes is None:
+            generation = self._state.generation
+            indexes = await self._client.list_indexes()
+            self._state.store_indexes(indexes, generation)
+        return list(indexes)
+
+    async def get_index_summary(self, name: str) -> IndexSummary:
+        """
+        Returns the cached summary of an index.
+
+        Parameters
+        ----------
+        name : str
+            The name of the index.
+
+        Returns
+        -------
+        IndexSummary
+            The summary of the index.
+        """
+        self._ensure_refresher()
+        summary = self._state.summaries.get(name)
+        if summary is None:
+            generation = self._state.generation
+            summary = await self._client.get_index_summary(name, include_size=False)
+            self._state.store_summary(name, summary, generation)
+        return summary
+
+    async def get_index(self, name: str) -> Index:
+        """
+        Returns the cached schema of an index.
+
+        Parameters
+        ----------
+        name : str
+            The name of the index.
+
+        Returns
+        -------
+        Index
+            The schema of the index.
+        """
+        return (await self.get_index_summary(name)).index
+
+    def invalidate(self, name: Optional[str] = None):
+        """
+        Drops cached data so that the next read loads it from the server.
+
+        Parameters
+        ----------
+        name : str, optional
+            The index whose summary is dropped. Drops everything if not given.
+        """
+        self._state.drop(name)
+
+    async def refresh(self):
+        """Reloads the index list and all cached summaries from the server."""
+        generation = self._state.generation
+        indexes = await self._client.list_indexes()
+        names = [name for name in self._state.summaries if name in indexes]
+        summaries = await asyncio.gather(
+            *[self._client.get_index_summary(n, include_size=False) for n in names]
+        )
+        self._state.replace(indexes, dict(zip(names, summaries)), generation)
+
+    async def close(self):
+        """Stops the background refresh."""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    async def __aenter__(self) -> "AsyncIndexCatalog":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _ensure_refresher(self):
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_periodically())
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self._refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                # Keep serving the stale catalog until the server is reachable again
+                continue
@@ -1,22 +1,82 @@
+import asyncio
 import json
+import os
+import time
 from collections import ChainMap
-from typing import Optional, Type, Union
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import (
+    Optional,
+    Type,
+    Union,
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    Sequence,
+)
 
 import aiohttp
 import requests
 
+from toshi_client.bulk import (
+    aserialize_in_pool,
+    column_length,
+    ndjson_chunks,
+    ndjson_lines,
+    serialize_in_pool,
+)
+from toshi_client.cache.search_cache import SearchCache
+from toshi_client.catalog import IndexCatalog, AsyncIndexCatalog
 from toshi_client.errors import (
     ToshiIndexError,
     ToshiDocumentError,
     ToshiFlushError,
     ToshiClientError,
 )
+from toshi_client.index.document_validator import DocumentValidator
 from toshi_client.index.index import Index
 from toshi_client.index.index_summary import IndexSummary
+from toshi_client.metrics import ClientMetrics
+from toshi_client.merge import merge_search_responses, top_k_query
 from toshi_client.models.document import Document
 from toshi_client.models.query import Query
+from toshi_client.models.results import (
+    BatchDeleteResult,
+    DeleteGroupResult,
+    FacetCount,
+    RejectedDocument,
+    SearchResult,
+)
+from toshi_client.query.bool_query import BoolQuery
 from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.optimizer import optimize_query
+from toshi_client.query.range_query import RangeQuery
+from toshi_client.query.validator import QueryValidator
 from toshi_client.query.term_query import TermQuery
+from toshi_client.slow_query_log import SlowQueryLog
+from toshi_client.timing import PhaseProfiler, current_timings, profiled, timed_phase
+from toshi_client.tracing import Tracer, in_current_context, set_span_attributes, traced
+from toshi_client.transport import (
+    AiohttpTransport,
+    AsyncTransport,
+    RequestsTransport,
+    Transport,
+)
+
+SearchRequest = Union[
+    tuple[Query, Type[Document]],
+    tuple[Query, Type[Document], Optional[list[FacetQuery]]],
+]
+"""A search as passed to `msearch`: (query, document_type[, facet_query])"""
+
+_EXHAUSTED = object()
+
+# Session shared by all requests of a fan-out operation like `msearch`
+_shared_session: ContextVar[Optional[aiohttp.ClientSession]] = ContextVar(
+    "_shared_session", default=None
+)
 
 
 class ToshiClient:
@@ -27,13 +87,87 @@ class ToshiClient:
     ----------
     url : str
         The base URL of the Toshi search server.
+    cache : SearchCache, optional
+        A cache for search responses. Writes through this client invalidate the
+        cached responses of the written index.
+    optimize_queries : bool, default=False
+        If True, `BoolQuery` trees are simplified before they are sent, and searches
+        which can't match any document skip the server altogether.
+    merge_ranges : bool, default=False
+        If True, the optimizer also merges the `must` ranges on the same field. This
+        shifts the scores of all hits by the same amount, see `optimize_query`.
+    validate_queries : bool, default=False
+        If True, searches are checked against the index schema from the `catalog`
+        before they are sent.
+    metrics : ClientMetrics, optional
+        Records the latency, traffic and errors of every request of this client.
+    profiler : PhaseProfiler, optional
+        Times the serialize, network, decode and materialize phases of a sample of
+        the calls of this client. Search results carry their timings.
+    tracer : Tracer, optional
+        Emits a span per call of this client, with a child span per HTTP request.
+        An OpenTelemetry tracer can be passed as well.
+    slow_query_log : SlowQueryLog, optional
+        Aggregates the latency of the searches of this client by query shape.
+    transport : Transport, optional
+        Sends the HTTP requests, e.g. a `RecordingTransport` or a `ReplayTransport`. Defaults to
+        `requests`.
     """
 
-    def __init__(self, url: str):
+    def __init__(
+        self,
+        url: str,
+        cache: Optional[SearchCache] = None,
+        optimize_queries: bool = False,
+        merge_ranges: bool = False,
+        validate_queries: bool = False,
+        metrics: Optional[ClientMetrics] = None,
+        profiler: Optional[PhaseProfiler] = None,
+        tracer: Optional[Tracer] = None,
+        slow_query_log: Optional[SlowQueryLog] = None,
+        transport: Optional[Transport] = None,
+    ):
         if url.endswith("/"):
             url = url[:-1]
         self._url = url
+        self._cache = cache
+        self._optimize_queries = optimize_queries
+        self._merge_ranges = merge_ranges
+        self._validate_queries = validate_queries
+        self._metrics = metrics
+        self._profiler = profiler
+        self._tracer = tracer
+        self._slow_query_log = slow_query_log
+        self._transport = transport or RequestsTransport()
+        self._validators: dict[str, QueryValidator] = {}
+        self._catalog: Optional[IndexCatalog] = None
+
+    @property
+    def catalog(self) -> IndexCatalog:
+        """
+        The cached index list and schemas of the server.
+
+        The catalog is created on first access and refreshes itself in the
+        background.
+        """
+        if self._catalog is None:
+            self._catalog = IndexCatalog(self)
+        return self._catalog
+
+    def close(self):
+        """Stops the background refresh of the `catalog`."""
+        if self._catalog is not None:
+            self._catalog.close()
+            self._catalog = None
+
+    def __enter__(self) -> "ToshiClient":
+        return self
 
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @traced("create_index")
+    @profiled("create_index")
     def create_index(self, index: Index):
         """
         Creates a new index on the Toshi server.
@@ -49,7 +183,9 @@ class ToshiClient:
             If the index creation fails.
         """
         create_index_url = f"{self._url}/{index.name}/_create"
-        resp = requests.put(create_index_url, json=index.to_json())
+        resp = self._request(
+            "create_index", index.name, "put", create_index_url, json=index.to_json()
+        )
 
         if resp.status_code != 201:
             raise ToshiIndexError(
@@ -57,6 +193,11 @@ class ToshiClient:
                 f"Reason: {resp.json()['message']}"
             )
 
+        if self._catalog is not None:
+            self._catalog.invalidate(index.name)
+
+    @traced("get_index_summary")
+    @profiled("get_index_summary")
     def get_index_summary(
         self, name: str, include_size: Optional[bool] = True
     ) -> IndexSummary:
@@ -81,7 +222,7 @@ class ToshiClient:
             If retrieving the index summary fails.
         """
         index_summary_url = f"{self._url}/{name}/_summary?include_sizes={include_size}"
-        resp = requests.get(index_summary_url)
+        resp = self._request("get_index_summary", name, "get", index_summary_url)
 
         if resp.status_code != 200:
             raise ToshiIndexError(
@@ -91,7 +232,14 @@ class ToshiClient:
 
         return IndexSummary.from_json(index_name=name, data=resp.json()["summaries"])
 
-    def add_document(self, document: Document, commit: Optional[bool] = False):
+    @traced("add_document")
+    @profiled("add_document")
+    def add_document(
+        self,
+        document: Document,
+        commit: Optional[bool] = False,
+        index_name: Optional[str] = None,
+    ):
         """
         Adds a document to the specified index.
 
@@ -101,25 +249,47 @@ class ToshiClient:
             The document to be added.
         commit : Optional[bool], default=False
             Whether to commit the changes immediately.
+        index_name : str, optional
+            The index to write to. Defaults to the document's `index_name()`.
 
         Raises
         ------
         ToshiDocumentError
             If adding the document fails.
         """
-        index_url = f"{self._url}/{document.index_name()}/"
+        index_name = index_name or document.index_name()
+        set_span_attributes(index=index_name, docs_count=1)
+        index_url = f"{self._url}/{index_name}/"
         headers = {"Content-Type": "application/json"}
 
         json_data = dict(document=document.to_json(), options=dict(commit=commit))
-        resp = requests.put(index_url, headers=headers, json=json_data)
+        resp = self._request(
+            "add_document",
+            index_name,
+            "put",
+            index_url,
+            headers=headers,
+            json=json_data,
+        )
 
         if resp.status_code != 201:
             raise ToshiDocumentError(
-                f"Could not add document for index {document.index_name()}. Status code: {resp.status_code}. "
+                f"Could not add document for index {index_name}. Status code: {resp.status_code}. "
                 f"Reason: {resp.json()['message']}"
             )
 
-    def bulk_insert_documents(self, documents: list[Document], commit: bool = False):
+        self._invalidate(index_name)
+
+    @traced("bulk_insert_documents")
+    @profiled("bulk_insert_documents")
+    def bulk_insert_documents(
+        self,
+        documents: list[Document],
+        commit: bool = False,
+        index_name: Optional[str] = None,
+        validate: bool = False,
+        chunk_size: Optional[int] = None,
+    ) -> list[RejectedDocument]:
         """
         Inserts multiple documents into the specified index.
 
@@ -129,27 +299,156 @@ class ToshiClient:
             The documents to be inserted.
         commit : bool, default=False
             Whether to commit the changes immediately.
+        index_name : str, optional
+            The index to write to. Defaults to the first document's `index_name()`.
+        validate : bool, default=False
+            If True, the documents are checked and coerced against the index schema
+            from the `catalog`. Rejected documents are left out of the request.
+        chunk_size : int, optional
+            The number of documents per `_bulk` request. All documents are sent in
+            one request if not given.
+
+        Returns
+        -------
+        list[RejectedDocument]
+            The documents left out by the validation, with the reason.
 
         Raises
         ------
         ToshiDocumentError
             If bulk inserting the documents fails.
         """
-        index_name = documents[0].index_name()
-        index_url = f"{self._url}/{index_name}/_bulk"
+        index_name = index_name or documents[0].index_name()
+        set_span_attributes(index=index_name, docs_count=len(documents))
+
+        rejected = []
+        with timed_phase("serialize"):
+            payloads = [doc.to_json() for doc in documents]
+        if validate:
+            index = self.catalog.get_index(index_name)
+            validation = DocumentValidator(index).validate(documents)
+            payloads, rejected = validation.documents, validation.rejected
+            if not payloads:
+                return rejected
+
+        lines = (json.dumps(payload) for payload in payloads)
+        self._send_bulk(
+            "bulk_insert_documents", index_name, ndjson_chunks(lines, chunk_size)
+        )
+
+        self._invalidate(index_name)
+        if commit:
+            self.flush(index_name)
+        return rejected
 
-        body_content = "\n".join([json.dumps(doc.to_json()) for doc in documents])
-        resp = requests.post(index_url, data=body_content)
+    @traced("bulk_insert_columns")
+    @profiled("bulk_insert_columns")
+    def bulk_insert_columns(
+        self,
+        index_name: str,
+        columns: dict[str, Sequence],
+        commit: bool = False,
+        chunk_size: Optional[int] = 10000,
+    ) -> dict[int, str]:
+        """
+        Inserts documents given column-wise, e.g. as lists or NumPy arrays per field.
 
-        if resp.status_code != 201:
-            raise ToshiDocumentError(
-                f"Could not add document for index {index_name}. Status code: {resp.status_code}. "
-                f"Reason: {resp.json()['message']}"
-            )
+        The NDJSON body is formatted straight from the columns with the field types
+        of the index schema from the `catalog`, without a `Document` per row. Rows
+        are validated and coerced like with `bulk_insert_documents(validate=True)`.
+
+        Parameters
+        ----------
+        index_name : str
+            The index to write to.
+        columns : dict[str, Sequence]
+            The values per field name, all of the same length. `None` marks a
+            missing value.
+        commit : bool, default=False
+            Whether to commit the changes immediately.
+        chunk_size : int, optional, default=10000
+            The number of rows per `_bulk` request. All rows are sent in one request
+            if None.
+
+        Returns
+        -------
+        dict[int, str]
+            The reason per row left out by the validation.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If bulk inserting the documents fails.
+        ValueError
+            If the columns differ in length or a column is not part of the index.
+        """
+        index = self.catalog.get_index(index_name)
+        num_rows = column_length(columns)
+        set_span_attributes(index=index_name, docs_count=num_rows)
+        columns, rejected = DocumentValidator(index).validate_columns(columns, num_rows)
+
+        lines = ndjson_lines(index, columns, num_rows, skip=set(rejected))
+        self._send_bulk(
+            "bulk_insert_columns", index_name, ndjson_chunks(lines, chunk_size)
+        )
+
+        self._invalidate(index_name)
+        if commit:
+            self.flush(index_name)
+        return rejected
+
+    @traced("bulk_load")
+    @profiled("bulk_load")
+    def bulk_load(
+        self,
+        index_name: str,
+        documents: Iterable[Document],
+        commit: bool = False,
+        chunk_size: int = 10000,
+        max_workers: Optional[int] = None,
+    ):
+        """
+        Inserts a large stream of documents, encoding them in worker processes.
+
+        Encoding NDJSON is CPU bound and limited to one core by the GIL. Here the
+        documents are encoded in chunks by a `ProcessPoolExecutor`, while the
+        chunks encoded before are sent. Use it for large loads, for a few thousand
+        documents `bulk_insert_documents` is faster.
+
+        Parameters
+        ----------
+        index_name : str
+            The index to write to.
+        documents : Iterable[Document]
+            The documents, consumed lazily. Their classes must be importable by the
+            worker processes, i.e. not defined locally.
+        commit : bool, default=False
+            Whether to commit the changes after all documents are sent.
+        chunk_size : int, default=10000
+            The number of documents per `_bulk` request.
+        max_workers : int, optional
+            The number of worker processes. Defaults to the number of CPUs.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If bulk inserting a chunk fails. The chunks sent before stay inserted.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        set_span_attributes(index=index_name)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Two chunks per worker keep the workers busy while a chunk is sent
+            bodies = serialize_in_pool(executor, documents, chunk_size, 2 * max_workers)
+            try:
+                self._send_bulk("bulk_load", index_name, bodies)
+            finally:
+                self._invalidate(index_name)
 
         if commit:
             self.flush(index_name)
 
+    @traced("get_documents")
+    @profiled("get_documents")
     def get_documents(self, document: Type[Document]) -> list[Document]:
         """
         Retrieves all documents from the specified index.
@@ -170,7 +469,7 @@ class ToshiClient:
             If retrieving the documents fails.
         """
         index_url = f"{self._url}/{document.index_name()}/"
-        resp = requests.get(index_url)
+        resp = self._request("get_documents", document.index_name(), "get", index_url)
 
         if resp.status_code != 200:
             raise ToshiDocumentError(
@@ -178,12 +477,16 @@ class ToshiClient:
                 f"Reason: {resp.json()['message']}"
             )
 
-        data = resp.json()
-        documents = []
-        for doc in data["docs"]:
-            documents.append(document(**doc["doc"]))
+        with timed_phase("decode"):
+            data = resp.json()
+        with timed_phase("materialize"):
+            documents = []
+            for doc in data["docs"]:
+                documents.append(document(**doc["doc"]))
         return documents
 
+    @traced("delete_term")
+    @profiled("delete_term")
     def delete_term(
         self,
         term_queries: list[TermQuery],
@@ -219,7 +522,7 @@ class ToshiClient:
             terms.update(tq.to_json()["query"]["term"])
 
         body = json.dumps(dict(terms=terms, options=dict(commit=commit)))
-        resp = requests.delete(index_url, data=body)
+        resp = self._request("delete_term", index_name, "delete", index_url, data=body)
 
         if resp.status_code != 200:
             raise ToshiDocumentError(
@@ -227,8 +530,66 @@ class ToshiClient:
                 f"Reason: {resp.json()['message']}"
             )
 
+        self._invalidate(index_name)
         return resp.json()["docs_affected"]
 
+    @traced("delete_terms")
+    @profiled("delete_terms")
+    def delete_terms(
+        self,
+        terms: list[tuple[str, str]],
+        index_name: str,
+        commit: bool = False,
+        max_concurrency: int = 8,
+    ) -> BatchDeleteResult:
+        """
+        Deletes documents matching any of many terms from the specified index.
+
+        Duplicate terms are removed and the rest is grouped into requests holding at
+        most one term per field, which is what a single delete request supports. The
+        groups run concurrently and the index is committed once at the end.
+
+        Parameters
+        ----------
+        terms : list[tuple[str, str]]
+            The (field_name, term) pairs specifying the documents to delete.
+        index_name : str
+            The name of the index.
+        commit : bool, default=False
+            Whether to commit the changes after all groups ran.
+        max_concurrency : int, default=8
+            The maximum number of delete requests in flight at the same time.
+
+        Returns
+        -------
+        BatchDeleteResult
+            The summed number of affected documents and the result of each group.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If deleting the documents of a group fails.
+        ToshiFlushError
+            If the final commit fails.
+        """
+
+        def run(group: dict[str, str]) -> DeleteGroupResult:
+            term_queries = [TermQuery(term=t, field_name=f) for f, t in group.items()]
+            docs_affected = self.delete_term(term_queries, index_name, commit=False)
+            return DeleteGroupResult(terms=group, docs_affected=docs_affected)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            groups = list(executor.map(in_current_context(run), _group_terms(terms)))
+
+        if commit:
+            self.flush(index_name)
+
+        return BatchDeleteResult(
+            docs_affected=sum(g.docs_affected for g in groups), groups=groups
+        )
+
+    @traced("list_indexes")
+    @profiled("list_indexes")
     def list_indexes(self) -> list[str]:
         """
         Lists all indexes on the Toshi server.
@@ -244,7 +605,7 @@ class ToshiClient:
             If listing the indexes fails.
         """
         list_index_url = f"{self._url}/_list/"
-        resp = requests.get(list_index_url)
+        resp = self._request("list_indexes", "", "get", list_index_url)
 
         if resp.status_code != 200:
             raise ToshiIndexError(
@@ -254,6 +615,8 @@ class ToshiClient:
 
         return resp.json()
 
+    @traced("flush")
+    @profiled("flush")
     def flush(self, index_name: str):
         """
         Flushes the specified index.
@@ -271,18 +634,24 @@ class ToshiClient:
         # Flush uses actually get method not post, as in the examples
         # https://github.com/toshi-search/Toshi/blob/a13a51820bdb025b1c0556a4e49be2e5b97fbeca/toshi-server/src/router.rs#L56
         index_url = f"{self._url}/{index_name}/_flush/"
-        resp = requests.get(index_url)
+        resp = self._request("flush", index_name, "get", index_url)
 
         if resp.status_code != 200:
             raise ToshiFlushError(f"Could not flush. Status code: {resp.status_code}. ")
 
+        self._invalidate(index_name)
+
+    @traced("search")
+    @profiled("search")
     def search(
         self,
         query: Query,
         document_type: Type[Document],
         facet_query: list[FacetQuery] = None,
         return_score: bool = False,
-    ) -> list[Union[Document, dict[Document, float]]]:
+        count_only: bool = False,
+        index_name: Optional[str] = None,
+    ) -> SearchResult:
         """
         Searches for documents in the specified index.
 
@@ -296,40 +665,371 @@ class ToshiClient:
             The facet queries for the search.
         return_score : bool, default=False
             Whether to return the scores along with the documents.
+        count_only : bool, default=False
+            If True, the returned documents are not decoded and only the hit count and
+            facet counts are returned.
+        index_name : str, optional
+            The index to search. Defaults to the document type's `index_name()`.
 
         Returns
         -------
-        list[Union[Document, dict[Document, float]]]
-            The list of documents or a list of dictionaries with documents and their scores.
+        SearchResult
+            The list of documents or a list of dictionaries with documents and their scores,
+            together with the hit count and facet counts.
 
         Raises
         ------
         ToshiClientError
             If the search fails.
         """
-        search_url = f"{self._url}/{document_type.index_name()}/"
-        headers = {"Content-Type": "application/json"}
-
-        json_data = query.to_json()
-        if facet_query is not None:
-            json_data["facets"] = dict(ChainMap(*[f.to_json() for f in facet_query]))
+        index_name = index_name or document_type.index_name()
+        set_span_attributes(index=index_name, query_type=type(query).__name__)
+        json_data = self._search_response(query, index_name, facet_query)
+        with timed_phase("materialize"):
+            result = _decode_search_result(
+                json_data, document_type, return_score, count_only
+            )
+        set_span_attributes(hits=result.hits, docs_count=len(result))
+        return result
 
-        resp = requests.post(search_url, headers=headers, data=json.dumps(json_data))
+    def _search_response(
+        self, query: Query, index_name: str, facet_query: Optional[list[FacetQuery]]
+    ) -> dict:
+        search_url = f"{self._url}/{index_name}/"
+        headers = {"Content-Type": "application/json"}
 
-        json_data = resp.json()
+        if self._validate_queries:
+            index = self.catalog.get_index(index_name)
+            self._validator(index).validate(query, facet_query)
+
+        if self._optimize_queries:
+            query = optimize_query(query, self._merge_ranges)
+            if query is None:
+                return dict(hits=0, docs=[], facets=[])
+
+        with timed_phase("serialize"):
+            json_data = query.to_json()
+            if facet_query is not None:
+                json_data["facets"] = dict(
+                    ChainMap(*[f.to_json() for f in facet_query])
+                )
+            body = json.dumps(json_data)
+
+        cache_key = None
+        if self._cache is not None:
+            cache_key = self._cache.make_key(index_name, body)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        started = time.perf_counter()
+        resp = self._request(
+            "search", index_name, "post", search_url, headers=headers, data=body
+        )
+
+        with timed_phase("decode"):
+            json_data = resp.json()
+        if self._slow_query_log is not None:
+            self._slow_query_log.record(
+                index_name, query, facet_query, time.perf_counter() - started
+            )
         if "message" in json_data:
             raise ToshiClientError(json_data["message"])
 
-        documents = []
-        for raw_doc in json_data["docs"]:
-            doc = document_type(**raw_doc["doc"])
-            if not return_score:
-                documents.append(doc)
-            else:
-                raw_doc["doc"] = doc
-                documents.append(raw_doc)
+        if cache_key is not None:
+            self._cache.set(index_name, cache_key, json_data)
 
-        return documents
+        return json_data
+
+    @traced("federated_search")
+    @profiled("federated_search")
+    def federated_search(
+        self,
+        query: Query,
+        document_types: list[Union[Type[Document], tuple[Type[Document], float]]],
+        k: int = 10,
+        max_concurrency: int = 8,
+    ) -> SearchResult:
+        """
+        Searches several indexes concurrently and merges their hits by score.
+
+        Only the k best hits over all indexes are decoded into documents.
+
+        Parameters
+        ----------
+        query : Query
+            The search query, sent to every index.
+        document_types : list[Union[Type[Document], tuple[Type[Document], float]]]
+            The document types of the searched indexes, optionally paired with a boost
+            their scores are multiplied with.
+        k : int, default=10
+            The number of hits to return.
+        max_concurrency : int, default=8
+            The maximum number of searches in flight at the same time.
+
+        Returns
+        -------
+        SearchResult
+            Dictionaries with the documents and their boosted scores, best first.
+
+        Raises
+        ------
+        ToshiClientError
+            If the search of an index fails.
+        ValueError
+            If k is negative.
+        """
+        targets = [_unpack_target(t) for t in document_types]
+        query = top_k_query(query, k)
+
+        def run(document_type: Type[Document]) -> dict:
+            return self._search_response(query, document_type.index_name(), None)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            responses = list(
+                executor.map(in_current_context(run), [t for t, _ in targets])
+            )
+
+        return merge_search_responses(
+            responses, [t for t, _ in targets], k, [b for _, b in targets]
+        )
+
+    @traced("mget")
+    @profiled("mget")
+    def mget(
+        self,
+        document_type: Type[Document],
+        field_name: str,
+        keys: list,
+        batch_size: int = 512,
+        max_concurrency: int = 8,
+    ) -> dict:
+        """
+        Fetches documents by key.
+
+        The distinct keys are split into batches, each searched with one `BoolQuery`
+        holding a `should` clause per key. The batches run concurrently. Keys shared
+        by several documents can push the documents of other keys out of a batch,
+        those keys are searched again one by one.
+
+        Parameters
+        ----------
+        document_type : Type[Document]
+            The type of document to fetch.
+        field_name : str
+            The indexed field holding the keys, ideally unique per document.
+        keys : list
+            The keys of the documents to fetch.
+        batch_size : int, default=512
+            The maximum number of keys per search.
+        max_concurrency : int, default=8
+            The maximum number of searches in flight at the same time.
+
+        Returns
+        -------
+        dict
+            The found documents by key, in the order the keys were given. Keys without a
+            document are left out.
+
+        Raises
+        ------
+        ToshiClientError
+            If a search fails.
+        """
+        batches = _key_batches(keys, batch_size)
+
+        def run(batch: list) -> SearchResult:
+            return self.search(_key_batch_query(field_name, batch), document_type)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = list(executor.map(in_current_context(run), batches))
+            retries = [[k] for k in _pushed_out_keys(field_name, batches, results)]
+            results += executor.map(in_current_context(run), retries)
+
+        return _documents_by_key(keys, field_name, results)
+
+    @traced("msearch")
+    @profiled("msearch")
+    def msearch(
+        self,
+        searches: list[SearchRequest],
+        max_concurrency: int = 8,
+        return_score: bool = False,
+    ) -> list[Union[SearchResult, Exception]]:
+        """
+        Runs several searches concurrently.
+
+        Parameters
+        ----------
+        searches : list[SearchRequest]
+            The searches as (query, document_type) or (query, document_type, facet_query) tuples.
+        max_concurrency : int, default=8
+            The maximum number of searches in flight at the same time.
+        return_score : bool, default=False
+            Whether to return the scores along with the documents.
+
+        Returns
+        -------
+        list[Union[SearchResult, Exception]]
+            For each search in input order, either its results or the exception it raised.
+        """
+
+        def run(search: SearchRequest):
+            try:
+                return self.search(*_unpack_search(search), return_score=return_score)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            return list(executor.map(in_current_context(run), searches))
+
+    def iter_search(
+        self,
+        query: Query,
+        document_type: Type[Document],
+        key_field: str,
+        start: int,
+        stop: int,
+        page_size: int = 1000,
+    ) -> Iterator[Document]:
+        """
+        Iterates over all documents matching a query, page by page.
+
+        The key space [start, stop) of `key_field` is walked in windows, each fetched
+        with a `RangeQuery` merged into `query`. Windows shrink when a page would exceed
+        `page_size` and grow while pages stay sparse, so at most two pages are held in
+        memory. The next page is prefetched while the current one is consumed.
+
+        Parameters
+        ----------
+        query : Query
+            The search query.
+        document_type : Type[Document]
+            The type of document to search for.
+        key_field : str
+            An indexed integer field, ideally unique per document, used for paging.
+        start : int
+            The smallest key to include.
+        stop : int
+            The first key to exclude.
+        page_size : int, default=1000
+            The maximum number of documents per page.
+
+        Yields
+        ------
+        Document
+            The documents matching the query.
+
+        Raises
+        ------
+        ToshiClientError
+            If a search fails or more than `page_size` documents share a single key.
+        """
+        window = _KeysetWindow(start, stop, page_size)
+        if window.exhausted:
+            return
+
+        def fetch(lo: int, hi: int) -> list[Document]:
+            page_query = _keyset_page_query(query, key_field, lo, hi, page_size)
+            return self.search(page_query, document_type)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = executor.submit(in_current_context(fetch), *window.bounds)
+            while pending is not None:
+                page = pending.result()
+                if window.advance(len(page)):
+                    pending = executor.submit(in_current_context(fetch), *window.bounds)
+                    continue
+
+                pending = None
+                if not window.exhausted:
+                    pending = executor.submit(in_current_context(fetch), *window.bounds)
+                yield from page
+
+    def _send_bulk(self, operation: str, index_name: str, bodies: Iterable[str]):
+        index_url = f"{self._url}/{index_name}/_bulk"
+        for body_content in _timed_iter(bodies, "serialize"):
+            resp = self._request(
+                operation,
+                index_name,
+                "post",
+                index_url,
+                span_attributes=self._chunk_attributes(body_content),
+                data=body_content,
+            )
+
+            if resp.status_code != 201:
+                raise ToshiDocumentError(
+                    f"Could not add document for index {index_name}. Status code: {resp.status_code}. "
+                    f"Reason: {resp.json()['message']}"
+                )
+
+    def _request(
+        self,
+        operation: str,
+        index_name: str,
+        method: str,
+        url: str,
+        span_attributes: Optional[dict] = None,
+        **kwargs,
+    ) -> requests.Response:
+        if self._tracer is None:
+            return self._send_request(operation, index_name, method, url, **kwargs)
+
+        attributes = _http_span_attributes(method, url, index_name, kwargs)
+        attributes.update(span_attributes or {})
+        with self._tracer.start_as_current_span(
+            "toshi.http", attributes=attributes
+        ) as span:
+            resp = self._send_request(operation, index_name, method, url, **kwargs)
+            span.set_attribute("http.response.status_code", resp.status_code)
+            span.set_attribute("toshi.response_bytes", len(resp.content))
+            return resp
+
+    def _send_request(
+        self, operation: str, index_name: str, method: str, url: str, **kwargs
+    ) -> requests.Response:
+        timings = current_timings()
+        if self._metrics is None and timings is None:
+            return self._transport.request(method, url, **kwargs)
+
+        started = time.perf_counter()
+        if self._metrics is not None:
+            self._metrics.start(operation, index_name)
+        resp = None
+        try:
+            resp = self._transport.request(method, url, **kwargs)
+            return resp
+        finally:
+            if timings is not None:
+                timings.add("network", time.perf_counter() - started, index_name)
+            if self._metrics is not None:
+                self._metrics.finish(
+                    operation,
+                    index_name,
+                    started,
+                    None if resp is None else resp.status_code,
+                    _body_size(kwargs),
+                    0 if resp is None else len(resp.content),
+                )
+
+    def _chunk_attributes(self, body: Union[str, bytes]) -> Optional[dict]:
+        if self._tracer is None:
+            return None
+        newline = b"\n" if isinstance(body, bytes) else "\n"
+        return {"toshi.docs_count": body.count(newline) + 1}
+
+    def _validator(self, index: Index) -> QueryValidator:
+        # A refreshed catalog hands out a new schema, which needs a new validator
+        validator = self._validators.get(index.name)
+        if validator is None or validator.index is not index:
+            validator = QueryValidator(index)
+            self._validators[index.name] = validator
+        return validator
+
+    def _invalidate(self, index_name: str):
+        if self._cache is not None:
+            self._cache.invalidate(index_name)
 
 
 class AsyncToshiClient:
@@ -340,14 +1040,101 @@ class AsyncToshiClient:
     ----------
     url : str
         The base URL of the Toshi search server.
-
+    cache : SearchCache, optional
+        A cache for search responses. Writes through this client invalidate the
+        cached responses of the written index.
+    optimize_queries : bool, default=False
+        If True, `BoolQuery` trees are simplified before they are sent, and searches
+        which can't match any document skip the server altogether.
+    merge_ranges : bool, default=False
+        If True, the optimizer also merges the `must` ranges on the same field. This
+        shifts the scores of all hits by the same amount, see `optimize_query`.
+    validate_queries : bool, default=False
+        If True, searches are checked against the index schema from the `catalog`
+        before they are sent.
+    metrics : ClientMetrics, optional
+        Records the latency, traffic and errors of every request of this client.
+    profiler : PhaseProfiler, optional
+        Times the serialize, network, decode and materialize phases of a sample of
+        the calls of this client. Search results carry their timings.
+    tracer : Tracer, optional
+        Emits a span per call of this client, with a child span per HTTP request.
+        An OpenTelemetry tracer can be passed as well.
+    slow_query_log : SlowQueryLog, optional
+        Aggregates the latency of the searches of this client by query shape.
+    transport : AsyncTransport, optional
+        Sends the HTTP requests, e.g. a `AsyncRecordingTransport` or a `AsyncReplayTransport`. Defaults to
+        the `aiohttp` session of the call.
+    single_flight : bool, default=False
+        If True, identical searches of the same index which run at the same time
+        share one request and its response. The shared request doesn't depend on the
+        session of the search that started it, it uses the `session` of the client
+        or a session of its own.
+    session : aiohttp.ClientSession, optional
+        A session used by all calls of this client, e.g. to share its connection
+        pool. It is closed by the caller. Each call opens a session of its own if
+        not given.
     """
 
-    def __init__(self, url: str):
+    def __init__(
+        self,
+        url: str,
+        cache: Optional[SearchCache] = None,
+        optimize_queries: bool = False,
+        merge_ranges: bool = False,
+        validate_queries: bool = False,
+        metrics: Optional[ClientMetrics] = None,
+        profiler: Optional[PhaseProfiler] = None,
+        tracer: Optional[Tracer] = None,
+        slow_query_log: Optional[SlowQueryLog] = None,
+        transport: Optional[AsyncTransport] = None,
+        single_flight: bool = False,
+        session: Optional[aiohttp.ClientSession] = None,
+    ):
         if url.endswith("/"):
             url = url[:-1]
         self._url = url
+        self._cache = cache
+        self._optimize_queries = optimize_queries
+        self._merge_ranges = merge_ranges
+        self._validate_queries = validate_queries
+        self._metrics = metrics
+        self._profiler = profiler
+        self._tracer = tracer
+        self._slow_query_log = slow_query_log
+        self._transport = transport or AiohttpTransport()
+        self._single_flight = single_flight
+        self._client_session = session
+        self._in_flight: dict[tuple[str, str], asyncio.Task] = {}
+        self._validators: dict[str, QueryValidator] = {}
+        self._catalog: Optional[AsyncIndexCatalog] = None
+
+    @property
+    def catalog(self) -> AsyncIndexCatalog:
+        """
+        The cached index list and schemas of the server.
+
+        The catalog is created on first access and refreshes itself in the
+        background.
+        """
+        if self._catalog is None:
+            self._catalog = AsyncIndexCatalog(self)
+        return self._catalog
+
+    async def close(self):
+        """Stops the background refresh of the `catalog`."""
+        if self._catalog is not None:
+            await self._catalog.close()
+            self._catalog = None
+
+    async def __aenter__(self) -> "AsyncToshiClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
 
+    @traced("create_index")
+    @profiled("create_index")
     async def create_index(self, index: Index):
         """
         Creates a new index on the Toshi server.
@@ -363,8 +1150,15 @@ class AsyncToshiClient:
             If the index creation fails.
         """
         create_index_url = f"{self._url}/{index.name}/_create"
-        async with aiohttp.ClientSession() as session:
-            async with session.put(create_index_url, json=index.to_json()) as resp:
+        async with self._session() as session:
+            async with self._request(
+                session,
+                "create_index",
+                index.name,
+                "put",
+                create_index_url,
+                json=index.to_json(),
+            ) as resp:
                 if resp.status != 201:
                     error_message = json.loads(await resp.read())
                     raise ToshiIndexError(
@@ -372,6 +1166,11 @@ class AsyncToshiClient:
                         f"Reason: {error_message['message']}"
                     )
 
+        if self._catalog is not None:
+            self._catalog.invalidate(index.name)
+
+    @traced("get_index_summary")
+    @profiled("get_index_summary")
     async def get_index_summary(
         self, name: str, include_size: Optional[bool] = True
     ) -> IndexSummary:
@@ -396,8 +1195,10 @@ class AsyncToshiClient:
             If retrieving the index summary fails.
         """
         index_summary_url = f"{self._url}/{name}/_summary?include_sizes={include_size}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(index_summary_url) as resp:
+        async with self._session() as session:
+            async with self._request(
+                session, "get_index_summary", name, "get", index_summary_url
+            ) as resp:
                 if resp.status != 200:
                     error_message = await resp.json()
                     raise ToshiIndexError(
@@ -407,7 +1208,14 @@ class AsyncToshiClient:
                 data = await resp.json()
                 return IndexSummary.from_json(index_name=name, data=data["summaries"])
 
-    async def add_document(self, document: Document, commit: Optional[bool] = False):
+    @traced("add_document")
+    @profiled("add_document")
+    async def add_document(
+        self,
+        document: Document,
+        commit: Optional[bool] = False,
+        index_name: Optional[str] = None,
+    ):
         """
         Adds a document to the specified index.
 
@@ -417,28 +1225,49 @@ class AsyncToshiClient:
             The document to be added.
         commit : Optional[bool], default=False
             Whether to commit the changes immediately.
+        index_name : str, optional
+            The index to write to. Defaults to the document's `index_name()`.
 
         Raises
         ------
         ToshiDocumentError
             If adding the document fails.
         """
-        index_url = f"{self._url}/{document.index_name()}/"
+        index_name = index_name or document.index_name()
+        set_span_attributes(index=index_name, docs_count=1)
+        index_url = f"{self._url}/{index_name}/"
         headers = {"Content-Type": "application/json"}
 
         json_data = dict(document=document.to_json(), options=dict(commit=commit))
-        async with aiohttp.ClientSession() as session:
-            async with session.put(index_url, headers=headers, json=json_data) as resp:
+        async with self._session() as session:
+            async with self._request(
+                session,
+                "add_document",
+                index_name,
+                "put",
+                index_url,
+                headers=headers,
+                json=json_data,
+            ) as resp:
                 if resp.status != 201:
                     error_message = await resp.json()
                     raise ToshiDocumentError(
-                        f"Could not add document for index {document.index_name()}. Status code: {resp.status}. "
+                        f"Could not add document for index {index_name}. Status code: {resp.status}. "
                         f"Reason: {error_message['message']}"
                     )
 
+        await self._invalidate(index_name)
+
+    @traced("bulk_insert_documents")
+    @profiled("bulk_insert_documents")
     async def bulk_insert_documents(
-        self, documents: list[Document], commit: bool = False
-    ):
+        self,
+        documents: list[Document],
+        commit: bool = False,
+        index_name: Optional[str] = None,
+        validate: bool = False,
+        chunk_size: Optional[int] = None,
+    ) -> list[RejectedDocument]:
         """
         Inserts multiple documents into the specified index.
 
@@ -448,28 +1277,162 @@ class AsyncToshiClient:
             The documents to be inserted.
         commit : bool, default=False
             Whether to commit the changes immediately.
+        index_name : str, optional
+            The index to write to. Defaults to the first document's `index_name()`.
+        validate : bool, default=False
+            If True, the documents are checked and coerced against the index schema
+            from the `catalog`. Rejected documents are left out of the request.
+        chunk_size : int, optional
+            The number of documents per `_bulk` request. All documents are sent in
+            one request if not given.
+
+        Returns
+        -------
+        list[RejectedDocument]
+            The documents left out by the validation, with the reason.
 
         Raises
         ------
         ToshiDocumentError
             If bulk inserting the documents fails.
         """
-        index_name = documents[0].index_name()
-        index_url = f"{self._url}/{index_name}/_bulk"
+        index_name = index_name or documents[0].index_name()
+        set_span_attributes(index=index_name, docs_count=len(documents))
+
+        rejected = []
+        with timed_phase("serialize"):
+            payloads = [doc.to_json() for doc in documents]
+        if validate:
+            index = await self.catalog.get_index(index_name)
+            validation = DocumentValidator(index).validate(documents)
+            payloads, rejected = validation.documents, validation.rejected
+            if not payloads:
+                return rejected
+
+        lines = (json.dumps(payload) for payload in payloads)
+        await self._send_bulk(
+            "bulk_insert_documents", index_name, ndjson_chunks(lines, chunk_size)
+        )
+
+        await self._invalidate(index_name)
+        if commit:
+            await self.flush(index_name)
+        return rejected
 
-        body_content = "\n".join([json.dumps(doc.to_json()) for doc in documents])
-        async with aiohttp.ClientSession() as session:
-            async with session.post(index_url, data=body_content) as resp:
-                if resp.status != 201:
-                    error_message = await resp.json()
-                    raise ToshiDocumentError(
-                        f"Could not add document for index {index_name}. Status code: {resp.status}. "
-                        f"Reason: {error_message['message']}"
-                    )
+    @traced("bulk_insert_columns")
+    @profiled("bulk_insert_columns")
+    async def bulk_insert_columns(
+        self,
+        index_name: str,
+        columns: dict[str, Sequence],
+        commit: bool = False,
+        chunk_size: Optional[int] = 10000,
+    ) -> dict[int, str]:
+        """
+        Inserts documents given column-wise, e.g. as lists or NumPy arrays per field.
+
+        The NDJSON body is formatted straight from the columns with the field types
+        of the index schema from the `catalog`, without a `Document` per row. Rows
+        are validated and coerced like with `bulk_insert_documents(validate=True)`.
+
+        Parameters
+        ----------
+        index_name : str
+            The index to write to.
+        columns : dict[str, Sequence]
+            The values per field name, all of the same length. `None` marks a
+            missing value.
+        commit : bool, default=False
+            Whether to commit the changes immediately.
+        chunk_size : int, optional, default=10000
+            The number of rows per `_bulk` request. All rows are sent in one request
+            if None.
+
+        Returns
+        -------
+        dict[int, str]
+            The reason per row left out by the validation.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If bulk inserting the documents fails.
+        ValueError
+            If the columns differ in length or a column is not part of the index.
+        """
+        index = await self.catalog.get_index(index_name)
+        num_rows = column_length(columns)
+        set_span_attributes(index=index_name, docs_count=num_rows)
+        columns, rejected = DocumentValidator(index).validate_columns(columns, num_rows)
+
+        lines = ndjson_lines(index, columns, num_rows, skip=set(rejected))
+        await self._send_bulk(
+            "bulk_insert_columns", index_name, ndjson_chunks(lines, chunk_size)
+        )
+
+        await self._invalidate(index_name)
+        if commit:
+            await self.flush(index_name)
+        return rejected
+
+    @traced("bulk_load")
+    @profiled("bulk_load")
+    async def bulk_load(
+        self,
+        index_name: str,
+        documents: Iterable[Document],
+        commit: bool = False,
+        chunk_size: int = 10000,
+        max_workers: Optional[int] = None,
+    ):
+        """
+        Inserts a large stream of documents, encoding them in worker processes.
+
+        Encoding NDJSON is CPU bound and limited to one core by the GIL. Here the
+        documents are encoded in chunks by a `ProcessPoolExecutor`, while the
+        chunks encoded before are sent. Use it for large loads, for a few thousand
+        documents `bulk_insert_documents` is faster.
+
+        Parameters
+        ----------
+        index_name : str
+            The index to write to.
+        documents : Iterable[Document]
+            The documents, consumed lazily. Their classes must be importable by the
+            worker processes, i.e. not defined locally.
+        commit : bool, default=False
+            Whether to commit the changes after all documents are sent.
+        chunk_size : int, default=10000
+            The number of documents per `_bulk` request.
+        max_workers : int, optional
+            The number of worker processes. Defaults to the number of CPUs.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If bulk inserting a chunk fails. The chunks sent before stay inserted.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        set_span_attributes(index=index_name)
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            # Two chunks per worker keep the workers busy while a chunk is sent
+            bodies = aserialize_in_pool(
+                executor, documents, chunk_size, 2 * max_workers
+            )
+            try:
+                await self._send_bulk("bulk_load", index_name, bodies)
+            finally:
+                await self._invalidate(index_name)
+        finally:
+            # Waiting for the workers to stop must not block the event loop
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
 
-                if commit:
-                    await self.flush(index_name)
+        if commit:
+            await self.flush(index_name)
 
+    @traced("get_documents")
+    @profiled("get_documents")
     async def get_documents(self, document: Type[Document]) -> list[Document]:
         """
         Retrieves all documents from the specified index.
@@ -490,20 +1453,26 @@ class AsyncToshiClient:
             If retrieving the documents fails.
         """
         index_url = f"{self._url}/{document.index_name()}/"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(index_url) as resp:
+        async with self._session() as session:
+            async with self._request(
+                session, "get_documents", document.index_name(), "get", index_url
+            ) as resp:
                 if resp.status != 200:
                     error_message = await resp.json()
                     raise ToshiDocumentError(
                         f"Could not get documents for index {document.index_name()}. Status code: {resp.status}. "
                         f"Reason: {error_message['message']}"
                     )
-                data = await resp.json()
-                documents = []
-                for doc in data["docs"]:
-                    documents.append(document(**doc["doc"]))
-                return documents
+                with timed_phase("decode"):
+                    data = await resp.json()
+        with timed_phase("materialize"):
+            documents = []
+            for doc in data["docs"]:
+                documents.append(document(**doc["doc"]))
+        return documents
 
+    @traced("delete_term")
+    @profiled("delete_term")
     async def delete_term(
         self,
         term_queries: list[TermQuery],
@@ -539,8 +1508,10 @@ class AsyncToshiClient:
             terms.update(tq.to_json()["query"]["term"])
 
         body = json.dumps(dict(terms=terms, options=dict(commit=commit)))
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(index_url, data=body) as resp:
+        async with self._session() as session:
+            async with self._request(
+                session, "delete_term", index_name, "delete", index_url, data=body
+            ) as resp:
                 if resp.status != 200:
                     error_message = await resp.json()
                     raise ToshiDocumentError(
@@ -549,8 +1520,77 @@ class AsyncToshiClient:
                     )
 
                 data = await resp.json()
-                return data["docs_affected"]
 
+        await self._invalidate(index_name)
+        return data["docs_affected"]
+
+    @traced("delete_terms")
+    @profiled("delete_terms")
+    async def delete_terms(
+        self,
+        terms: list[tuple[str, str]],
+        index_name: str,
+        commit: bool = False,
+        max_concurrency: int = 8,
+    ) -> BatchDeleteResult:
+        """
+        Deletes documents matching any of many terms from the specified index.
+
+        Duplicate terms are removed and the rest is grouped into requests holding at
+        most one term per field, which is what a single delete request supports. The
+        groups run concurrently and the index is committed once at the end.
+
+        Parameters
+        ----------
+        terms : list[tuple[str, str]]
+            The (field_name, term) pairs specifying the documents to delete.
+        index_name : str
+            The name of the index.
+        commit : bool, default=False
+            Whether to commit the changes after all groups ran.
+        max_concurrency : int, default=8
+            The maximum number of delete requests in flight at the same time.
+
+        Returns
+        -------
+        BatchDeleteResult
+            The summed number of affected documents and the result of each group.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If deleting the documents of a group fails.
+        ToshiFlushError
+            If the final commit fails.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(group: dict[str, str]) -> DeleteGroupResult:
+            term_queries = [TermQuery(term=t, field_name=f) for f, t in group.items()]
+            async with semaphore:
+                docs_affected = await self.delete_term(
+                    term_queries, index_name, commit=False
+                )
+            return DeleteGroupResult(terms=group, docs_affected=docs_affected)
+
+        async with self._session() as session:
+            token = _shared_session.set(session)
+            try:
+                groups = await asyncio.gather(
+                    *[run(group) for group in _group_terms(terms)]
+                )
+            finally:
+                _shared_session.reset(token)
+
+        if commit:
+            await self.flush(index_name)
+
+        return BatchDeleteResult(
+            docs_affected=sum(g.docs_affected for g in groups), groups=list(groups)
+        )
+
+    @traced("list_indexes")
+    @profiled("list_indexes")
     async def list_indexes(self) -> list[str]:
         """
         Lists all indexes on the Toshi server.
@@ -566,8 +1606,10 @@ class AsyncToshiClient:
             If listing the indexes fails.
         """
         list_index_url = f"{self._url}/_list/"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(list_index_url) as resp:
+        async with self._session() as session:
+            async with self._request(
+                session, "list_indexes", "", "get", list_index_url
+            ) as resp:
                 if resp.status != 200:
                     error_message = await resp.json()
                     raise ToshiIndexError(
@@ -577,6 +1619,8 @@ class AsyncToshiClient:
 
                 return await resp.json()
 
+    @traced("flush")
+    @profiled("flush")
     async def flush(self, index_name: str):
         """
         Flushes the specified index.
@@ -592,20 +1636,28 @@ class AsyncToshiClient:
             If flushing the index fails.
         """
         index_url = f"{self._url}/{index_name}/_flush/"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(index_url) as resp:
+        async with self._session() as session:
+            async with self._request(
+                session, "flush", index_name, "get", index_url
+            ) as resp:
                 if resp.status != 200:
                     raise ToshiFlushError(
                         f"Could not flush. Status code: {resp.status}. "
                     )
 
+        await self._invalidate(index_name)
+
+    @traced("search")
+    @profiled("search")
     async def search(
         self,
         query: Query,
         document_type: Type[Document],
         facet_query: Optional[list[FacetQuery]] = None,
         return_score: bool = False,
-    ) -> list[Union[Document, dict]]:
+        count_only: bool = False,
+        index_name: Optional[str] = None,
+    ) -> SearchResult:
         """
         Searches for documents in the specified index.
 
@@ -619,39 +1671,671 @@ class AsyncToshiClient:
             The facet queries for the search.
         return_score : bool, default=False
             Whether to return the scores along with the documents.
+        count_only : bool, default=False
+            If True, the returned documents are not decoded and only the hit count and
+            facet counts are returned.
+        index_name : str, optional
+            The index to search. Defaults to the document type's `index_name()`.
 
         Returns
         -------
-        list[Union[Document, dict[Document, float]]]
-            The list of documents or a list of dictionaries with documents and their scores.
+        SearchResult
+            The list of documents or a list of dictionaries with documents and their scores,
+            together with the hit count and facet counts.
 
         Raises
         ------
         ToshiClientError
             If the search fails.
         """
-        search_url = f"{self._url}/{document_type.index_name()}/"
+        index_name = index_name or document_type.index_name()
+        set_span_attributes(index=index_name, query_type=type(query).__name__)
+        json_data = await self._search_response(query, index_name, facet_query)
+        with timed_phase("materialize"):
+            result = _decode_search_result(
+                json_data, document_type, return_score, count_only
+            )
+        set_span_attributes(hits=result.hits, docs_count=len(result))
+        return result
+
+    async def _search_response(
+        self, query: Query, index_name: str, facet_query: Optional[list[FacetQuery]]
+    ) -> dict:
+        if self._validate_queries:
+            index = await self.catalog.get_index(index_name)
+            self._validator(index).validate(query, facet_query)
+
+        if self._optimize_queries:
+            query = optimize_query(query, self._merge_ranges)
+            if query is None:
+                return dict(hits=0, docs=[], facets=[])
+
+        with timed_phase("serialize"):
+            json_data = query.to_json()
+            if facet_query is not None:
+                json_data["facets"] = dict(
+                    ChainMap(*[f.to_json() for f in facet_query])
+                )
+            body = json.dumps(json_data)
+
+        cache_key = None
+        if self._cache is not None:
+            cache_key = self._cache.make_key(index_name, body)
+            cached = await self._cache.aget(cache_key)
+            if cached is not None:
+                return cached
+
+        if not self._single_flight:
+            json_data = await self._post_search(query, index_name, facet_query, body)
+        else:
+            key = (index_name, body)
+            search = self._in_flight.get(key)
+            if search is None:
+                # The search that starts the request may leave and close its shared
+                # session before the others are served, so the request has its own
+                search = asyncio.get_running_loop().create_task(
+                    self._post_search(query, index_name, facet_query, body),
+                    context=_without_shared_session(),
+                )
+                self._in_flight[key] = search
+                search.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            # Shielded, so a cancelled caller doesn't cancel the request of the others
+            json_data = await asyncio.shield(search)
+
+        if cache_key is not None:
+            await self._cache.aset(index_name, cache_key, json_data)
+
+        return json_data
+
+    async def _post_search(
+        self,
+        query: Query,
+        index_name: str,
+        facet_query: Optional[list[FacetQuery]],
+        body: str,
+    ) -> dict:
+        search_url = f"{self._url}/{index_name}/"
         headers = {"Content-Type": "application/json"}
 
-        json_data = query.to_json()
-        if facet_query is not None:
-            json_data["facets"] = dict(ChainMap(*[f.to_json() for f in facet_query]))
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                search_url, headers=headers, data=json.dumps(json_data)
+        started = time.perf_counter()
+        async with self._session() as session:
+            async with self._request(
+                session,
+                "search",
+                index_name,
+                "post",
+                search_url,
+                headers=headers,
+                data=body,
             ) as resp:
-                json_data = await resp.json()
+                with timed_phase("decode"):
+                    json_data = await resp.json()
+                if self._slow_query_log is not None:
+                    self._slow_query_log.record(
+                        index_name, query, facet_query, time.perf_counter() - started
+                    )
                 if "message" in json_data:
                     raise ToshiClientError(json_data["message"])
+        return json_data
+
+    @traced("federated_search")
+    @profiled("federated_search")
+    async def federated_search(
+        self,
+        query: Query,
+        document_types: list[Union[Type[Document], tuple[Type[Document], float]]],
+        k: int = 10,
+        max_concurrency: int = 8,
+    ) -> SearchResult:
+        """
+        Searches several indexes concurrently and merges their hits by score.
+
+        Only the k best hits over all indexes are decoded into documents.
+
+        Parameters
+        ----------
+        query : Query
+            The search query, sent to every index.
+        document_types : list[Union[Type[Document], tuple[Type[Document], float]]]
+            The document types of the searched indexes, optionally paired with a boost
+            their scores are multiplied with.
+        k : int, default=10
+            The number of hits to return.
+        max_concurrency : int, default=8
+            The maximum number of searches in flight at the same time.
+
+        Returns
+        -------
+        SearchResult
+            Dictionaries with the documents and their boosted scores, best first.
+
+        Raises
+        ------
+        ToshiClientError
+            If the search of an index fails.
+        ValueError
+            If k is negative.
+        """
+        targets = [_unpack_target(t) for t in document_types]
+        query = top_k_query(query, k)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(document_type: Type[Document]) -> dict:
+            async with semaphore:
+                return await self._search_response(
+                    query, document_type.index_name(), None
+                )
+
+        async with self._session() as session:
+            token = _shared_session.set(session)
+            try:
+                responses = await asyncio.gather(*[run(t) for t, _ in targets])
+            finally:
+                _shared_session.reset(token)
+
+        return merge_search_responses(
+            list(responses), [t for t, _ in targets], k, [b for _, b in targets]
+        )
+
+    @traced("mget")
+    @profiled("mget")
+    async def mget(
+        self,
+        document_type: Type[Document],
+        field_name: str,
+        keys: list,
+        batch_size: int = 512,
+        max_concurrency: int = 8,
+    ) -> dict:
+        """
+        Fetches documents by key.
+
+        The distinct keys are split into batches, each searched with one `BoolQuery`
+        holding a `should` clause per key. The batches run concurrently. Keys shared
+        by several documents can push the documents of other keys out of a batch,
+        those keys are searched again one by one.
+
+        Parameters
+        ----------
+        document_type : Type[Document]
+            The type of document to fetch.
+        field_name : str
+            The indexed field holding the keys, ideally unique per document.
+        keys : list
+            The keys of the documents to fetch.
+        batch_size : int, default=512
+            The maximum number of keys per search.
+        max_concurrency : int, default=8
+            The maximum number of searches in flight at the same time.
 
-                documents = []
-                for raw_doc in json_data["docs"]:
-                    doc = document_type(**raw_doc["doc"])
-                    if not return_score:
-                        documents.append(doc)
-                    else:
-                        raw_doc["doc"] = doc
-                        documents.append(raw_doc)
+        Returns
+        -------
+        dict
+            The found documents by key, in the order the keys were given. Keys without a
+            document are left out.
+
+        Raises
+        ------
+        ToshiClientError
+            If a search fails.
+        """
+        batches = _key_batches(keys, batch_size)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(batch: list) -> SearchResult:
+            async with semaphore:
+                return await self.search(
+                    _key_batch_query(field_name, batch), document_type
+                )
+
+        async with self._session() as session:
+            token = _shared_session.set(session)
+            try:
+                results = await asyncio.gather(*[run(batch) for batch in batches])
+                retries = [[k] for k in _pushed_out_keys(field_name, batches, results)]
+                results += await asyncio.gather(*[run(batch) for batch in retries])
+            finally:
+                _shared_session.reset(token)
+
+        return _documents_by_key(keys, field_name, results)
+
+    @traced("msearch")
+    @profiled("msearch")
+    async def msearch(
+        self,
+        searches: list[SearchRequest],
+        max_concurrency: int = 8,
+        return_score: bool = False,
+    ) -> list[Union[SearchResult, Exception]]:
+        """
+        Runs several searches concurrently over one shared session.
 
-                return documents
+        Parameters
+        ----------
+        searches : list[SearchRequest]
+            The searches as (query, document_type) or (query, document_type, facet_query) tuples.
+        max_concurrency : int, default=8
+            The maximum number of searches in flight at the same time.
+        return_score : bool, default=False
+            Whether to return the scores along with the documents.
+
+        Returns
+        -------
+        list[Union[SearchResult, Exception]]
+            For each search in input order, either its results or the exception it raised.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(search: SearchRequest):
+            async with semaphore:
+                return await self.search(
+                    *_unpack_search(search), return_score=return_score
+                )
+
+        async with self._session() as session:
+            token = _shared_session.set(session)
+            try:
+                return await asyncio.gather(
+                    *[run(search) for search in searches], return_exceptions=True
+                )
+            finally:
+                _shared_session.reset(token)
+
+    async def iter_search(
+        self,
+        query: Query,
+        document_type: Type[Document],
+        key_field: str,
+        start: int,
+        stop: int,
+        page_size: int = 1000,
+    ) -> AsyncIterator[Document]:
+        """
+        Iterates over all documents matching a query, page by page.
+
+        The key space [start, stop) of `key_field` is walked in windows, each fetched
+        with a `RangeQuery` merged into `query`. Windows shrink when a page would exceed
+        `page_size` and grow while pages stay sparse, so at most two pages are held in
+        memory. The next page is prefetched while the current one is consumed.
+
+        Parameters
+        ----------
+        query : Query
+            The search query.
+        document_type : Type[Document]
+            The type of document to search for.
+        key_field : str
+            An indexed integer field, ideally unique per document, used for paging.
+        start : int
+            The smallest key to include.
+        stop : int
+            The first key to exclude.
+        page_size : int, default=1000
+            The maximum number of documents per page.
+
+        Yields
+        ------
+        Document
+            The documents matching the query.
+
+        Raises
+        ------
+        ToshiClientError
+            If a search fails or more than `page_size` documents share a single key.
+        """
+        window = _KeysetWindow(start, stop, page_size)
+        if window.exhausted:
+            return
+
+        def fetch(lo: int, hi: int) -> asyncio.Task:
+            page_query = _keyset_page_query(query, key_field, lo, hi, page_size)
+            return asyncio.create_task(self.search(page_query, document_type))
+
+        pending = fetch(*window.bounds)
+        try:
+            while pending is not None:
+                page = await pending
+                if window.advance(len(page)):
+                    pending = fetch(*window.bounds)
+                    continue
+
+                pending = None
+                if not window.exhausted:
+                    pending = fetch(*window.bounds)
+                for doc in page:
+                    yield doc
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def _send_bulk(
+        self,
+        operation: str,
+        index_name: str,
+        bodies: Union[Iterable[str], AsyncIterable[bytes]],
+    ):
+        index_url = f"{self._url}/{index_name}/_bulk"
+        if not isinstance(bodies, AsyncIterable):
+            bodies = _as_async_iterable(bodies)
+        async with self._session() as session:
+            async for body_content in _timed_aiter(bodies, "serialize"):
+                async with self._request(
+                    session,
+                    operation,
+                    index_name,
+                    "post",
+                    index_url,
+                    span_attributes=self._chunk_attributes(body_content),
+                    data=body_content,
+                ) as resp:
+                    if resp.status != 201:
+                        error_message = await resp.json()
+                        raise ToshiDocumentError(
+                            f"Could not add document for index {index_name}. Status code: {resp.status}. "
+                            f"Reason: {error_message['message']}"
+                        )
+
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[Optional[aiohttp.ClientSession]]:
+        session = _shared_session.get() or self._client_session
+        if session is not None:
+            yield session
+        elif not self._transport.uses_session:
+            # E.g. a replay transport, opening a session would only add overhead
+            yield None
+        else:
+            async with aiohttp.ClientSession() as session:
+                yield session
+
+    @asynccontextmanager
+    async def _request(
+        self,
+        session: aiohttp.ClientSession,
+        operation: str,
+        index_name: str,
+        method: str,
+        url: str,
+        span_attributes: Optional[dict] = None,
+        **kwargs,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        if self._tracer is None:
+            async with self._send_request(
+                session, operation, index_name, method, url, **kwargs
+            ) as resp:
+                yield resp
+            return
+
+        attributes = _http_span_attributes(method, url, index_name, kwargs)
+        attributes.update(span_attributes or {})
+        with self._tracer.start_as_current_span(
+            "toshi.http", attributes=attributes
+        ) as span:
+            async with self._send_request(
+                session, operation, index_name, method, url, **kwargs
+            ) as resp:
+                span.set_attribute("http.response.status_code", resp.status)
+                span.set_attribute("toshi.response_bytes", resp.content_length or 0)
+                yield resp
+
+    @asynccontextmanager
+    async def _send_request(
+        self,
+        session: aiohttp.ClientSession,
+        operation: str,
+        index_name: str,
+        method: str,
+        url: str,
+        **kwargs,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        timings = current_timings()
+        if self._metrics is None and timings is None:
+            async with self._transport.request(session, method, url, **kwargs) as resp:
+                yield resp
+            return
+
+        started = time.perf_counter()
+        if self._metrics is not None:
+            self._metrics.start(operation, index_name)
+        resp = None
+        try:
+            async with self._transport.request(session, method, url, **kwargs) as resp:
+                # The body is read by the caller, which counts as decoding
+                if timings is not None:
+                    timings.add("network", time.perf_counter() - started, index_name)
+                yield resp
+        finally:
+            if self._metrics is not None:
+                self._metrics.finish(
+                    operation,
+                    index_name,
+                    started,
+                    None if resp is None else resp.status,
+                    _body_size(kwargs),
+                    0 if resp is None else resp.content_length or 0,
+                )
+
+    def _chunk_attributes(self, body: Union[str, bytes]) -> Optional[dict]:
+        if self._tracer is None:
+            return None
+        newline = b"\n" if isinstance(body, bytes) else "\n"
+        return {"toshi.docs_count": body.count(newline) + 1}
+
+    def _validator(self, index: Index) -> QueryValidator:
+        # A refreshed catalog hands out a new schema, which needs a new validator
+        validator = self._validators.get(index.name)
+        if validator is None or validator.index is not index:
+            validator = QueryValidator(index)
+            self._validators[index.name] = validator
+        return validator
+
+    async def _invalidate(self, index_name: str):
+        if self._cache is not None:
+            await self._cache.ainvalidate(index_name)
+
+
+def _without_shared_session() -> Context:
+    context = copy_context()
+    context.run(_shared_session.set, None)
+    return context
+
+
+def _decode_search_result(
+    json_data: dict, document_type: Type[Document], return_score: bool, count_only: bool
+) -> SearchResult:
+    facets = [
+        FacetCount(facet=f["field"], count=f["value"])
+        for f in json_data.get("facets", [])
+    ]
+    hits = json_data.get("hits", len(json_data["docs"]))
+    if count_only:
+        return SearchResult([], hits=hits, facets=facets)
+
+    documents = []
+    for raw_doc in json_data["docs"]:
+        doc = document_type(**raw_doc["doc"])
+        if not return_score:
+            documents.append(doc)
+        else:
+            # Don't modify raw_doc in place, it might be held by a cache
+            documents.append({**raw_doc, "doc": doc})
+
+    return SearchResult(documents, hits=hits, facets=facets)
+
+
+def _unpack_search(
+    search: SearchRequest,
+) -> tuple[Query, Type[Document], Optional[list[FacetQuery]]]:
+    query, document_type, *facet_query = search
+    return query, document_type, facet_query[0] if facet_query else None
+
+
+def _http_span_attributes(method: str, url: str, index_name: str, kwargs: dict) -> dict:
+    return {
+        "http.request.method": method.upper(),
+        "url.full": url,
+        "toshi.index": index_name,
+        "toshi.request_bytes": _body_size(kwargs),
+    }
+
+
+def _body_size(kwargs: dict) -> int:
+    if "data" in kwargs:
+        data = kwargs["data"]
+        return len(data.encode() if isinstance(data, str) else data)
+    if "json" in kwargs:
+        return len(json.dumps(kwargs["json"]).encode())
+    return 0
+
+
+def _timed_iter(items: Iterable, phase: str) -> Iterator:
+    # Lazily produced items, like encoded bulk bodies, count to the given phase
+    items = iter(items)
+    while True:
+        with timed_phase(phase):
+            item = next(items, _EXHAUSTED)
+        if item is _EXHAUSTED:
+            return
+        yield item
+
+
+async def _timed_aiter(items: AsyncIterable, phase: str) -> AsyncIterator:
+    items = aiter(items)
+    while True:
+        with timed_phase(phase):
+            item = await anext(items, _EXHAUSTED)
+        if item is _EXHAUSTED:
+            return
+        yield item
+
+
+async def _as_async_iterable(items: Iterable) -> AsyncIterator:
+    for item in items:
+        yield item
+
+
+def _group_terms(terms: list[tuple[str, str]]) -> list[dict[str, str]]:
+    # A delete request maps each field to a single term, so the n-th group holds
+    # the n-th distinct term of every field.
+    values_per_field: dict[str, dict[str, None]] = {}
+    for field_name, term in terms:
+        values_per_field.setdefault(field_name, {})[term] = None
+
+    groups = []
+    for field_name, values in values_per_field.items():
+        for i, term in enumerate(values):
+            if i == len(groups):
+                groups.append({})
+            groups[i][field_name] = term
+    return groups
+
+
+def _unpack_target(
+    target: Union[Type[Document], tuple[Type[Document], float]]
+) -> tuple[Type[Document], float]:
+    if isinstance(target, tuple):
+        return target
+    return target, 1.0
+
+
+def _key_batches(keys: list, batch_size: int) -> list[list]:
+    distinct = list(dict.fromkeys(keys))
+    return [distinct[i : i + batch_size] for i in range(0, len(distinct), batch_size)]
+
+
+def _key_batch_query(field_name: str, batch: list) -> BoolQuery:
+    query = BoolQuery(limit=len(batch))
+    for key in batch:
+        query.should_match(TermQuery(term=key, field_name=field_name))
+    return query
+
+
+def _pushed_out_keys(
+    field_name: str, batches: list[list], results: list[SearchResult]
+) -> list:
+    # The limit of a batch is its number of keys. Toshi reports the returned documents
+    # as hits, so only a full batch tells that documents may have been cut off.
+    pushed_out = []
+    for batch, result in zip(batches, results):
+        if len(result) < len(batch):
+            continue
+        found = {str(getattr(doc, field_name)) for doc in result}
+        pushed_out.extend(k for k in batch if str(k) not in found)
+    return pushed_out
+
+
+def _documents_by_key(keys: list, field_name: str, results: list[list[Document]]):
+    # Keys are compared as strings, the server may return e.g. numeric keys as ints
+    found = {}
+    for result in results:
+        for doc in result:
+            found.setdefault(str(getattr(doc, field_name)), doc)
+
+    documents = {}
+    for key in keys:
+        if str(key) in found:
+            documents[key] = found[str(key)]
+    return documents
+
+
+class _KeysetWindow:
+    """
+    Tracks the key window [lo, hi) walked by `iter_search`.
+
+    The first window spans `page_size` keys, which fit into a page if the keys are
+    unique. Sparse windows are widened by the density they showed, so the next one
+    is expected to fill three quarters of a page.
+    """
+
+    _EMPTY_GROWTH = 16
+    """The widening factor after an empty page, which tells nothing about density"""
+
+    def __init__(self, start: int, stop: int, page_size: int):
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1.")
+
+        self._lo = start
+        self._stop = stop
+        self._step = page_size
+        self._page_size = page_size
+
+    @property
+    def bounds(self) -> tuple[int, int]:
+        return self._lo, min(self._lo + self._step, self._stop)
+
+    @property
+    def exhausted(self) -> bool:
+        return self._lo >= self._stop
+
+    def advance(self, page_len: int) -> bool:
+        """
+        Moves on after a page was fetched. Returns True if the page overflowed and
+        has to be fetched again with a smaller window.
+        """
+        lo, hi = self.bounds
+        if page_len > self._page_size:
+            if hi - lo <= 1:
+                raise ToshiClientError(
+                    f"More than {self._page_size} documents share the key {lo}."
+                )
+            self._step = (hi - lo) // 2
+            return True
+
+        self._lo = hi
+        if page_len < self._page_size // 2:
+            if page_len == 0:
+                self._step *= self._EMPTY_GROWTH
+            else:
+                target = max(3 * self._page_size // 4, 1)
+                self._step = max(self._step * target // page_len, self._step + 1)
+        return False
+
+
+def _keyset_page_query(
+    query: Query, key_field: str, lo: int, hi: int, page_size: int
+) -> BoolQuery:
+    # One more hit than a page holds tells whether the window was truncated
+    return (
+        BoolQuery(limit=page_size + 1)
+        .must_match(query)
+        .must_match(RangeQuery(key_field, gte=lo, lt=hi))
+    )
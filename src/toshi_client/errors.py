@@ -16,3 +16,7 @@ class ToshiDocumentError(ToshiError):
 
 class ToshiFlushError(ToshiError):
     pass
+
+
+class ToshiQueryError(ToshiClientError):
+    pass
@@ -0,0 +1,246 @@
+import json
+import math
+from typing import Any, Optional, Sequence
+
+from toshi_client.index.enums import IndexFieldTypes
+from toshi_client.index.index import Index, IndexField
+from toshi_client.models.document import Document
+from toshi_client.models.results import DocumentValidation, RejectedDocument
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_INT_BOUNDS = {
+    IndexFieldTypes.U64: (0, 2**64 - 1),
+    IndexFieldTypes.I64: (-(2**63), 2**63 - 1),
+}
+
+
+class DocumentValidator:
+    """
+    Checks documents against an index schema before they are sent to the server.
+
+    Documents are checked column by column, so a column of well-typed values is
+    accepted with a few whole-column reductions. Only columns with suspicious values
+    are checked value by value. NumPy arrays are checked vectorized if NumPy is
+    installed.
+
+    Values are coerced the way the server would coerce them for fields with the
+    `coerce` option, e.g. `"42"` into a `u64` field or `42` into a text field.
+
+    Parameters
+    ----------
+    index : Index
+        The schema of the written index.
+    """
+
+    def __init__(self, index: Index):
+        self.index = index
+
+    def validate(self, documents: list[Document]) -> DocumentValidation:
+        """
+        Splits documents into the ones the server accepts and the ones it rejects.
+
+        Parameters
+        ----------
+        documents : list[Document]
+            The documents to validate. They are not modified.
+
+        Returns
+        -------
+        DocumentValidation
+            The JSON of the accepted documents with coerced values, and the rejected
+            documents with the reason.
+        """
+        rows = [doc.to_json() for doc in documents]
+        columns = {f.name: [row.get(f.name) for row in rows] for f in self.index.fields}
+        checked, errors = self.validate_columns(columns, len(rows))
+
+        for name, values in checked.items():
+            if values is columns[name]:
+                continue
+            for row, value in zip(rows, values):
+                if value is not None:
+                    row[name] = value
+        accepted = [row for i, row in enumerate(rows) if i not in errors]
+
+        rejected = [
+            RejectedDocument(document=documents[i], reason=reason)
+            for i, reason in sorted(errors.items())
+        ]
+        return DocumentValidation(documents=accepted, rejected=rejected)
+
+    def validate_columns(
+        self, columns: dict[str, Sequence], num_rows: int
+    ) -> tuple[dict[str, Sequence], dict[int, str]]:
+        """
+        Validates documents given as one sequence of values per field.
+
+        Parameters
+        ----------
+        columns : dict[str, Sequence]
+            The values per field name, `None` marks a missing value. Columns may be
+            lists or NumPy arrays.
+        num_rows : int
+            The number of documents.
+
+        Returns
+        -------
+        tuple[dict[str, Sequence], dict[int, str]]
+            The columns with coerced values and the rejection reason per row. Columns
+            without coerced values are returned as passed.
+
+        Raises
+        ------
+        ValueError
+            If a column is not part of the index.
+        """
+        fields = {f.name for f in self.index.fields}
+        for name in columns:
+            if name not in fields:
+                raise ValueError(
+                    f"The column {name} is not part of index {self.index.name}."
+                )
+
+        checked = {}
+        errors: dict[int, str] = {}
+        for field in self.index.fields:
+            values = columns.get(field.name)
+            if values is None:
+                values = [None] * num_rows
+            values, field_errors = _check_column(field, values)
+            checked[field.name] = values
+            for i, reason in field_errors.items():
+                errors.setdefault(i, reason)
+        return checked, errors
+
+
+def _check_column(
+    field: IndexField, values: Sequence
+) -> tuple[Sequence, dict[int, str]]:
+    # Schemas parsed by `IndexSummary.from_json` hold some types as plain strings
+    field_type = IndexFieldTypes(field.type)
+    if np is not None and isinstance(values, np.ndarray):
+        if _array_is_valid(field_type, values):
+            return values, {}
+        values = values.tolist()
+    elif _column_is_valid(field_type, values):
+        return values, {}
+
+    coerce = bool(getattr(field.options, "coerce", False))
+    coerced = list(values)
+    errors = {}
+    for i, value in enumerate(values):
+        if value is None:
+            if field.options.stored:
+                errors[i] = f"The stored field '{field.name}' is missing."
+            continue
+        if isinstance(value, list):
+            checked = [_check_value(field_type, v, coerce) for v in value]
+            ok = all(c is not _INVALID for c in checked)
+        else:
+            checked = _check_value(field_type, value, coerce)
+            ok = checked is not _INVALID
+        if ok:
+            coerced[i] = checked
+        else:
+            errors[i] = (
+                f"The field '{field.name}' expects {field_type.value} values, "
+                f"got {value!r}."
+            )
+    return coerced, errors
+
+
+def _column_is_valid(field_type: IndexFieldTypes, values: Sequence) -> bool:
+    # set(map(type, ...)) and the reductions below run in C, so a clean column is
+    # accepted without a Python level loop
+    types = set(map(type, values))
+    if not values:
+        return True
+    if field_type in _INT_BOUNDS:
+        lo, hi = _INT_BOUNDS[field_type]
+        return types == {int} and lo <= min(values) and max(values) <= hi
+    if field_type == IndexFieldTypes.F64:
+        if not types <= {int, float}:
+            return False
+        if np is not None:
+            return bool(np.isfinite(np.asarray(values, dtype=np.float64)).all())
+        return all(map(math.isfinite, values))
+    if field_type == IndexFieldTypes.BOOL:
+        return types == {bool}
+    if field_type == IndexFieldTypes.FACET:
+        return types == {str} and all(v.startswith("/") for v in values)
+    return types == {str}
+
+
+def _array_is_valid(field_type: IndexFieldTypes, values: "np.ndarray") -> bool:
+    if values.ndim != 1:
+        return False
+    kind = values.dtype.kind
+    if field_type in _INT_BOUNDS:
+        if kind not in "iu":
+            return False
+        if len(values) == 0:
+            return True
+        lo, hi = _INT_BOUNDS[field_type]
+        return lo <= int(values.min()) and int(values.max()) <= hi
+    if field_type == IndexFieldTypes.F64:
+        return kind in "iu" or (kind == "f" and bool(np.isfinite(values).all()))
+    if field_type == IndexFieldTypes.BOOL:
+        return kind == "b"
+    if field_type == IndexFieldTypes.TEXT:
+        return kind == "U"
+    return False
+
+
+class _Invalid:
+    pass
+
+
+_INVALID = _Invalid()
+
+
+def _check_value(field_type: IndexFieldTypes, value: Any, coerce: bool) -> Any:
+    if np is not None and isinstance(value, np.generic):
+        value = value.item()
+
+    if field_type in _INT_BOUNDS:
+        if coerce and isinstance(value, str):
+            value = _parse(int, value)
+        lo, hi = _INT_BOUNDS[field_type]
+        if type(value) is int and lo <= value <= hi:
+            return value
+        return _INVALID
+
+    if field_type == IndexFieldTypes.F64:
+        if coerce and isinstance(value, str):
+            value = _parse(float, value)
+        if type(value) in (int, float) and math.isfinite(value):
+            return value
+        return _INVALID
+
+    if field_type == IndexFieldTypes.BOOL:
+        if coerce and value in ("true", "false"):
+            return value == "true"
+        return value if type(value) is bool else _INVALID
+
+    if field_type == IndexFieldTypes.FACET:
+        if isinstance(value, str) and value.startswith("/"):
+            return value
+        return _INVALID
+
+    if isinstance(value, str):
+        return value
+    if coerce and type(value) in (int, float, bool):
+        # The server formats coerced values as JSON, e.g. `true` and not `True`
+        return json.dumps(value)
+    return _INVALID
+
+
+def _parse(number_type: type, value: str) -> Optional[Any]:
+    try:
+        return number_type(value.strip())
+    except ValueError:
+        return None
@@ -27,3 +27,12 @@ class IndexRecordOption(str, Enum):
     Records the document id, the term frequency, and the positions of the occurrences in the document.
     Positions are required to run a `PhraseQuery`.
     """
+
+
+class PartitionGranularity(str, Enum):
+    """
+    Enum representing the time span covered by one partition of a time partitioned index.
+    """
+
+    DAY = "day"
+    HOUR = "hour"
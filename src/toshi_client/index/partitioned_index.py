@@ -0,0 +1,524 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Type, TYPE_CHECKING
+
+from toshi_client.errors import ToshiDocumentError, ToshiIndexError
+from toshi_client.index.enums import PartitionGranularity
+from toshi_client.index.index import Index
+from toshi_client.merge import merge_search_responses, top_k_query
+from toshi_client.models.document import Document
+from toshi_client.models.query import Query
+from toshi_client.models.results import SearchResult
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.range_query import RangeQuery
+from toshi_client.tracing import in_current_context
+
+if TYPE_CHECKING:
+    from toshi_client.client import ToshiClient, AsyncToshiClient
+
+
+_FORMATS = {
+    PartitionGranularity.DAY: "%Y-%m-%d",
+    PartitionGranularity.HOUR: "%Y-%m-%d-%H",
+}
+_LENGTHS = {
+    PartitionGranularity.DAY: timedelta(days=1),
+    PartitionGranularity.HOUR: timedelta(hours=1),
+}
+
+
+class _Partitioning:
+    """Maps timestamps in epoch seconds to the partitions of a partitioned index."""
+
+    def __init__(
+        self,
+        index: Index,
+        timestamp_field: str,
+        granularity: PartitionGranularity,
+        retention: Optional[timedelta],
+    ):
+        if timestamp_field not in [f.name for f in index.fields]:
+            raise ValueError(
+                f"The timestamp field {timestamp_field} is not part of the index."
+            )
+
+        self.index = index
+        self.timestamp_field = timestamp_field
+        self.granularity = PartitionGranularity(granularity)
+        self.retention = retention
+        self.known: Optional[set[str]] = None
+        self.dropped: set[str] = set()
+
+    def name_of(self, timestamp: int) -> str:
+        start = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        return f"{self.index.name}-{start.strftime(_FORMATS[self.granularity])}"
+
+    def start_of(self, name: str) -> Optional[datetime]:
+        prefix = f"{self.index.name}-"
+        if not name.startswith(prefix):
+            return None
+        try:
+            start = datetime.strptime(name[len(prefix) :], _FORMATS[self.granularity])
+        except ValueError:
+            return None
+        return start.replace(tzinfo=timezone.utc)
+
+    def load(self, index_names: list[str]):
+        self.known = {
+            name
+            for name in index_names
+            if self.start_of(name) is not None and name not in self.dropped
+        }
+
+    def partition(self, name: str) -> Index:
+        return Index(name=name, fields=self.index.fields)
+
+    def group(self, documents: list[Document]) -> dict[str, list[Document]]:
+        groups: dict[str, list[Document]] = {}
+        for doc in documents:
+            name = self.name_of(getattr(doc, self.timestamp_field))
+            groups.setdefault(name, []).append(doc)
+        return groups
+
+    def prune(self, query: Query) -> list[str]:
+        lower, upper = self._bounds(query)
+        length = _LENGTHS[self.granularity]
+        selected = []
+        for name in sorted(self.known):
+            start = self.start_of(name).timestamp()
+            end = start + length.total_seconds()
+            if lower is not None and end <= lower:
+                continue
+            if upper is not None:
+                bound, inclusive = upper
+                if start > bound or (start == bound and not inclusive):
+                    continue
+            selected.append(name)
+        return selected
+
+    def expired(self, now: datetime) -> list[str]:
+        if self.retention is None:
+            return []
+        cutoff = now - self.retention
+        length = _LENGTHS[self.granularity]
+        return sorted(n for n in self.known if self.start_of(n) + length <= cutoff)
+
+    def _bounds(
+        self, query: Query
+    ) -> tuple[Optional[float], Optional[tuple[float, bool]]]:
+        # Only ranges every hit has to satisfy can prune partitions. The upper bound
+        # comes with whether it is inclusive, the exclusive one wins a tie.
+        if type(query) is RangeQuery:
+            ranges = [query]
+        elif isinstance(query, BoolQuery):
+            ranges = [q for q in query._must if type(q) is RangeQuery]
+        else:
+            ranges = []
+
+        lowers, uppers = [], []
+        for r in ranges:
+            if r._field_name != self.timestamp_field:
+                continue
+            lowers += [v for v in (r._gte, r._gt) if v is not None]
+            uppers += [
+                (v, inclusive)
+                for v, inclusive in ((r._lte, True), (r._lt, False))
+                if v is not None
+            ]
+        return max(lowers, default=None), min(uppers, default=None)
+
+
+class TimePartitionedIndex:
+    """
+    An index split into one physical index per day or hour.
+
+    Partitions are named `<index name>-<start>`, e.g. `events-2026-10-17`, and are
+    created from the same schema the first time a document falls into them. Searches
+    only go to the partitions overlapping the `RangeQuery` on the timestamp field and
+    run concurrently.
+
+    Toshi has no endpoint for removing indexes, so retention only detaches expired
+    partitions from this instance: they are no longer searched or written to, and
+    their names are returned for removal on the server. The detachment isn't stored
+    anywhere, so a new instance lists the partitions again until its own
+    `drop_expired` runs.
+
+    Parameters
+    ----------
+    client : ToshiClient
+        The client of the node holding the partitions.
+    index : Index
+        The schema of the logical index, e.g. built with an `IndexBuilder`.
+    timestamp_field : str
+        A numeric field holding the event time in epoch seconds (UTC).
+    granularity : PartitionGranularity, default=PartitionGranularity.DAY
+        The time span covered by one partition.
+    retention : timedelta, optional
+        How long partitions are kept. Keeps all partitions if not given.
+    max_concurrency : int, default=8
+        The maximum number of partitions searched at the same time.
+    """
+
+    def __init__(
+        self,
+        client: "ToshiClient",
+        index: Index,
+        timestamp_field: str,
+        granularity: PartitionGranularity = PartitionGranularity.DAY,
+        retention: Optional[timedelta] = None,
+        max_concurrency: int = 8,
+    ):
+        self._client = client
+        self._partitioning = _Partitioning(
+            index, timestamp_field, granularity, retention
+        )
+        self._max_concurrency = max_concurrency
+        self._create_lock = threading.Lock()
+
+    def partitions(self) -> list[str]:
+        """Returns the names of all live partitions, oldest first."""
+        return sorted(self._known())
+
+    def refresh(self):
+        """Reloads the existing partitions from the server."""
+        self._partitioning.load(self._client.list_indexes())
+
+    def add_document(self, document: Document, commit: Optional[bool] = False):
+        """
+        Adds a document to the partition of its timestamp.
+
+        Parameters
+        ----------
+        document : Document
+            The document to be added.
+        commit : Optional[bool], default=False
+            Whether to commit the changes immediately.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If adding the document fails.
+        """
+        timestamp = getattr(document, self._partitioning.timestamp_field)
+        name = self._ensure(self._partitioning.name_of(timestamp))
+        self._client.add_document(document, commit=commit, index_name=name)
+
+    def bulk_insert_documents(self, documents: list[Document], commit: bool = False):
+        """
+        Inserts multiple documents, sending one bulk request per partition.
+
+        Parameters
+        ----------
+        documents : list[Document]
+            The documents to be inserted.
+        commit : bool, default=False
+            Whether to commit the changes immediately.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If bulk inserting the documents of a partition fails.
+        """
+        for name, docs in self._partitioning.group(documents).items():
+            self._client.bulk_insert_documents(
+                docs, commit=commit, index_name=self._ensure(name)
+            )
+
+    def search(
+        self,
+        query: Query,
+        document_type: Type[Document],
+        k: int = 10,
+        facet_query: Optional[list[FacetQuery]] = None,
+    ) -> SearchResult:
+        """
+        Searches the partitions overlapping the query's time range.
+
+        Parameters
+        ----------
+        query : Query
+            The search query. A `RangeQuery` on the timestamp field, alone or as a
+            `must` clause of a `BoolQuery`, limits the searched partitions.
+        document_type : Type[Document]
+            The type of document to search for.
+        k : int, default=10
+            The number of hits to return.
+        facet_query : list[FacetQuery], optional
+            The facet queries for the search. Their counts are summed over all
+            searched partitions.
+
+        Returns
+        -------
+        SearchResult
+            Dictionaries with the documents and their scores, best first.
+
+        Raises
+        ------
+        ToshiClientError
+            If the search of a partition fails.
+        """
+        self._known()
+        names = self._partitioning.prune(query)
+        query = top_k_query(query, k)
+
+        def run(name: str) -> dict:
+            return self._client._search_response(query, name, facet_query)
+
+        with ThreadPoolExecutor(max_workers=self._max_concurrency) as executor:
+            responses = list(executor.map(in_current_context(run), names))
+
+        return merge_search_responses(responses, [document_type] * len(names), k)
+
+    def drop_expired(self, now: Optional[datetime] = None) -> list[str]:
+        """
+        Detaches all partitions which fell out of the retention period.
+
+        The partitions are only detached from this instance, their indexes stay on
+        the server until they are removed there.
+
+        Parameters
+        ----------
+        now : datetime, optional
+            The reference time. Defaults to the current time.
+
+        Returns
+        -------
+        list[str]
+            The names of the detached partitions.
+        """
+        self._known()
+        expired = self._partitioning.expired(now or datetime.now(tz=timezone.utc))
+        self._partitioning.dropped.update(expired)
+        self._partitioning.known.difference_update(expired)
+        return expired
+
+    def _known(self) -> set[str]:
+        if self._partitioning.known is None:
+            self.refresh()
+        return self._partitioning.known
+
+    def _ensure(self, name: str) -> str:
+        if name in self._partitioning.dropped:
+            raise ToshiDocumentError(f"The partition {name} is past its retention.")
+        if name not in self._known():
+            # Concurrent writers to a new partition must create it only once
+            with self._create_lock:
+                if name not in self._partitioning.known:
+                    self._create(name)
+        return name
+
+    def _create(self, name: str):
+        try:
+            self._client.create_index(self._partitioning.partition(name))
+        except ToshiIndexError:
+            # Another writer, e.g. a worker of another process, may have won the race
+            self.refresh()
+            if name not in self._partitioning.known:
+                raise
+        else:
+            self._partitioning.known.add(name)
+
+
+class AsyncTimePartitionedIndex:
+    """
+    An index split into one physical index per day or hour.
+
+    Partitions are named `<index name>-<start>`, e.g. `events-2026-10-17`, and are
+    created from the same schema the first time a document falls into them. Searches
+    only go to the partitions overlapping the `RangeQuery` on the timestamp field and
+    run concurrently.
+
+    Toshi has no endpoint for removing indexes, so retention only detaches expired
+    partitions from this instance: they are no longer searched or written to, and
+    their names are returned for removal on the server. The detachment isn't stored
+    anywhere, so a new instance lists the partitions again until its own
+    `drop_expired` runs.
+
+    Parameters
+    ----------
+    client : AsyncToshiClient
+        The client of the node holding the partitions.
+    index : Index
+        The schema of the logical index, e.g. built with an `IndexBuilder`.
+    timestamp_field : str
+        A numeric field holding the event time in epoch seconds (UTC).
+    granularity : PartitionGranularity, default=PartitionGranularity.DAY
+        The time span covered by one partition.
+    retention : timedelta, optional
+        How long partitions are kept. Keeps all partitions if not given.
+    max_concurrency : int, default=8
+        The maximum number of partitions searched at the same time.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncToshiClient",
+        index: Index,
+        timestamp_field: str,
+        granularity: PartitionGranularity = PartitionGranularity.DAY,
+        retention: Optional[timedelta] = None,
+        max_concurrency: int = 8,
+    ):
+        self._client = client
+        self._partitioning = _Partitioning(
+            index, timestamp_field, granularity, retention
+        )
+        self._max_concurrency = max_concurrency
+        self._creating: dict[str, asyncio.Task] = {}
+
+    async def partitions(self) -> list[str]:
+        """Returns the names of all live partitions, oldest first."""
+        return sorted(await self._known())
+
+    async def refresh(self):
+        """Reloads the existing partitions from the server."""
+        self._partitioning.load(await self._client.list_indexes())
+
+    async def add_document(self, document: Document, commit: Optional[bool] = False):
+        """
+        Adds a document to the partition of its timestamp.
+
+        Parameters
+        ----------
+        document : Document
+            The document to be added.
+        commit : Optional[bool], default=False
+            Whether to commit the changes immediately.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If adding the document fails.
+        """
+        timestamp = getattr(document, self._partitioning.timestamp_field)
+        name = await self._ensure(self._partitioning.name_of(timestamp))
+        await self._client.add_document(document, commit=commit, index_name=name)
+
+    async def bulk_insert_documents(
+        self, documents: list[Document], commit: bool = False
+    ):
+        """
+        Inserts multiple documents, sending one bulk request per partition.
+
+        Parameters
+        ----------
+        documents : list[Document]
+            The documents to be inserted.
+        commit : bool, default=False
+            Whether to commit the changes immediately.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If bulk inserting the documents of a partition fails.
+        """
+        groups = self._partitioning.group(documents)
+        for name in groups:
+            await self._ensure(name)
+
+        await asyncio.gather(
+            *[
+                self._client.bulk_insert_documents(docs, commit=commit, index_name=name)
+                for name, docs in groups.items()
+            ]
+        )
+
+    async def search(
+        self,
+        query: Query,
+        document_type: Type[Document],
+        k: int = 10,
+        facet_query: Optional[list[FacetQuery]] = None,
+    ) -> SearchResult:
+        """
+        Searches the partitions overlapping the query's time range.
+
+        Parameters
+        ----------
+        query : Query
+            The search query. A `RangeQuery` on the timestamp field, alone or as a
+            `must` clause of a `BoolQuery`, limits the searched partitions.
+        document_type : Type[Document]
+            The type of document to search for.
+        k : int, default=10
+            The number of hits to return.
+        facet_query : list[FacetQuery], optional
+            The facet queries for the search. Their counts are summed over all
+            searched partitions.
+
+        Returns
+        -------
+        SearchResult
+            Dictionaries with the documents and their scores, best first.
+
+        Raises
+        ------
+        ToshiClientError
+            If the search of a partition fails.
+        """
+        await self._known()
+        names = self._partitioning.prune(query)
+        query = top_k_query(query, k)
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def run(name: str) -> dict:
+            async with semaphore:
+                return await self._client._search_response(query, name, facet_query)
+
+        responses = await asyncio.gather(*[run(name) for name in names])
+        return merge_search_responses(list(responses), [document_type] * len(names), k)
+
+    async def drop_expired(self, now: Optional[datetime] = None) -> list[str]:
+        """
+        Detaches all partitions which fell out of the retention period.
+
+        The partitions are only detached from this instance, their indexes stay on
+        the server until they are removed there.
+
+        Parameters
+        ----------
+        now : datetime, optional
+            The reference time. Defaults to the current time.
+
+        Returns
+        -------
+        list[str]
+            The names of the detached partitions.
+        """
+        await self._known()
+        expired = self._partitioning.expired(now or datetime.now(tz=timezone.utc))
+        self._partitioning.dropped.update(expired)
+        self._partitioning.known.difference_update(expired)
+        return expired
+
+    async def _known(self) -> set[str]:
+        if self._partitioning.known is None:
+            await self.refresh()
+        return self._partitioning.known
+
+    async def _ensure(self, name: str) -> str:
+        if name in self._partitioning.dropped:
+            raise ToshiDocumentError(f"The partition {name} is past its retention.")
+        if name not in await self._known():
+            # Concurrent writers to a new partition wait for the same creation
+            creating = self._creating.get(name)
+            if creating is None:
+                creating = asyncio.ensure_future(self._create(name))
+                self._creating[name] = creating
+                creating.add_done_callback(lambda _: self._creating.pop(name, None))
+            await asyncio.shield(creating)
+        return name
+
+    async def _create(self, name: str):
+        try:
+            await self._client.create_index(self._partitioning.partition(name))
+        except ToshiIndexError:
+            # Another writer, e.g. a worker of another process, may have won the race
+            await self.refresh()
+            if name not in self._partitioning.known:
+                raise
+        else:
+            self._partitioning.known.add(name)
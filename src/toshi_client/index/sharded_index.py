@@ -0,0 +1,430 @@
+import asyncio
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Type, TYPE_CHECKING
+
+from toshi_client.index.index import Index
+from toshi_client.merge import merge_search_responses, top_k_query
+from toshi_client.models.document import Document
+from toshi_client.models.query import Query
+from toshi_client.models.results import SearchResult
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.term_query import TermQuery
+from toshi_client.tracing import in_current_context
+
+if TYPE_CHECKING:
+    from toshi_client.client import ToshiClient, AsyncToshiClient
+
+
+class _Sharding:
+    """Maps the keys of a sharded index to its physical shards."""
+
+    def __init__(self, index: Index, key_field: str, num_shards: int, nodes: list):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1.")
+        if not nodes:
+            raise ValueError("At least one node is needed.")
+        if key_field not in [f.name for f in index.fields]:
+            raise ValueError(f"The key field {key_field} is not part of the index.")
+
+        self.index = index
+        self.key_field = key_field
+        self.shards = [
+            Index(name=f"{index.name}-shard-{i}", fields=index.fields)
+            for i in range(num_shards)
+        ]
+        # Shards are spread round-robin over the nodes
+        self.nodes = [nodes[i % len(nodes)] for i in range(num_shards)]
+
+    def shard_of(self, key: Any) -> int:
+        # crc32 is stable across processes, unlike hash() on strings
+        return zlib.crc32(str(key).encode()) % len(self.shards)
+
+    def group(self, documents: list[Document]) -> dict[int, list[Document]]:
+        groups: dict[int, list[Document]] = {}
+        for doc in documents:
+            shard = self.shard_of(getattr(doc, self.key_field))
+            groups.setdefault(shard, []).append(doc)
+        return groups
+
+
+class ShardedIndex:
+    """
+    An index split into several physical indexes, possibly on different nodes.
+
+    Every shard is created from the same schema and named `<index name>-shard-<n>`.
+    Documents are routed to a shard by a hash of their key field, searches are sent
+    to all shards concurrently and merged by score.
+
+    Parameters
+    ----------
+    index : Index
+        The schema of the logical index, e.g. built with an `IndexBuilder`.
+    key_field : str
+        The field whose value decides the shard of a document.
+    num_shards : int
+        The number of physical indexes.
+    nodes : list[ToshiClient]
+        The clients of the nodes the shards are spread over.
+    """
+
+    def __init__(
+        self, index: Index, key_field: str, num_shards: int, nodes: list["ToshiClient"]
+    ):
+        self._sharding = _Sharding(index, key_field, num_shards, nodes)
+        self._executor = ThreadPoolExecutor(max_workers=num_shards)
+
+    @property
+    def shards(self) -> list[Index]:
+        """The physical indexes of this index."""
+        return self._sharding.shards
+
+    def shard_of(self, key: Any) -> int:
+        """Returns the position of the shard holding the documents with `key`."""
+        return self._sharding.shard_of(key)
+
+    def create(self):
+        """
+        Creates all shards on their nodes.
+
+        Raises
+        ------
+        ToshiIndexError
+            If creating a shard fails.
+        """
+        self._run(lambda shard, node: node.create_index(shard), range(len(self.shards)))
+
+    def add_document(self, document: Document, commit: Optional[bool] = False):
+        """
+        Adds a document to the shard of its key.
+
+        Parameters
+        ----------
+        document : Document
+            The document to be added.
+        commit : Optional[bool], default=False
+            Whether to commit the changes immediately.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If adding the document fails.
+        """
+        pos = self.shard_of(getattr(document, self._sharding.key_field))
+        self._sharding.nodes[pos].add_document(
+            document, commit=commit, index_name=self.shards[pos].name
+        )
+
+    def bulk_insert_documents(self, documents: list[Document], commit: bool = False):
+        """
+        Inserts multiple documents, sending one bulk request per affected shard.
+
+        Parameters
+        ----------
+        documents : list[Document]
+            The documents to be inserted.
+        commit : bool, default=False
+            Whether to commit the changes immediately.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If bulk inserting the documents of a shard fails.
+        """
+        groups = self._sharding.group(documents)
+        by_shard = {self.shards[pos].name: docs for pos, docs in groups.items()}
+        self._run(
+            lambda shard, node: node.bulk_insert_documents(
+                by_shard[shard.name], commit=commit, index_name=shard.name
+            ),
+            groups,
+        )
+
+    def search(
+        self,
+        query: Query,
+        document_type: Type[Document],
+        k: int = 10,
+        facet_query: Optional[list[FacetQuery]] = None,
+    ) -> SearchResult:
+        """
+        Searches all shards concurrently and merges their hits by score.
+
+        Parameters
+        ----------
+        query : Query
+            The search query.
+        document_type : Type[Document]
+            The type of document to search for.
+        k : int, default=10
+            The number of hits to return.
+        facet_query : list[FacetQuery], optional
+            The facet queries for the search. Their counts are summed over all shards.
+
+        Returns
+        -------
+        SearchResult
+            Dictionaries with the documents and their scores, best first.
+
+        Raises
+        ------
+        ToshiClientError
+            If the search of a shard fails.
+        """
+        query = top_k_query(query, k)
+        responses = self._run(
+            lambda shard, node: node._search_response(query, shard.name, facet_query),
+            range(len(self.shards)),
+        )
+        return merge_search_responses(responses, [document_type] * len(responses), k)
+
+    def delete_term(
+        self,
+        term_queries: list[TermQuery],
+        key: Optional[Any] = None,
+        commit: Optional[bool] = False,
+    ) -> int:
+        """
+        Deletes documents based on term queries.
+
+        Parameters
+        ----------
+        term_queries : list[TermQuery]
+            The term queries specifying the documents to delete.
+        key : Any, optional
+            The key of the deleted documents. If given, only its shard is asked,
+            otherwise the delete is sent to all shards.
+        commit : Optional[bool], default=False
+            Whether to commit the changes immediately.
+
+        Returns
+        -------
+        int
+            The number of documents affected.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If deleting the documents fails.
+        """
+        positions = range(len(self.shards)) if key is None else [self.shard_of(key)]
+        affected = self._run(
+            lambda shard, node: node.delete_term(term_queries, shard.name, commit),
+            positions,
+        )
+        return sum(affected)
+
+    def flush(self):
+        """
+        Flushes all shards.
+
+        Raises
+        ------
+        ToshiFlushError
+            If flushing a shard fails.
+        """
+        self._run(lambda shard, node: node.flush(shard.name), range(len(self.shards)))
+
+    def close(self):
+        """Shuts down the worker threads."""
+        self._executor.shutdown()
+
+    def _run(self, fn, positions) -> list:
+        fn = in_current_context(fn)
+        futures = [
+            self._executor.submit(fn, self.shards[pos], self._sharding.nodes[pos])
+            for pos in positions
+        ]
+        return [f.result() for f in futures]
+
+
+class AsyncShardedIndex:
+    """
+    An index split into several physical indexes, possibly on different nodes.
+
+    Every shard is created from the same schema and named `<index name>-shard-<n>`.
+    Documents are routed to a shard by a hash of their key field, searches are sent
+    to all shards concurrently and merged by score.
+
+    Parameters
+    ----------
+    index : Index
+        The schema of the logical index, e.g. built with an `IndexBuilder`.
+    key_field : str
+        The field whose value decides the shard of a document.
+    num_shards : int
+        The number of physical indexes.
+    nodes : list[AsyncToshiClient]
+        The clients of the nodes the shards are spread over.
+    """
+
+    def __init__(
+        self,
+        index: Index,
+        key_field: str,
+        num_shards: int,
+        nodes: list["AsyncToshiClient"],
+    ):
+        self._sharding = _Sharding(index, key_field, num_shards, nodes)
+
+    @property
+    def shards(self) -> list[Index]:
+        """The physical indexes of this index."""
+        return self._sharding.shards
+
+    def shard_of(self, key: Any) -> int:
+        """Returns the position of the shard holding the documents with `key`."""
+        return self._sharding.shard_of(key)
+
+    async def create(self):
+        """
+        Creates all shards on their nodes.
+
+        Raises
+        ------
+        ToshiIndexError
+            If creating a shard fails.
+        """
+        await self._run(
+            lambda shard, node: node.create_index(shard), range(len(self.shards))
+        )
+
+    async def add_document(self, document: Document, commit: Optional[bool] = False):
+        """
+        Adds a document to the shard of its key.
+
+        Parameters
+        ----------
+        document : Document
+            The document to be added.
+        commit : Optional[bool], default=False
+            Whether to commit the changes immediately.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If adding the document fails.
+        """
+        pos = self.shard_of(getattr(document, self._sharding.key_field))
+        await self._sharding.nodes[pos].add_document(
+            document, commit=commit, index_name=self.shards[pos].name
+        )
+
+    async def bulk_insert_documents(
+        self, documents: list[Document], commit: bool = False
+    ):
+        """
+        Inserts multiple documents, sending one bulk request per affected shard.
+
+        Parameters
+        ----------
+        documents : list[Document]
+            The documents to be inserted.
+        commit : bool, default=False
+            Whether to commit the changes immediately.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If bulk inserting the documents of a shard fails.
+        """
+        groups = self._sharding.group(documents)
+        by_shard = {self.shards[pos].name: docs for pos, docs in groups.items()}
+        await self._run(
+            lambda shard, node: node.bulk_insert_documents(
+                by_shard[shard.name], commit=commit, index_name=shard.name
+            ),
+            groups,
+        )
+
+    async def search(
+        self,
+        query: Query,
+        document_type: Type[Document],
+        k: int = 10,
+        facet_query: Optional[list[FacetQuery]] = None,
+    ) -> SearchResult:
+        """
+        Searches all shards concurrently and merges their hits by score.
+
+        Parameters
+        ----------
+        query : Query
+            The search query.
+        document_type : Type[Document]
+            The type of document to search for.
+        k : int, default=10
+            The number of hits to return.
+        facet_query : list[FacetQuery], optional
+            The facet queries for the search. Their counts are summed over all shards.
+
+        Returns
+        -------
+        SearchResult
+            Dictionaries with the documents and their scores, best first.
+
+        Raises
+        ------
+        ToshiClientError
+            If the search of a shard fails.
+        """
+        query = top_k_query(query, k)
+        responses = await self._run(
+            lambda shard, node: node._search_response(query, shard.name, facet_query),
+            range(len(self.shards)),
+        )
+        return merge_search_responses(responses, [document_type] * len(responses), k)
+
+    async def delete_term(
+        self,
+        term_queries: list[TermQuery],
+        key: Optional[Any] = None,
+        commit: Optional[bool] = False,
+    ) -> int:
+        """
+        Deletes documents based on term queries.
+
+        Parameters
+        ----------
+        term_queries : list[TermQuery]
+            The term queries specifying the documents to delete.
+        key : Any, optional
+            The key of the deleted documents. If given, only its shard is asked,
+            otherwise the delete is sent to all shards.
+        commit : Optional[bool], default=False
+            Whether to commit the changes immediately.
+
+        Returns
+        -------
+        int
+            The number of documents affected.
+
+        Raises
+        ------
+        ToshiDocumentError
+            If deleting the documents fails.
+        """
+        positions = range(len(self.shards)) if key is None else [self.shard_of(key)]
+        affected = await self._run(
+            lambda shard, node: node.delete_term(term_queries, shard.name, commit),
+            positions,
+        )
+        return sum(affected)
+
+    async def flush(self):
+        """
+        Flushes all shards.
+
+        Raises
+        ------
+        ToshiFlushError
+            If flushing a shard fails.
+        """
+        await self._run(
+            lambda shard, node: node.flush(shard.name), range(len(self.shards))
+        )
+
+    async def _run(self, fn, positions) -> list:
+        return await asyncio.gather(
+            *[fn(self.shards[pos], self._sharding.nodes[pos]) for pos in positions]
+        )
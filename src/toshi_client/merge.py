@@ -0,0 +1,137 @@
+import heapq
+from typing import Optional, Type
+
+from toshi_client.models.document import Document
+from toshi_client.models.query import Query
+from toshi_client.models.results import SearchResult, FacetCount
+from toshi_client.query.bool_query import BoolQuery
+
+
+def top_k_query(query: Query, k: int) -> Query:
+    """
+    Makes sure a query returns at least k hits per searched index, which is needed
+    for a merged top k to be exact.
+
+    Parameters
+    ----------
+    query : Query
+        The search query.
+    k : int
+        The number of hits needed.
+
+    Returns
+    -------
+    Query
+        The query itself if its limit suffices, otherwise the query wrapped into a
+        `BoolQuery` with limit k, which scores the same.
+
+    Raises
+    ------
+    ValueError
+        If k is negative.
+    """
+    if k < 0:
+        raise ValueError("k must not be negative.")
+    if query._limit is not None and query._limit >= k:
+        return query
+    return BoolQuery(limit=k).must_match(query)
+
+
+def merge_top_k(
+    responses: list[dict], k: int, boosts: Optional[list[float]] = None
+) -> list[tuple[float, int, dict]]:
+    """
+    Selects the k best scored hits of several search responses.
+
+    A min-heap of size k is kept instead of sorting the union of all hits. Since Toshi
+    returns the hits of a response ranked by score, the remaining hits of a response
+    are skipped as soon as one of them can't enter the heap anymore.
+
+    Parameters
+    ----------
+    responses : list[dict]
+        The raw search responses.
+    k : int
+        The number of hits to select.
+    boosts : list[float], optional
+        A factor per response which its scores are multiplied with. Defaults to 1.0.
+
+    Returns
+    -------
+    list[tuple[float, int, dict]]
+        The (boosted score, response position, raw hit) of the selected hits, best first.
+
+    Raises
+    ------
+    ValueError
+        If k is negative.
+    """
+    if k < 0:
+        raise ValueError("k must not be negative.")
+    if k == 0:
+        return []
+
+    heap = []
+    seq = 0
+    for pos, response in enumerate(responses):
+        boost = boosts[pos] if boosts is not None else 1.0
+        for raw_doc in response["docs"]:
+            score = raw_doc["score"] * boost
+            # seq breaks ties, so the raw hits themselves are never compared
+            entry = (score, seq, pos, raw_doc)
+            seq += 1
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif score > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+            else:
+                break
+
+    heap.sort(key=lambda e: (-e[0], e[1]))
+    return [(score, pos, raw_doc) for score, _, pos, raw_doc in heap]
+
+
+def merge_search_responses(
+    responses: list[dict],
+    document_types: list[Type[Document]],
+    k: int,
+    boosts: Optional[list[float]] = None,
+) -> SearchResult:
+    """
+    Merges several search responses into one result holding the k best hits.
+
+    Only the selected hits are decoded. Hit counts and facet counts are summed over
+    all responses.
+
+    Parameters
+    ----------
+    responses : list[dict]
+        The raw search responses.
+    document_types : list[Type[Document]]
+        The document type of each response.
+    k : int
+        The number of hits to select.
+    boosts : list[float], optional
+        A factor per response which its scores are multiplied with. Defaults to 1.0.
+
+    Returns
+    -------
+    SearchResult
+        Dictionaries with the documents and their boosted scores, best first.
+    """
+    documents = [
+        {**raw_doc, "score": score, "doc": document_types[pos](**raw_doc["doc"])}
+        for score, pos, raw_doc in merge_top_k(responses, k, boosts)
+    ]
+
+    hits = 0
+    facet_counts: dict[str, int] = {}
+    for response in responses:
+        hits += response.get("hits", len(response["docs"]))
+        for facet in response.get("facets", []):
+            facet_counts[facet["field"]] = (
+                facet_counts.get(facet["field"], 0) + facet["value"]
+            )
+
+    facets = [FacetCount(facet=f, count=c) for f, c in facet_counts.items()]
+    return SearchResult(documents, hits=hits, facets=facets)
@@ -0,0 +1,254 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Optional
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+"""The default upper bounds of the latency histogram buckets, in seconds"""
+
+
+class _Series:
+    """The aggregates of one operation on one index."""
+
+    __slots__ = ("buckets", "count", "sum", "request_bytes", "response_bytes")
+
+    def __init__(self, num_buckets: int):
+        # One slot per bucket plus the +Inf bucket, not cumulative
+        self.buckets = [0] * (num_buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+
+class _Shard:
+    """The aggregates recorded by one thread."""
+
+    def __init__(self):
+        self.series: dict[tuple[str, str], _Series] = {}
+        self.errors: dict[tuple[str, str, str], int] = {}
+        self.in_flight: dict[tuple[str, str], int] = {}
+
+
+class ClientMetrics:
+    """
+    Collects latency, traffic and error metrics of the requests of a client.
+
+    Every thread records into its own shard, so recording never takes a lock. The
+    shards are only merged when the metrics are exported. The shard of a thread is
+    folded into a common one once the thread is gone, so the thread pools of fan-out
+    calls don't pile up shards.
+
+    Parameters
+    ----------
+    buckets : tuple[float, ...], default=DEFAULT_BUCKETS
+        The upper bounds of the latency histogram buckets, in seconds.
+    prefix : str, default="toshi_client"
+        The prefix of the exported metric names.
+    """
+
+    def __init__(
+        self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, prefix: str = "toshi_client"
+    ):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._retired = _Shard()
+        """The aggregates of the threads which are gone"""
+        # Reentrant, since a garbage collection while the lock is held can retire a
+        # shard on the same thread
+        self._shards_lock = threading.RLock()
+
+    def start(self, operation: str, index_name: str) -> float:
+        """
+        Records the start of a request.
+
+        Parameters
+        ----------
+        operation : str
+            The client operation, e.g. `search`.
+        index_name : str
+            The requested index, empty for requests without an index.
+
+        Returns
+        -------
+        float
+            The start time, to be passed to `finish`.
+        """
+        in_flight = self._shard().in_flight
+        key = (operation, index_name)
+        in_flight[key] = in_flight.get(key, 0) + 1
+        return time.perf_counter()
+
+    def finish(
+        self,
+        operation: str,
+        index_name: str,
+        started: float,
+        status: Optional[int],
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+    ):
+        """
+        Records the end of a request started with `start`.
+
+        Parameters
+        ----------
+        operation : str
+            The client operation, e.g. `search`.
+        index_name : str
+            The requested index, empty for requests without an index.
+        started : float
+            The start time returned by `start`.
+        status : int, optional
+            The HTTP status of the response, None if no response was received.
+        request_bytes : int, default=0
+            The size of the request body.
+        response_bytes : int, default=0
+            The size of the response body.
+        """
+        elapsed = time.perf_counter() - started
+        shard = self._shard()
+        key = (operation, index_name)
+        shard.in_flight[key] -= 1
+
+        series = shard.series.get(key)
+        if series is None:
+            series = shard.series[key] = _Series(len(self.buckets))
+        series.buckets[bisect_left(self.buckets, elapsed)] += 1
+        series.count += 1
+        series.sum += elapsed
+        series.request_bytes += request_bytes
+        series.response_bytes += response_bytes
+
+        if status is None or status >= 400:
+            error_key = (
+                operation,
+                index_name,
+                "none" if status is None else str(status),
+            )
+            shard.errors[error_key] = shard.errors.get(error_key, 0) + 1
+
+    def export(self) -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str
+            The metrics, e.g. to be served on a `/metrics` endpoint.
+        """
+        merged = _Shard()
+        with self._shards_lock:
+            for shard in [self._retired, *self._shards]:
+                _merge(merged, shard, len(self.buckets))
+        series, errors, in_flight = merged.series, merged.errors, merged.in_flight
+
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_request_duration_seconds The latency of requests.",
+            f"# TYPE {p}_request_duration_seconds histogram",
+        ]
+        for key, s in sorted(series.items()):
+            labels = _labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, s.buckets):
+                cumulative += count
+                lines.append(
+                    f'{p}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'{p}_request_duration_seconds_bucket{{{labels},le="+Inf"}} {s.count}'
+            )
+            lines.append(f"{p}_request_duration_seconds_sum{{{labels}}} {s.sum}")
+            lines.append(f"{p}_request_duration_seconds_count{{{labels}}} {s.count}")
+
+        for name, attr, help_text in (
+            ("request_bytes", "request_bytes", "The bytes sent in request bodies."),
+            ("response_bytes", "response_bytes", "The bytes received in responses."),
+        ):
+            lines.append(f"# HELP {p}_{name}_total {help_text}")
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            for key, s in sorted(series.items()):
+                lines.append(f"{p}_{name}_total{{{_labels(key)}}} {getattr(s, attr)}")
+
+        lines.append(f"# HELP {p}_errors_total The failed requests by status.")
+        lines.append(f"# TYPE {p}_errors_total counter")
+        for (operation, index_name, status), count in sorted(errors.items()):
+            labels = _labels((operation, index_name))
+            lines.append(f'{p}_errors_total{{{labels},status="{status}"}} {count}')
+
+        lines.append(
+            f"# HELP {p}_requests_in_flight The requests waiting for a response."
+        )
+        lines.append(f"# TYPE {p}_requests_in_flight gauge")
+        for key, count in sorted(in_flight.items()):
+            lines.append(f"{p}_requests_in_flight{{{_labels(key)}}} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            weakref.finalize(
+                threading.current_thread(), _retire, weakref.ref(self), shard
+            )
+            return shard
+
+    def _retire(self, shard: _Shard):
+        with self._shards_lock:
+            self._shards.remove(shard)
+            _merge(self._retired, shard, len(self.buckets))
+
+
+def _retire(metrics_ref: "weakref.ref[ClientMetrics]", shard: _Shard):
+    # Called when the thread of the shard is gone, which may outlive the metrics
+    metrics = metrics_ref()
+    if metrics is not None:
+        metrics._retire(shard)
+
+
+def _merge(target: _Shard, shard: _Shard, num_buckets: int):
+    # The dicts are copied, since their thread may record while they are read
+    for key, s in list(shard.series.items()):
+        merged = target.series.get(key)
+        if merged is None:
+            merged = target.series[key] = _Series(num_buckets)
+        merged.buckets = [a + b for a, b in zip(merged.buckets, s.buckets)]
+        merged.count += s.count
+        merged.sum += s.sum
+        merged.request_bytes += s.request_bytes
+        merged.response_bytes += s.response_bytes
+    for key, count in list(shard.errors.items()):
+        target.errors[key] = target.errors.get(key, 0) + count
+    for key, count in list(shard.in_flight.items()):
+        target.in_flight[key] = target.in_flight.get(key, 0) + count
+
+
+def _labels(key: tuple[str, str]) -> str:
+    operation, index_name = key
+    return f'operation="{_escape(operation)}",index="{_escape(index_name)}"'
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
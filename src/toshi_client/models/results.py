@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from typing import Any, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from toshi_client.timing import PhaseTimings
+
+
+@dataclass
+class DeleteGroupResult:
+    terms: dict[str, str]
+    """The terms deleted by one request, at most one per field"""
+    docs_affected: int
+
+
+@dataclass
+class BatchDeleteResult:
+    docs_affected: int
+    """The summed number of affected documents over all groups"""
+    groups: list[DeleteGroupResult]
+
+
+@dataclass
+class FacetCount:
+    facet: str
+    """The facet path, e.g. `/a/b`"""
+    count: int
+
+
+class SearchResult(list):
+    """
+    The documents returned by a search.
+
+    Behaves like a list of the returned documents and additionally carries the hit
+    count and the facet counts of the response.
+
+    Parameters
+    ----------
+    documents : list
+        The returned documents, or dictionaries with documents and their scores.
+    hits : int
+        The number of hits reported by the server.
+    facets : list[FacetCount]
+        The counts of the facets requested with the search.
+    """
+
+    def __init__(self, documents: list, hits: int, facets: list[FacetCount]):
+        super().__init__(documents)
+        self.hits = hits
+        self.facets = facets
+        self.timings: Optional["PhaseTimings"] = None
+        """The phase timings of the search, if it was sampled by a `PhaseProfiler`"""
+
+    def facet_counts(self) -> dict[str, int]:
+        """Returns the facet counts as a mapping from facet path to count."""
+        return {f.facet: f.count for f in self.facets}
+
+
+@dataclass
+class RejectedDocument:
+    document: Any
+    """The rejected `Document`"""
+    reason: str
+
+
+@dataclass
+class DocumentValidation:
+    documents: list[dict]
+    """The JSON of the accepted documents, with coerced values"""
+    rejected: list[RejectedDocument]
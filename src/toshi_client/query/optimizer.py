@@ -0,0 +1,176 @@
+import json
+from typing import Optional
+
+from toshi_client.models.query import Query
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.range_query import RangeQuery
+
+
+def optimize_query(query: Query, merge_ranges: bool = False) -> Optional[Query]:
+    """
+    Rewrites a query into an equivalent, cheaper one.
+
+    Only `BoolQuery` trees are rewritten, every other query is returned as is. The
+    rewrite
+
+    - flattens nested bools whose clauses fit into the parent branch,
+    - removes duplicate `must_not` clauses,
+    - merges the `must` ranges on the same field into one range, if asked to,
+    - detects clauses which contradict each other.
+
+    Matching documents and their scores stay the same. Duplicate `must` and `should`
+    clauses are kept, since dropping them would change the score of a term clause.
+
+    Parameters
+    ----------
+    query : Query
+        The query to optimize. It is not modified.
+    merge_ranges : bool, default=False
+        If True, the `must` ranges on the same field are merged. Every range adds a
+        constant to the score, so the merge shifts the scores of all hits by the
+        same amount. Their order stays the same, their absolute values don't.
+
+    Returns
+    -------
+    Optional[Query]
+        The optimized query or None if the query can't match any document.
+    """
+    if not isinstance(query, BoolQuery):
+        return query
+    return _optimize_bool(query, merge_ranges)
+
+
+def _optimize_bool(query: BoolQuery, merge_ranges: bool) -> Optional[BoolQuery]:
+    must, must_not, should = [], [], []
+
+    for clause in query._must:
+        clause = optimize_query(clause, merge_ranges)
+        if clause is None:
+            return None
+        if isinstance(clause, BoolQuery) and not clause._should and clause._must:
+            must.extend(clause._must)
+            must_not.extend(clause._must_not)
+        else:
+            must.append(clause)
+
+    for clause in query._should:
+        clause = optimize_query(clause, merge_ranges)
+        if clause is None:
+            continue
+        if _only_should(clause):
+            should.extend(clause._should)
+        else:
+            should.append(clause)
+
+    for clause in query._must_not:
+        clause = optimize_query(clause, merge_ranges)
+        if clause is None:
+            continue
+        if _only_should(clause):
+            must_not.extend(clause._should)
+        else:
+            must_not.append(clause)
+
+    if query._should and not should and not must:
+        return None
+
+    merged = _merge_ranges(must)
+    if merged is None:
+        return None
+    if merge_ranges:
+        must = merged
+
+    must_not = _deduplicate(must_not)
+    must_not_keys = {_key(c) for c in must_not}
+    if any(_key(c) in must_not_keys for c in must):
+        return None
+
+    optimized = BoolQuery(limit=query._limit)
+    optimized._must = must
+    optimized._must_not = must_not
+    optimized._should = should
+    return optimized
+
+
+def _only_should(query: Query) -> bool:
+    return (
+        isinstance(query, BoolQuery)
+        and bool(query._should)
+        and not query._must
+        and not query._must_not
+    )
+
+
+def _key(query: Query) -> str:
+    return json.dumps(query.to_json()["query"], sort_keys=True)
+
+
+def _deduplicate(queries: list[Query]) -> list[Query]:
+    unique = {}
+    for q in queries:
+        unique.setdefault(_key(q), q)
+    return list(unique.values())
+
+
+def _merge_ranges(queries: list[Query]) -> Optional[list[Query]]:
+    ranges: dict[str, list[RangeQuery]] = {}
+    result = []
+    for q in queries:
+        if type(q) is not RangeQuery:
+            result.append(q)
+        elif q._field_name in ranges:
+            ranges[q._field_name].append(q)
+        else:
+            ranges[q._field_name] = [q]
+            result.append(q._field_name)
+
+    merged = {}
+    for field_name, field_ranges in ranges.items():
+        merged[field_name] = _intersect(field_ranges)
+        if merged[field_name] is None:
+            return None
+
+    return [merged[q] if isinstance(q, str) else q for q in result]
+
+
+def _intersect(ranges: list[RangeQuery]) -> Optional[RangeQuery]:
+    # Bounds are (value, exclusive) pairs
+    lowers = [b for r in ranges for b in _lower_bounds(r)]
+    uppers = [b for r in ranges for b in _upper_bounds(r)]
+    lower = max(lowers, default=None)
+    upper = min(uppers, key=lambda b: (b[0], not b[1]), default=None)
+
+    if lower is not None and upper is not None:
+        if lower[0] > upper[0] or (lower[0] == upper[0] and (lower[1] or upper[1])):
+            return None
+
+    merged = RangeQuery(field_name=ranges[0]._field_name, limit=ranges[0]._limit)
+    if lower is not None:
+        if lower[1]:
+            merged.gt(lower[0])
+        else:
+            merged.gte(lower[0])
+    if upper is not None:
+        if upper[1]:
+            merged.lt(upper[0])
+        else:
+            merged.lte(upper[0])
+    return merged
+
+
+def _lower_bounds(query: RangeQuery) -> list[tuple[int, bool]]:
+    bounds = []
+    if query._gte is not None:
+        bounds.append((query._gte, False))
+    if query._gt is not None:
+        bounds.append((query._gt, True))
+    return bounds
+
+
+def _upper_bounds(query: RangeQuery) -> list[tuple[int, bool]]:
+    bounds = []
+    if query._lte is not None:
+        bounds.append((query._lte, False))
+    if query._lt is not None:
+        bounds.append((query._lt, True))
+    return bounds
@@ -0,0 +1,43 @@
+from toshi_client.models.query import Query
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.range_query import RangeQuery
+
+
+def query_shape(query: Query) -> tuple:
+    """
+    Returns the shape of a query tree, which is the tree without its literal values.
+
+    Queries differing only in their terms, bounds or limits share a shape, so it can
+    key whatever is derived from the structure of a query alone.
+
+    Parameters
+    ----------
+    query : Query
+        The query.
+
+    Returns
+    -------
+    tuple
+        A hashable representation of the query's types, fields and nesting.
+    """
+    if isinstance(query, BoolQuery):
+        return (
+            "bool",
+            tuple(query_shape(q) for q in query._must),
+            tuple(query_shape(q) for q in query._must_not),
+            tuple(query_shape(q) for q in query._should),
+        )
+    if isinstance(query, RangeQuery):
+        bounds = tuple(
+            b
+            for b, v in zip(
+                ("gte", "gt", "lte", "lt"),
+                (query._gte, query._gt, query._lte, query._lt),
+            )
+            if v is not None
+        )
+        return "range", query._field_name, bounds
+    if isinstance(query, FacetQuery):
+        return "facet", query._facet_name
+    return type(query).__name__, query._field_name
@@ -0,0 +1,116 @@
+from typing import Optional
+
+from toshi_client.errors import ToshiQueryError
+from toshi_client.index.enums import IndexFieldTypes, IndexRecordOption
+from toshi_client.index.field_options import TextOptions
+from toshi_client.index.index import Index, IndexField
+from toshi_client.models.query import Query
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.fuzzy_query import FuzzyQuery
+from toshi_client.query.phrase_query import PhraseQuery
+from toshi_client.query.range_query import RangeQuery
+from toshi_client.query.regex_query import RegexQuery
+from toshi_client.query.shape import query_shape
+
+_NUMERIC_TYPES = [IndexFieldTypes.I64, IndexFieldTypes.U64, IndexFieldTypes.F64]
+
+
+class QueryValidator:
+    """
+    Checks queries against an index schema before they are sent to the server.
+
+    The outcome only depends on the shape of a query, so it is computed once per
+    shape and looked up for every later query of the same shape.
+
+    Parameters
+    ----------
+    index : Index
+        The schema of the searched index.
+    """
+
+    def __init__(self, index: Index):
+        self.index = index
+        self._fields = {f.name: f for f in index.fields}
+        self._compiled: dict[tuple, Optional[str]] = {}
+
+    def validate(self, query: Query, facet_query: Optional[list[FacetQuery]] = None):
+        """
+        Validates a query and its facet queries.
+
+        Parameters
+        ----------
+        query : Query
+            The search query.
+        facet_query : list[FacetQuery], optional
+            The facet queries for the search.
+
+        Raises
+        ------
+        ToshiQueryError
+            If a clause can't run against the schema. The message names the clause.
+        """
+        facet_query = facet_query or []
+        shape = (query_shape(query), tuple(query_shape(f) for f in facet_query))
+        if shape not in self._compiled:
+            self._compiled[shape] = self._compile(query, facet_query)
+
+        error = self._compiled[shape]
+        if error is not None:
+            raise ToshiQueryError(error)
+
+    def _compile(self, query: Query, facet_query: list[FacetQuery]) -> Optional[str]:
+        error = self._check(query, "query")
+        for i, facet in enumerate(facet_query):
+            if error is not None:
+                break
+            error = self._check(facet, f"facets[{i}]")
+        return error
+
+    def _check(self, query: Query, path: str) -> Optional[str]:
+        if isinstance(query, BoolQuery):
+            for branch, clauses in (
+                ("must", query._must),
+                ("must_not", query._must_not),
+                ("should", query._should),
+            ):
+                for i, clause in enumerate(clauses):
+                    error = self._check(clause, f"{path}.{branch}[{i}]")
+                    if error is not None:
+                        return error
+            return None
+
+        field_name = (
+            query._facet_name if isinstance(query, FacetQuery) else query._field_name
+        )
+        clause = f"{type(query).__name__} on field '{field_name}' at {path}"
+        field = self._fields.get(field_name)
+        if field is None:
+            return f"{clause}: the field is not part of index {self.index.name}."
+        if isinstance(query, FacetQuery):
+            if field.type != IndexFieldTypes.FACET:
+                return f"{clause}: the field is not a facet field."
+            return None
+        if not _is_indexed(field):
+            return f"{clause}: the field is not indexed."
+        # Schemas parsed by `IndexSummary.from_json` hold some types as plain strings
+        field_type = IndexFieldTypes(field.type)
+        if isinstance(query, RangeQuery) and field_type not in _NUMERIC_TYPES:
+            return f"{clause}: ranges need a numeric field, not {field_type.value}."
+        if isinstance(query, (PhraseQuery, FuzzyQuery, RegexQuery)):
+            if field_type != IndexFieldTypes.TEXT:
+                return (
+                    f"{clause}: the query needs a text field, not {field_type.value}."
+                )
+        if isinstance(query, PhraseQuery):
+            if field.options.indexing.record != IndexRecordOption.POSITION:
+                return f"{clause}: the field is not indexed with positions."
+        return None
+
+
+def _is_indexed(field: IndexField) -> bool:
+    if field.type == IndexFieldTypes.FACET:
+        return True
+    if isinstance(field.options, TextOptions):
+        return field.options.indexing is not None
+    return bool(field.options.indexed)
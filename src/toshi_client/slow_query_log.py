@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+from toshi_client.models.query import Query
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.shape import query_shape
+
+
+@dataclass
+class QueryStats:
+    fingerprint: str
+    """A short hash of the query shape"""
+    index_name: str
+    shape: str
+    """The query tree without its literal values"""
+    count: int
+    total: float
+    """The summed latency in seconds"""
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+class _Aggregate:
+    __slots__ = ("shape", "count", "total", "max", "samples")
+
+    def __init__(self, shape: str):
+        self.shape = shape
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: list[float] = []
+
+
+class SlowQueryLog:
+    """
+    Aggregates search latencies per query fingerprint and index.
+
+    A fingerprint identifies the shape of a query, i.e. the query tree without its
+    terms, bounds and limits, so all searches of one kind share an entry. Recording
+    a search costs a shape computation and a dictionary update. Percentiles are
+    computed from a bounded random sample of the latencies of each entry.
+
+    Parameters
+    ----------
+    threshold : float, default=0.0
+        Searches faster than this many seconds are not recorded.
+    max_entries : int, default=10000
+        The number of fingerprint and index pairs kept. Searches of new pairs
+        beyond it are counted in `dropped` only.
+    sample_size : int, default=256
+        The number of latencies kept per entry for the percentiles.
+    path : str, optional
+        The file `dump` appends the top entries to. It is rotated when it exceeds
+        `max_bytes`.
+    max_bytes : int, default=10485760
+        The size at which the file is rotated.
+    backup_count : int, default=3
+        The number of rotated files kept.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.0,
+        max_entries: int = 10000,
+        sample_size: int = 256,
+        path: Optional[str] = None,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 3,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.sample_size = sample_size
+        self.dropped = 0
+        self._entries: dict[tuple[tuple, str], _Aggregate] = {}
+        self._lock = threading.Lock()
+
+        self._logger: Optional[logging.Logger] = None
+        if path is not None:
+            handler = RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count
+            )
+            # A logger of its own, so the dumps don't reach the application's logs
+            self._logger = logging.Logger(f"toshi_client.slow_queries.{id(self)}")
+            self._logger.addHandler(handler)
+
+    def record(
+        self,
+        index_name: str,
+        query: Query,
+        facet_query: Optional[list[FacetQuery]],
+        seconds: float,
+    ):
+        """
+        Records the latency of a search.
+
+        Parameters
+        ----------
+        index_name : str
+            The searched index.
+        query : Query
+            The query as sent to the server.
+        facet_query : list[FacetQuery], optional
+            The facet queries of the search.
+        seconds : float
+            The latency of the search.
+        """
+        if seconds < self.threshold:
+            return
+        shape = (query_shape(query), tuple(query_shape(f) for f in facet_query or []))
+        key = (shape, index_name)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    self.dropped += 1
+                    return
+                entry = self._entries[key] = _Aggregate(repr(shape))
+            entry.count += 1
+            entry.total += seconds
+            entry.max = max(entry.max, seconds)
+            # Reservoir sampling keeps a uniform sample of all latencies
+            if len(entry.samples) < self.sample_size:
+                entry.samples.append(seconds)
+            else:
+                slot = random.randrange(entry.count)
+                if slot < self.sample_size:
+                    entry.samples[slot] = seconds
+
+    def top(self, n: int = 10, by: str = "total") -> list[QueryStats]:
+        """
+        Returns the entries which cost the most.
+
+        Parameters
+        ----------
+        n : int, default=10
+            The number of entries.
+        by : str, default="total"
+            The `QueryStats` attribute to rank by, e.g. `total`, `p99` or `count`.
+
+        Returns
+        -------
+        list[QueryStats]
+            The top entries, most expensive first.
+        """
+        with self._lock:
+            items = [
+                (
+                    key,
+                    entry.shape,
+                    entry.count,
+                    entry.total,
+                    entry.max,
+                    entry.samples[:],
+                )
+                for key, entry in self._entries.items()
+            ]
+
+        stats = []
+        for (shape, index_name), shape_repr, count, total, max_, samples in items:
+            samples.sort()
+            stats.append(
+                QueryStats(
+                    fingerprint=_fingerprint(shape_repr),
+                    index_name=index_name,
+                    shape=shape_repr,
+                    count=count,
+                    total=total,
+                    mean=total / count,
+                    p50=_percentile(samples, 0.5),
+                    p95=_percentile(samples, 0.95),
+                    p99=_percentile(samples, 0.99),
+                    max=max_,
+                )
+            )
+        stats.sort(key=lambda s: getattr(s, by), reverse=True)
+        return stats[:n]
+
+    def dump(self, n: int = 10, by: str = "total") -> list[QueryStats]:
+        """
+        Writes the top entries to the file as one JSON line each, if a path is set.
+
+        Parameters
+        ----------
+        n : int, default=10
+            The number of entries.
+        by : str, default="total"
+            The `QueryStats` attribute to rank by.
+
+        Returns
+        -------
+        list[QueryStats]
+            The written entries.
+        """
+        stats = self.top(n, by)
+        if self._logger is not None:
+            dumped_at = time.time()
+            for s in stats:
+                self._logger.warning(json.dumps(dict(dumped_at=dumped_at, **asdict(s))))
+        return stats
+
+    def reset(self):
+        """Drops all entries."""
+        with self._lock:
+            self._entries = {}
+            self.dropped = 0
+
+    def close(self):
+        """Closes the file."""
+        if self._logger is not None:
+            for handler in self._logger.handlers:
+                handler.close()
+
+
+def _fingerprint(shape_repr: str) -> str:
+    return hashlib.sha1(shape_repr.encode()).hexdigest()[:16]
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(int(q * len(samples)), len(samples) - 1)]
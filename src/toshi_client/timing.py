@@ -0,0 +1,169 @@
+import functools
+import inspect
+import random
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+
+@dataclass
+class PhaseTimings:
+    """
+    The time spent in the phases of one client call, in seconds.
+
+    The phases are `serialize` (building request bodies), `network` (sending the
+    request until the response arrives), `decode` (parsing the response JSON) and
+    `materialize` (building documents from it). Requests which run concurrently
+    within one call add up, so the phases can exceed the total.
+    """
+
+    operation: str
+    index_name: Optional[str] = None
+    phases: dict[str, float] = field(default_factory=dict)
+    total: float = 0.0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
+
+    @property
+    def other(self) -> float:
+        """The time of the call not spent in any phase."""
+        return max(self.total - sum(self.phases.values()), 0.0)
+
+    def add(self, phase: str, seconds: float, index_name: Optional[str] = None):
+        # Fan-out operations add from several threads
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+            if self.index_name is None:
+                self.index_name = index_name
+
+
+class PhaseProfiler:
+    """
+    Records the phase timings of a sample of client calls.
+
+    Parameters
+    ----------
+    sample_rate : float, default=1.0
+        The fraction of calls to time. Calls which are not sampled only pay for a
+        random number.
+    hook : Callable[[PhaseTimings], None], optional
+        Called with the timings of every sampled call, e.g. to feed a log or a
+        metrics system. Exceptions raised by the hook propagate to the caller.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 1.0,
+        hook: Optional[Callable[[PhaseTimings], None]] = None,
+    ):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1.")
+        self.sample_rate = sample_rate
+        self.hook = hook
+
+    def sample(self, operation: str) -> Optional[PhaseTimings]:
+        """Returns new timings for a call, or None if the call isn't sampled."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None
+        return PhaseTimings(operation=operation)
+
+    def report(self, timings: PhaseTimings):
+        """Hands the timings of a finished call to the hook."""
+        if self.hook is not None:
+            self.hook(timings)
+
+
+# The timings of the client call running in the current context
+_current_timings: ContextVar[Optional[PhaseTimings]] = ContextVar(
+    "_current_timings", default=None
+)
+
+
+def current_timings() -> Optional[PhaseTimings]:
+    """Returns the timings of the running client call, if it is sampled."""
+    return _current_timings.get()
+
+
+class timed_phase:
+    """
+    Adds the time spent in the block to a phase of the running client call.
+
+    Does nothing if the call isn't sampled.
+    """
+
+    __slots__ = ("name", "timings", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _current_timings.get()
+        if self.timings is not None:
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.started)
+
+
+def profiled(operation: str):
+    """
+    Times the phases of a client method.
+
+    The client needs a `_profiler` attribute, holding a `PhaseProfiler` or None.
+    Calls made from within a profiled call add to the timings of the outer call.
+    Results with a `timings` attribute, like `SearchResult`, carry their timings.
+    """
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def profiled_async(self, *args, **kwargs):
+                timings = _start(self, operation)
+                if timings is None:
+                    return await fn(self, *args, **kwargs)
+                token = _current_timings.set(timings)
+                started = time.perf_counter()
+                try:
+                    result = await fn(self, *args, **kwargs)
+                finally:
+                    timings.total = time.perf_counter() - started
+                    _current_timings.reset(token)
+                return _finish(self, timings, result)
+
+            return profiled_async
+
+        @functools.wraps(fn)
+        def profiled_sync(self, *args, **kwargs):
+            timings = _start(self, operation)
+            if timings is None:
+                return fn(self, *args, **kwargs)
+            token = _current_timings.set(timings)
+            started = time.perf_counter()
+            try:
+                result = fn(self, *args, **kwargs)
+            finally:
+                timings.total = time.perf_counter() - started
+                _current_timings.reset(token)
+            return _finish(self, timings, result)
+
+        return profiled_sync
+
+    return decorate
+
+
+def _start(client, operation: str) -> Optional[PhaseTimings]:
+    if client._profiler is None or _current_timings.get() is not None:
+        return None
+    return client._profiler.sample(operation)
+
+
+def _finish(client, timings: PhaseTimings, result):
+    if hasattr(result, "timings"):
+        result.timings = timings
+    client._profiler.report(timings)
+    return result
@@ -0,0 +1,234 @@
+import contextvars
+import functools
+import inspect
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+
+class Span:
+    """
+    A timed operation of a `Tracer`.
+
+    Parameters
+    ----------
+    name : str
+        The name of the operation, e.g. `toshi.search`.
+    trace_id : str
+        The id shared by all spans of one trace.
+    parent_id : str, optional
+        The id of the span this span is a child of.
+    attributes : dict[str, Any], optional
+        The initial attributes of the span.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes: dict[str, Any] = dict(attributes or {})
+        self.exceptions: list[BaseException] = []
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        """The duration of the span in seconds, None while it is running."""
+        if self.end_time is None:
+            return None
+        return (self.end_time - self.start_time) / 1e9
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_exception(self, exception: BaseException):
+        self.exceptions.append(exception)
+
+    def end(self):
+        self.end_time = time.time_ns()
+
+    def __repr__(self) -> str:
+        return f"Span(name={self.name!r}, attributes={self.attributes!r})"
+
+
+class SpanExporter(ABC):
+    """Receives the spans of a `Tracer` when they end."""
+
+    @abstractmethod
+    def export(self, span: Span):
+        raise NotImplementedError
+
+
+class RingBufferExporter(SpanExporter):
+    """
+    Keeps the most recent spans in memory, e.g. for tests and local debugging.
+
+    Parameters
+    ----------
+    max_spans : int, default=10000
+        The number of spans kept, older spans are dropped.
+    """
+
+    def __init__(self, max_spans: int = 10000):
+        self._spans: deque[Span] = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        # deque.append is atomic, so spans can end on any thread
+        self._spans.append(span)
+
+    def spans(self, name: Optional[str] = None) -> list[Span]:
+        """Returns the kept spans in the order they ended, optionally by name."""
+        return [s for s in list(self._spans) if name is None or s.name == name]
+
+    def children(self, span: Span) -> list[Span]:
+        """Returns the kept spans whose parent is `span`."""
+        return [s for s in list(self._spans) if s.parent_id == span.span_id]
+
+    def clear(self):
+        self._spans.clear()
+
+
+# The span of the `Tracer` running in the current context
+_active_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "_active_span", default=None
+)
+
+
+class Tracer:
+    """
+    A minimal tracer for the clients.
+
+    It has the `start_as_current_span` method of an OpenTelemetry tracer, so the
+    clients accept either. Spans started while another span is current become its
+    children.
+
+    Parameters
+    ----------
+    exporter : SpanExporter
+        Receives every span when it ends.
+    """
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+
+    @contextmanager
+    def start_as_current_span(
+        self, name: str, attributes: Optional[dict[str, Any]] = None
+    ) -> Iterator[Span]:
+        """
+        Starts a span, which is current until the block ends.
+
+        Parameters
+        ----------
+        name : str
+            The name of the span.
+        attributes : dict[str, Any], optional
+            The initial attributes of the span.
+
+        Yields
+        ------
+        Span
+            The started span. Exceptions raised in the block are recorded on it.
+        """
+        parent = _active_span.get()
+        span = Span(
+            name,
+            trace_id=os.urandom(16).hex() if parent is None else parent.trace_id,
+            parent_id=None if parent is None else parent.span_id,
+            attributes=attributes,
+        )
+        token = _active_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end()
+            _active_span.reset(token)
+            self.exporter.export(span)
+
+
+# The span of the client call running in the current context. It is kept apart
+# from `_active_span`, since the span may come from an OpenTelemetry tracer.
+_client_span: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar(
+    "_client_span", default=None
+)
+
+
+def set_span_attributes(**attributes: Any):
+    """Sets attributes on the span of the running client call, if it is traced."""
+    span = _client_span.get()
+    if span is not None:
+        for key, value in attributes.items():
+            span.set_attribute(f"toshi.{key}", value)
+
+
+def traced(operation: str):
+    """
+    Wraps a client method in a span named `toshi.<operation>`.
+
+    The client needs a `_tracer` attribute, holding a tracer or None, and a `_url`.
+    """
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def traced_async(self, *args, **kwargs):
+                if self._tracer is None:
+                    return await fn(self, *args, **kwargs)
+                with _operation_span(self, operation):
+                    return await fn(self, *args, **kwargs)
+
+            return traced_async
+
+        @functools.wraps(fn)
+        def traced_sync(self, *args, **kwargs):
+            if self._tracer is None:
+                return fn(self, *args, **kwargs)
+            with _operation_span(self, operation):
+                return fn(self, *args, **kwargs)
+
+        return traced_sync
+
+    return decorate
+
+
+@contextmanager
+def _operation_span(client, operation: str):
+    attributes = {"toshi.operation": operation, "toshi.node": client._url}
+    with client._tracer.start_as_current_span(
+        f"toshi.{operation}", attributes=attributes
+    ) as span:
+        token = _client_span.set(span)
+        try:
+            yield span
+        finally:
+            _client_span.reset(token)
+
+
+def in_current_context(fn: Callable) -> Callable:
+    """
+    Binds a function to a copy of the current context, e.g. to run it on a thread
+    pool. Spans started by the function become children of the current span.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        # A context can't be entered by two threads at once, so every call gets
+        # its own copy
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
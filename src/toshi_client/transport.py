@@ -0,0 +1,321 @@
+import asyncio
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Iterable, Optional, Union
+from urllib.parse import urlsplit
+
+import aiohttp
+import requests
+
+from toshi_client.errors import ToshiClientError
+
+
+class Transport(ABC):
+    """
+    Sends the HTTP requests of a `ToshiClient`.
+
+    The returned response needs the `status_code`, `content` and `json()` of a
+    `requests.Response`.
+    """
+
+    @abstractmethod
+    def request(self, method: str, url: str, **kwargs: Any):
+        """
+        Sends a request.
+
+        Parameters
+        ----------
+        method : str
+            The lowercase HTTP method, e.g. `post`.
+        url : str
+            The URL of the request.
+        **kwargs
+            The `data`, `json`, `headers` or `params` of the request, as `requests`
+            takes them.
+        """
+        raise NotImplementedError
+
+
+class AsyncTransport(ABC):
+    """
+    Sends the HTTP requests of an `AsyncToshiClient`.
+
+    The yielded response needs the `status`, `content_length`, `json()` and `read()`
+    of an `aiohttp.ClientResponse`.
+    """
+
+    uses_session = True
+    """Whether requests need a session, the client only opens one if so"""
+
+    @abstractmethod
+    def request(
+        self, session: aiohttp.ClientSession, method: str, url: str, **kwargs: Any
+    ):
+        """
+        Sends a request, returning an async context manager yielding the response.
+
+        Parameters
+        ----------
+        session : aiohttp.ClientSession
+            The session of the client call, None if the transport doesn't use one.
+        method : str
+            The lowercase HTTP method, e.g. `post`.
+        url : str
+            The URL of the request.
+        **kwargs
+            The `data`, `json`, `headers` or `params` of the request, as `aiohttp`
+            takes them.
+        """
+        raise NotImplementedError
+
+
+class RequestsTransport(Transport):
+    """Sends requests with `requests`, the default of `ToshiClient`."""
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        return getattr(requests, method)(url, **kwargs)
+
+
+class AiohttpTransport(AsyncTransport):
+    """Sends requests with the session of the call, the default of `AsyncToshiClient`."""
+
+    def request(
+        self, session: aiohttp.ClientSession, method: str, url: str, **kwargs: Any
+    ):
+        return session.request(method.upper(), url, **kwargs)
+
+
+@dataclass
+class RecordedExchange:
+    method: str
+    url: str
+    body: Optional[str]
+    """The request body, None for requests without one"""
+    status: int
+    response: str
+    """The response body"""
+    elapsed: float
+    """The seconds from sending the request until the response body was read"""
+
+
+class RecordedResponse:
+    """A response served from a `RecordedExchange`, with the API of both clients."""
+
+    def __init__(self, exchange: RecordedExchange):
+        self.status_code = self.status = exchange.status
+        self.content = exchange.response.encode()
+        self.content_length = len(self.content)
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class AsyncRecordedResponse(RecordedResponse):
+    async def json(self) -> Any:
+        return json.loads(self.content)
+
+    async def read(self) -> bytes:
+        return self.content
+
+
+class RecordingTransport(Transport):
+    """
+    Sends requests with another transport and records them with their responses.
+
+    Parameters
+    ----------
+    transport : Transport, optional
+        The transport sending the requests, a `RequestsTransport` if not given.
+    """
+
+    def __init__(self, transport: Optional[Transport] = None):
+        self.transport = transport or RequestsTransport()
+        self.exchanges: list[RecordedExchange] = []
+
+    def request(self, method: str, url: str, **kwargs: Any):
+        started = time.perf_counter()
+        resp = self.transport.request(method, url, **kwargs)
+        response = resp.content.decode()
+        # list.append is atomic, so fan-out calls can record from any thread
+        self.exchanges.append(
+            RecordedExchange(
+                method,
+                url,
+                _body(kwargs),
+                resp.status_code,
+                response,
+                time.perf_counter() - started,
+            )
+        )
+        return resp
+
+    def save(self, path: str):
+        """Writes the recorded exchanges to a file, one JSON object per line."""
+        save_exchanges(self.exchanges, path)
+
+
+class AsyncRecordingTransport(AsyncTransport):
+    """
+    Sends requests with another transport and records them with their responses.
+
+    Parameters
+    ----------
+    transport : AsyncTransport, optional
+        The transport sending the requests, an `AiohttpTransport` if not given.
+    """
+
+    def __init__(self, transport: Optional[AsyncTransport] = None):
+        self.transport = transport or AiohttpTransport()
+        self.exchanges: list[RecordedExchange] = []
+
+    @property
+    def uses_session(self) -> bool:
+        return self.transport.uses_session
+
+    @asynccontextmanager
+    async def request(
+        self, session: aiohttp.ClientSession, method: str, url: str, **kwargs: Any
+    ) -> AsyncIterator[AsyncRecordedResponse]:
+        started = time.perf_counter()
+        async with self.transport.request(session, method, url, **kwargs) as resp:
+            response = (await resp.read()).decode()
+            status = resp.status
+        exchange = RecordedExchange(
+            method, url, _body(kwargs), status, response, time.perf_counter() - started
+        )
+        self.exchanges.append(exchange)
+        yield AsyncRecordedResponse(exchange)
+
+    def save(self, path: str):
+        """Writes the recorded exchanges to a file, one JSON object per line."""
+        save_exchanges(self.exchanges, path)
+
+
+class _Replay:
+    """The recorded responses by request, served in the order they were recorded."""
+
+    def __init__(self, exchanges: Iterable[RecordedExchange]):
+        self._exchanges: dict[tuple, deque[RecordedExchange]] = {}
+        for exchange in exchanges:
+            key = _key(exchange.method, exchange.url, exchange.body)
+            self._exchanges.setdefault(key, deque()).append(exchange)
+        self._lock = threading.Lock()
+
+    def next(self, method: str, url: str, kwargs: dict) -> RecordedExchange:
+        key = _key(method, url, _body(kwargs))
+        with self._lock:
+            recorded = self._exchanges.get(key)
+            if not recorded:
+                raise ToshiClientError(f"No recorded response for {method} {url}")
+            # Requests repeated more often than recorded get the responses again
+            exchange = recorded.popleft()
+            recorded.append(exchange)
+        return exchange
+
+
+class ReplayTransport(Transport):
+    """
+    Serves recorded responses instead of sending requests.
+
+    Requests are matched by method, path and body, so recordings replay against any
+    server URL. Requests recorded several times get their responses in the recorded
+    order, repeating from the start when they are exhausted.
+
+    Parameters
+    ----------
+    exchanges : Iterable[RecordedExchange] or str
+        The recorded exchanges, or the file they were saved to.
+    simulate_latency : bool, default=False
+        If True, every response is delayed by its recorded latency.
+    """
+
+    def __init__(
+        self,
+        exchanges: Union[Iterable[RecordedExchange], str],
+        simulate_latency: bool = False,
+    ):
+        if isinstance(exchanges, str):
+            exchanges = load_exchanges(exchanges)
+        self._replay = _Replay(exchanges)
+        self.simulate_latency = simulate_latency
+
+    def request(self, method: str, url: str, **kwargs: Any) -> RecordedResponse:
+        exchange = self._replay.next(method, url, kwargs)
+        if self.simulate_latency:
+            time.sleep(exchange.elapsed)
+        return RecordedResponse(exchange)
+
+
+class AsyncReplayTransport(AsyncTransport):
+    """
+    Serves recorded responses instead of sending requests.
+
+    Requests are matched by method, path and body, so recordings replay against any
+    server URL. Requests recorded several times get their responses in the recorded
+    order, repeating from the start when they are exhausted.
+
+    Parameters
+    ----------
+    exchanges : Iterable[RecordedExchange] or str
+        The recorded exchanges, or the file they were saved to.
+    simulate_latency : bool, default=False
+        If True, every response is delayed by its recorded latency, without blocking
+        the event loop.
+    """
+
+    uses_session = False
+
+    def __init__(
+        self,
+        exchanges: Union[Iterable[RecordedExchange], str],
+        simulate_latency: bool = False,
+    ):
+        if isinstance(exchanges, str):
+            exchanges = load_exchanges(exchanges)
+        self._replay = _Replay(exchanges)
+        self.simulate_latency = simulate_latency
+
+    @asynccontextmanager
+    async def request(
+        self,
+        session: Optional[aiohttp.ClientSession],
+        method: str,
+        url: str,
+        **kwargs: Any,
+    ) -> AsyncIterator[AsyncRecordedResponse]:
+        exchange = self._replay.next(method, url, kwargs)
+        if self.simulate_latency:
+            await asyncio.sleep(exchange.elapsed)
+        yield AsyncRecordedResponse(exchange)
+
+
+def save_exchanges(exchanges: Iterable[RecordedExchange], path: str):
+    """Writes exchanges to a file, one JSON object per line."""
+    with open(path, "w") as f:
+        for exchange in exchanges:
+            f.write(json.dumps(asdict(exchange)) + "\n")
+
+
+def load_exchanges(path: str) -> list[RecordedExchange]:
+    """Reads exchanges written by `save_exchanges`."""
+    with open(path) as f:
+        return [RecordedExchange(**json.loads(line)) for line in f if line.strip()]
+
+
+def _body(kwargs: dict) -> Optional[str]:
+    if kwargs.get("data") is not None:
+        data = kwargs["data"]
+        return data.decode() if isinstance(data, bytes) else data
+    if kwargs.get("json") is not None:
+        return json.dumps(kwargs["json"])
+    return None
+
+
+def _key(method: str, url: str, body: Optional[str]) -> tuple:
+    parts = urlsplit(url)
+    return method.lower(), parts.path, parts.query, body
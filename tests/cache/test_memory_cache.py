@@ -0,0 +1,34 @@
+from toshi_client.cache.memory_cache import MemorySearchCache
+from toshi_client.cache.search_cache import SearchCache
+
+
+def test_get_set():
+    cache = MemorySearchCache()
+    key = SearchCache.make_key("lyrics", '{"query": "data"}')
+
+    assert cache.get(key) is None
+    cache.set("lyrics", key, {"docs": []})
+    assert cache.get(key) == {"docs": []}
+
+
+def test_evicts_least_recently_used():
+    cache = MemorySearchCache(max_entries=2)
+    cache.set("lyrics", "a", {"docs": []})
+    cache.set("lyrics", "b", {"docs": []})
+    cache.get("a")
+    cache.set("lyrics", "c", {"docs": []})
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_invalidate():
+    cache = MemorySearchCache()
+    cache.set("lyrics", "a", {"docs": []})
+    cache.set("books", "b", {"docs": []})
+
+    cache.invalidate("lyrics")
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
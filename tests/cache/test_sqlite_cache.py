@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from toshi_client.cache.sqlite_cache import SqliteSearchCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path / "search_cache.db"
+
+
+def test_shared_between_instances(cache_path):
+    writer = SqliteSearchCache(cache_path)
+    reader = SqliteSearchCache(cache_path)
+
+    writer.set("lyrics", "a", {"docs": [{"score": 1.0, "doc": {"idx": 2}}]})
+    assert reader.get("a") == {"docs": [{"score": 1.0, "doc": {"idx": 2}}]}
+
+    reader.invalidate("lyrics")
+    assert writer.get("a") is None
+
+    writer.close()
+    reader.close()
+
+
+def test_evict(cache_path):
+    cache = SqliteSearchCache(cache_path, max_entries=2, touch_interval=0)
+    for key in ["a", "b", "c"]:
+        cache.set("lyrics", key, {"docs": []})
+    cache.get("a")
+
+    cache.evict()
+
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.get("b") is None
+    cache.close()
+
+
+def test_reads_only_refresh_old_access_times(cache_path):
+    cache = SqliteSearchCache(cache_path, touch_interval=60)
+    cache.set("lyrics", "a", {"docs": []})
+    conn = cache._connection()
+    conn.execute("UPDATE search_cache SET accessed = ?", (time.time() - 30,))
+    (recent,) = conn.execute("SELECT accessed FROM search_cache").fetchone()
+
+    cache.get("a")
+    assert conn.execute("SELECT accessed FROM search_cache").fetchone() == (recent,)
+
+    conn.execute("UPDATE search_cache SET accessed = ?", (time.time() - 90,))
+    cache.get("a")
+    (refreshed,) = conn.execute("SELECT accessed FROM search_cache").fetchone()
+    assert refreshed > recent
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_coroutines_run_off_the_event_loop(cache_path, monkeypatch):
+    cache = SqliteSearchCache(cache_path)
+    threads = []
+    get = cache.get
+
+    def recording_get(key):
+        threads.append(threading.current_thread())
+        return get(key)
+
+    monkeypatch.setattr(cache, "get", recording_get)
+    await cache.aset("lyrics", "a", {"docs": []})
+
+    assert await cache.aget("a") == {"docs": []}
+    assert threads[0] is not threading.current_thread()
+    await cache.ainvalidate("lyrics")
+    assert await cache.aget("a") is None
+    cache.close()
+
+
+class _LockedConnection:
+    def execute(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_database_errors_degrade_to_misses(cache_path, monkeypatch):
+    cache = SqliteSearchCache(cache_path)
+    cache.set("lyrics", "a", {"docs": []})
+    monkeypatch.setattr(cache, "_connection", lambda: _LockedConnection())
+
+    assert cache.get("a") is None
+    cache.set("lyrics", "b", {"docs": []})
+    cache.invalidate("lyrics")
+
+    monkeypatch.undo()
+    cache.close()
+
+
+def test_close_closes_the_connections_of_all_threads(cache_path):
+    cache = SqliteSearchCache(cache_path)
+    thread = threading.Thread(target=cache.set, args=("lyrics", "a", {"docs": []}))
+    thread.start()
+    thread.join()
+    connections = list(cache._connections)
+
+    cache.close()
+
+    assert len(connections) == 2
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
@@ -0,0 +1,75 @@
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.optimizer import optimize_query
+from toshi_client.query.range_query import RangeQuery
+from toshi_client.query.term_query import TermQuery
+
+
+def test_flattens_nested_must():
+    inner = BoolQuery().must_match(TermQuery(term="gold", field_name="lyrics"))
+    query = BoolQuery(limit=10).must_match(inner)
+
+    assert optimize_query(query).to_json() == {
+        "query": {
+            "bool": {
+                "must": [{"term": {"lyrics": "gold"}}],
+                "must_not": [],
+                "should": [],
+            }
+        },
+        "limit": 10,
+    }
+
+
+def test_removes_duplicate_must_not():
+    term_query = TermQuery(term="grunge", field_name="genre")
+    query = BoolQuery().must_not_match(term_query).must_not_match(term_query)
+
+    assert optimize_query(query).to_json()["query"]["bool"]["must_not"] == [
+        {"term": {"genre": "grunge"}}
+    ]
+
+
+def test_merges_ranges():
+    query = (
+        BoolQuery()
+        .must_match(RangeQuery(field_name="year", gte=1990))
+        .must_match(TermQuery(term="rock", field_name="genre"))
+        .must_match(RangeQuery(field_name="year", gt=1991, lte=2000))
+    )
+
+    assert optimize_query(query, merge_ranges=True).to_json()["query"]["bool"][
+        "must"
+    ] == [
+        {"range": {"year": {"gt": 1991, "lte": 2000}}},
+        {"term": {"genre": "rock"}},
+    ]
+
+
+def test_keeps_ranges_by_default():
+    # Merging ranges changes the number of scoring clauses and so the scores
+    query = (
+        BoolQuery()
+        .must_match(RangeQuery(field_name="year", gte=1990))
+        .must_match(RangeQuery(field_name="year", gt=1991, lte=2000))
+    )
+
+    assert optimize_query(query).to_json() == query.to_json()
+
+
+def test_detects_contradictions():
+    term_query = TermQuery(term="rock", field_name="genre")
+    disjoint_ranges = (
+        BoolQuery()
+        .must_match(RangeQuery(field_name="year", lt=1990))
+        .must_match(RangeQuery(field_name="year", gte=1990))
+    )
+    excluded_term = BoolQuery().must_match(term_query).must_not_match(term_query)
+
+    assert optimize_query(disjoint_ranges) is None
+    assert optimize_query(excluded_term) is None
+    assert optimize_query(BoolQuery().should_match(excluded_term)) is None
+
+
+def test_keeps_other_queries():
+    term_query = TermQuery(term="rock", field_name="genre")
+    assert optimize_query(term_query) is term_query
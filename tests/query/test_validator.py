@@ -0,0 +1,109 @@
+from pathlib import Path
+
+import pytest
+
+from toshi_client.errors import ToshiQueryError
+from toshi_client.index.enums import IndexRecordOption
+from toshi_client.index.field_options import TextOptionIndexing
+from toshi_client.index.index_builder import IndexBuilder
+from toshi_client.index.index_summary import IndexSummary
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.phrase_query import PhraseQuery
+from toshi_client.query.range_query import RangeQuery
+from toshi_client.query.regex_query import RegexQuery
+from toshi_client.query.term_query import TermQuery
+from toshi_client.query.validator import QueryValidator
+
+
+@pytest.fixture
+def validator(lyrics_index):
+    return QueryValidator(lyrics_index)
+
+
+def test_valid_query(validator):
+    query = (
+        BoolQuery()
+        .must_match(PhraseQuery(terms=["gold", "on"], field_name="lyrics"))
+        .must_match(RangeQuery(field_name="year", gte=1990))
+        .should_match(RegexQuery(regex="gold.*", field_name="song"))
+    )
+    facets = [FacetQuery(facet_name="test_facet", facets=[Path("/a")])]
+
+    validator.validate(query, facets)
+
+
+@pytest.mark.parametrize(
+    "query, message",
+    [
+        (TermQuery(term="x", field_name="unknown"), "not part of index lyrics"),
+        (RangeQuery(field_name="artist", gte=1), "ranges need a numeric field"),
+        (RegexQuery(regex="1.*", field_name="year"), "needs a text field"),
+        (
+            BoolQuery().should_match(TermQuery(term="x", field_name="unknown")),
+            "at query\\.should\\[0\\]",
+        ),
+    ],
+)
+def test_invalid_query(validator, query, message):
+    with pytest.raises(ToshiQueryError, match=message):
+        validator.validate(query)
+
+
+def test_phrase_query_needs_positions():
+    builder = IndexBuilder()
+    builder.add_text_field(
+        name="lyrics",
+        stored=True,
+        indexing=TextOptionIndexing(record=IndexRecordOption.FREQ),
+    )
+    builder.add_text_field(name="song", stored=True)
+    validator = QueryValidator(builder.build("lyrics"))
+
+    with pytest.raises(ToshiQueryError, match="not indexed with positions"):
+        validator.validate(PhraseQuery(terms=["gold", "on"], field_name="lyrics"))
+    with pytest.raises(ToshiQueryError, match="not indexed"):
+        validator.validate(TermQuery(term="gold", field_name="song"))
+
+
+def test_invalid_facet(validator):
+    facets = [FacetQuery(facet_name="genre", facets=[Path("/a")])]
+
+    with pytest.raises(ToshiQueryError, match="at facets\\[0\\]"):
+        validator.validate(TermQuery(term="gold", field_name="lyrics"), facets)
+
+
+@pytest.mark.parametrize(
+    "query, message",
+    [
+        (PhraseQuery("year", ["19", "92"]), "needs a text field, not i64"),
+        (RangeQuery("explicit", gte=0), "ranges need a numeric field, not bool"),
+    ],
+)
+def test_schema_from_summary(query, message):
+    summary = IndexSummary.from_json(
+        "lyrics",
+        {
+            "index_settings": {
+                "docstore_compression": "lz4",
+                "docstore_blocksize": 16384,
+            },
+            "segments": [],
+            "schema": [
+                {
+                    "name": "year",
+                    "type": "i64",
+                    "options": {"indexed": True, "fieldnorms": True, "stored": True},
+                },
+                {
+                    "name": "explicit",
+                    "type": "bool",
+                    "options": {"indexed": True, "fieldnorms": True, "stored": True},
+                },
+            ],
+            "opstamp": 0,
+        },
+    )
+
+    with pytest.raises(ToshiQueryError, match=message):
+        QueryValidator(summary.index).validate(query)
@@ -1,10 +1,26 @@
+import asyncio
+import json
+from pathlib import Path
+from unittest.mock import patch, AsyncMock
+
+import aiohttp
 import pytest
 from aioresponses import aioresponses
+from yarl import URL
 
+from benchmarks.stand_in_server import StandInServer
+from benchmarks.suite import BenchDocument
 from tests.conftest import Lyrics
-from toshi_client.client import AsyncToshiClient
-from toshi_client.errors import ToshiIndexError
+from toshi_client.client import AsyncToshiClient, _shared_session
+from toshi_client.errors import ToshiIndexError, ToshiFlushError
 from toshi_client.index.index_summary import IndexSummary
+from toshi_client.metrics import ClientMetrics
+from toshi_client.timing import PhaseProfiler
+from toshi_client.tracing import RingBufferExporter, Tracer
+from toshi_client.models.results import FacetCount
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.range_query import RangeQuery
 from toshi_client.query.term_query import TermQuery
 
 
@@ -151,6 +167,38 @@ async def test_bulk_insert_documents(toshi_client, lyric_documents):
         await toshi_client.bulk_insert_documents(lyric_documents)
 
 
+@pytest.mark.asyncio
+async def test_bulk_insert_columns(toshi_client, lyrics_index, lyric_documents):
+    toshi_client._catalog = AsyncMock()
+    toshi_client._catalog.get_index.return_value = lyrics_index
+    rows = [doc.to_json() for doc in lyric_documents]
+    columns = {name: [row[name] for row in rows] for name in rows[0]}
+
+    with aioresponses() as m:
+        m.post("http://test.com/lyrics/_bulk", status=201, repeat=True)
+
+        rejected = await toshi_client.bulk_insert_columns(
+            "lyrics", columns, chunk_size=2
+        )
+
+        requests = m.requests[("POST", URL("http://test.com/lyrics/_bulk"))]
+        assert rejected == {}
+        assert len(requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_load(toshi_client, lyric_documents):
+    with aioresponses() as m:
+        m.post("http://test.com/lyrics/_bulk", status=201, repeat=True)
+
+        await toshi_client.bulk_load(
+            "lyrics", lyric_documents, chunk_size=2, max_workers=2
+        )
+
+        requests = m.requests[("POST", URL("http://test.com/lyrics/_bulk"))]
+        assert len(requests) == 2
+
+
 @pytest.mark.asyncio
 async def test_get_documents(toshi_client):
     index_name = Lyrics.index_name()
@@ -268,3 +316,275 @@ async def test_search(toshi_client):
         results = await toshi_client.search(query, Lyrics)
         assert len(results) == 1
         assert isinstance(results[0], Lyrics)
+
+
+@pytest.mark.asyncio
+async def test_msearch(toshi_client):
+    query = TermQuery(term="test", field_name="test_field")
+    doc = {
+        "song": "Creep",
+        "idx": 3,
+        "genre": "Alternative Rock",
+        "artist": "Radiohead",
+        "lyrics": "I'm a creep, I'm a weirdo, what the hell am I doing here?",
+        "test_facet": "/a/b",
+        "year": 1992,
+    }
+
+    with aioresponses() as m:
+        m.post(
+            f"http://test.com/{Lyrics.index_name()}/",
+            status=200,
+            payload={"docs": [{"score": 1.0, "doc": doc}]},
+            repeat=True,
+        )
+
+        results = await toshi_client.msearch([(query, Lyrics)] * 3, max_concurrency=2)
+        assert len(results) == 3
+        assert all(isinstance(r[0], Lyrics) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_identical_searches():
+    toshi_client = AsyncToshiClient(url="http://test.com", single_flight=True)
+    query = TermQuery(term="test", field_name="test_field")
+    doc = {
+        "song": "Creep",
+        "idx": 3,
+        "genre": "Alternative Rock",
+        "artist": "Radiohead",
+        "lyrics": "I'm a creep, I'm a weirdo, what the hell am I doing here?",
+        "test_facet": "/a/b",
+        "year": 1992,
+    }
+
+    with aioresponses() as m:
+        # Only one response is mocked, a second request would fail
+        m.post(
+            f"http://test.com/{Lyrics.index_name()}/",
+            status=200,
+            payload={"docs": [{"score": 1.0, "doc": doc}]},
+        )
+
+        results = await asyncio.gather(
+            *[toshi_client.search(query, Lyrics) for _ in range(3)]
+        )
+
+        assert [r[0].song for r in results] == ["Creep"] * 3
+        assert len(m.requests[("POST", URL("http://test.com/lyrics/"))]) == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_request_outlives_the_session_of_its_caller():
+    query = TermQuery(term="test", field_name="test_field")
+
+    with StandInServer(hits=1) as server:
+        toshi_client = AsyncToshiClient(server.url, single_flight=True)
+        # The session of the fan-out that started the search is already gone
+        session = aiohttp.ClientSession()
+        await session.close()
+        token = _shared_session.set(session)
+        try:
+            results = await asyncio.gather(
+                *[toshi_client.search(query, BenchDocument) for _ in range(2)]
+            )
+        finally:
+            _shared_session.reset(token)
+
+    assert [len(r) for r in results] == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_iter_search(toshi_client):
+    keys = list(range(0, 50, 3))
+
+    async def search(query, document_type):
+        bounds = query.to_json()["query"]["bool"]["must"][1]["range"]["idx"]
+        hits = [k for k in keys if bounds["gte"] <= k < bounds["lt"]]
+        return hits[: query.to_json()["limit"]]
+
+    with patch.object(toshi_client, "search", side_effect=search):
+        query = TermQuery(term="the", field_name="lyrics")
+        docs = [
+            doc
+            async for doc in toshi_client.iter_search(
+                query, Lyrics, "idx", start=0, stop=50, page_size=4
+            )
+        ]
+
+    assert docs == keys
+
+
+@pytest.mark.asyncio
+async def test_delete_terms(toshi_client):
+    terms = [("test_field", str(i)) for i in range(5)]
+    index_name = "test_index"
+
+    with aioresponses() as m:
+        m.delete(
+            f"http://test.com/{index_name}/",
+            status=200,
+            payload={"docs_affected": 1},
+            repeat=True,
+        )
+
+        result = await toshi_client.delete_terms(terms, index_name)
+        assert result.docs_affected == 5
+        assert len(result.groups) == 5
+
+
+@pytest.mark.asyncio
+async def test_search_facets(toshi_client):
+    query = TermQuery(term="test", field_name="test_field")
+    facet_query = FacetQuery(facet_name="test_facet", facets=[Path("/a")])
+
+    with aioresponses() as m:
+        m.post(
+            f"http://test.com/{Lyrics.index_name()}/",
+            status=200,
+            payload={
+                "hits": 3,
+                "docs": [{"score": 1.0, "doc": {"idx": 2}}],
+                "facets": [{"field": "/a/b", "value": 3}],
+            },
+        )
+
+        results = await toshi_client.search(
+            query, Lyrics, [facet_query], count_only=True
+        )
+        assert len(results) == 0
+        assert results.hits == 3
+        assert results.facets == [FacetCount(facet="/a/b", count=3)]
+        assert results.facet_counts() == {"/a/b": 3}
+
+
+class Books(Lyrics):
+    @staticmethod
+    def index_name() -> str:
+        return "books"
+
+
+@pytest.mark.asyncio
+async def test_federated_search(toshi_client, black_keys_lyrics_document):
+    query = TermQuery(term="test", field_name="test_field")
+    doc = black_keys_lyrics_document.to_json()
+
+    with aioresponses() as m:
+        m.post(
+            f"http://test.com/{Lyrics.index_name()}/",
+            payload={"hits": 2, "docs": [{"score": 3.0, "doc": doc}] * 2},
+        )
+        m.post(
+            f"http://test.com/{Books.index_name()}/",
+            payload={"hits": 1, "docs": [{"score": 2.0, "doc": doc}]},
+        )
+
+        results = await toshi_client.federated_search(
+            query, [Lyrics, (Books, 2.0)], k=2
+        )
+        assert results.hits == 3
+        assert [r["score"] for r in results] == [4.0, 3.0]
+        assert isinstance(results[0]["doc"], Books)
+        assert isinstance(results[1]["doc"], Lyrics)
+
+
+@pytest.mark.asyncio
+async def test_mget(toshi_client, lyric_documents):
+    docs = [{"score": 1.0, "doc": d.to_json()} for d in lyric_documents]
+
+    with aioresponses() as m:
+        m.post(f"http://test.com/{Lyrics.index_name()}/", payload={"docs": docs[2:]})
+        m.post(f"http://test.com/{Lyrics.index_name()}/", payload={"docs": docs[:2]})
+
+        found = await toshi_client.mget(Lyrics, "idx", [3, 7, 2, 4, 2], batch_size=2)
+        assert list(found) == [3, 2, 4]
+        assert found[3] == lyric_documents[2]
+
+
+@pytest.mark.asyncio
+async def test_mget_searches_pushed_out_keys_again(toshi_client, lyric_documents):
+    docs = [{"score": 1.0, "doc": d.to_json()} for d in lyric_documents]
+    url = f"http://test.com/{Lyrics.index_name()}/"
+
+    with aioresponses() as m:
+        # Key 2 matches two documents, which fill the limit of the batch
+        m.post(url, payload={"hits": 2, "docs": [docs[0], docs[0]]})
+        m.post(url, payload={"hits": 1, "docs": [docs[2]]})
+
+        found = await toshi_client.mget(Lyrics, "idx", [2, 3])
+        assert found == {2: lyric_documents[0], 3: lyric_documents[2]}
+        retry = m.requests[("POST", URL(url))][1].kwargs["data"]
+        assert json.loads(retry)["query"]["bool"]["should"] == [{"term": {"idx": 3}}]
+        assert json.loads(retry)["limit"] == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_records_metrics():
+    metrics = ClientMetrics()
+    toshi_client = AsyncToshiClient("http://test.com", metrics=metrics)
+
+    with aioresponses() as m:
+        m.get("http://test.com/lyrics/_flush/", status=500, payload={"message": "x"})
+
+        with pytest.raises(ToshiFlushError):
+            await toshi_client.flush("lyrics")
+
+    labels = 'operation="flush",index="lyrics"'
+    exported = metrics.export()
+    assert f'toshi_client_errors_total{{{labels},status="500"}} 1' in exported
+    assert f"toshi_client_requests_in_flight{{{labels}}} 0" in exported
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_reports_phase_timings(lyric_documents):
+    reported = []
+    toshi_client = AsyncToshiClient(
+        "http://test.com", profiler=PhaseProfiler(hook=reported.append)
+    )
+
+    with aioresponses() as m:
+        m.post("http://test.com/lyrics/_bulk", status=201)
+
+        await toshi_client.bulk_insert_documents(lyric_documents)
+
+    assert [t.operation for t in reported] == ["bulk_insert_documents"]
+    assert set(reported[0].phases) == {"serialize", "network"}
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_emits_a_span_per_chunk(lyric_documents):
+    exporter = RingBufferExporter()
+    toshi_client = AsyncToshiClient("http://test.com", tracer=Tracer(exporter))
+
+    with aioresponses() as m:
+        m.post("http://test.com/lyrics/_bulk", status=201, repeat=True)
+
+        await toshi_client.bulk_insert_documents(lyric_documents, chunk_size=2)
+
+    (bulk,) = exporter.spans("toshi.bulk_insert_documents")
+    assert bulk.attributes["toshi.docs_count"] == 3
+    chunks = exporter.children(bulk)
+    assert [c.attributes["toshi.docs_count"] for c in chunks] == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_search_merges_ranges_if_asked_to():
+    toshi_client = AsyncToshiClient(
+        "http://test.com", optimize_queries=True, merge_ranges=True
+    )
+    url = f"http://test.com/{Lyrics.index_name()}/"
+    query = (
+        BoolQuery()
+        .must_match(RangeQuery(field_name="year", gte=1990))
+        .must_match(RangeQuery(field_name="year", lte=2000))
+    )
+
+    with aioresponses() as m:
+        m.post(url, payload={"hits": 0, "docs": []})
+
+        await toshi_client.search(query, Lyrics)
+
+        body = json.loads(m.requests[("POST", URL(url))][0].kwargs["data"])
+        assert body["query"]["bool"]["must"] == [
+            {"range": {"year": {"gte": 1990, "lte": 2000}}}
+        ]
@@ -0,0 +1,85 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.stand_in_server import StandInServer
+from tests.conftest import Lyrics
+from toshi_client.background import BackgroundToshiClient
+from toshi_client.errors import ToshiClientError
+from toshi_client.query.term_query import TermQuery
+from toshi_client.transport import AsyncRecordingTransport
+
+
+@pytest.fixture
+def server():
+    with StandInServer(engine=True, latency=0.05) as server:
+        yield server
+
+
+@pytest.fixture
+def loaded(server, lyrics_index, lyric_documents):
+    with BackgroundToshiClient(server.url) as client:
+        client.create_index(lyrics_index)
+        client.bulk_insert_documents(lyric_documents, commit=True)
+    return server
+
+
+def test_blocking_calls(server, lyrics_index, lyric_documents):
+    with BackgroundToshiClient(server.url) as client:
+        client.create_index(lyrics_index)
+        client.bulk_insert_documents(lyric_documents, commit=True, chunk_size=1)
+
+        assert client.list_indexes() == ["lyrics"]
+        assert [
+            d.song for d in client.search(TermQuery("creep", "lyrics"), Lyrics)
+        ] == ["Creep"]
+        assert sorted(
+            d.idx
+            for d in client.iter_search(TermQuery("a", "lyrics"), Lyrics, "idx", 0, 10)
+        ) == [2, 3]
+        client.delete_term([TermQuery("nirvana", "artist")], "lyrics")
+        client.flush("lyrics")
+        assert sorted(d.idx for d in client.get_documents(Lyrics)) == [2, 3]
+
+
+def test_msearch_sends_searches_concurrently(loaded):
+    searches = [(TermQuery(f"term{i}", "lyrics"), Lyrics) for i in range(8)]
+
+    with BackgroundToshiClient(loaded.url) as client:
+        started = time.perf_counter()
+        results = client.msearch(searches, max_concurrency=8)
+        elapsed = time.perf_counter() - started
+
+    assert [len(r) for r in results] == [0] * 8
+    # One after another, the searches would take 8 * 50ms
+    assert elapsed < 0.3
+
+
+def test_identical_searches_of_threads_share_one_request(loaded):
+    transport = AsyncRecordingTransport()
+    query = TermQuery("gold", "lyrics")
+    barrier = threading.Barrier(8)
+
+    with BackgroundToshiClient(loaded.url, transport=transport) as client:
+
+        def search(_):
+            barrier.wait()
+            return client.search(query, Lyrics)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(search, range(8)))
+
+    assert all(r[0].song == "Gold on the Ceiling" for r in results)
+    # The server takes 50ms, so all threads but a late one join the first request
+    assert len(transport.exchanges) <= 2
+
+
+def test_closed_client_raises(server):
+    client = BackgroundToshiClient(server.url)
+    client.close()
+    client.close()
+
+    with pytest.raises(ToshiClientError):
+        client.list_indexes()
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.stand_in_server import StandInServer
+from toshi_client.bench import (
+    Operation,
+    Sample,
+    execute,
+    latency_report,
+    main,
+    read_log,
+    run_closed_loop,
+    run_open_loop,
+)
+
+
+class SlowClient:
+    """Answers every search after a fixed delay."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.searches = []
+
+    async def search(self, query, document_type, facet_query=None, index_name=None):
+        await asyncio.sleep(self.delay)
+        self.searches.append((query.to_json(), facet_query, index_name))
+
+
+def search_operation(**body):
+    return Operation("search", "lyrics", {"body": body})
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "log.ndjson"
+    records = [
+        {
+            "op": "search",
+            "index": "bench",
+            "body": {"query": {"term": {"lyrics": "lorem"}}, "facets": {"f": ["/a"]}},
+        },
+        {"op": "add", "index": "bench", "document": {"lyrics": "lorem"}},
+        {"op": "bulk", "index": "bench", "documents": [{"lyrics": "lorem"}]},
+        {"op": "delete", "index": "bench", "terms": {"lyrics": "lorem"}},
+        {"op": "flush", "index": "bench"},
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n\n")
+    return str(path)
+
+
+def test_read_log(log_file):
+    operations = read_log(log_file)
+    assert [o.kind for o in operations] == ["search", "add", "bulk", "delete", "flush"]
+    assert operations[0].index_name == "bench"
+
+
+def test_read_log_rejects_unknown_operations(tmp_path):
+    path = tmp_path / "log.ndjson"
+    path.write_text('{"op": "explode", "index": "bench"}\n')
+    with pytest.raises(ValueError, match="line 1"):
+        read_log(str(path))
+
+
+@pytest.mark.asyncio
+async def test_recorded_documents_name_their_index():
+    added = []
+
+    class Client:
+        async def add_document(self, document, index_name):
+            added.append(document)
+
+    record = {"op": "add", "index": "lyrics", "document": {"song": "Creep"}}
+    await execute(Client(), Operation("add", "lyrics", record))
+
+    (document,) = added
+    assert document.index_name() == "lyrics"
+    assert type(document).index_name() == "lyrics"
+    assert document.to_json() == {"song": "Creep"}
+
+
+@pytest.mark.asyncio
+async def test_closed_loop_replays_recorded_searches():
+    client = SlowClient(0.0)
+    operations = [
+        search_operation(query={"term": {"lyrics": "gold"}}, limit=5),
+        search_operation(query={"term": {"lyrics": "creep"}}, facets={"f": ["/a"]}),
+    ]
+
+    samples = await run_closed_loop(client, operations, concurrency=2)
+
+    assert len(samples) == 2
+    assert all(s.ok for s in samples)
+    queries = sorted(json.dumps(q) for q, _, _ in client.searches)
+    assert queries == [
+        '{"query": {"term": {"lyrics": "creep"}}}',
+        '{"query": {"term": {"lyrics": "gold"}}, "limit": 5}',
+    ]
+    facets = [f for _, f, _ in client.searches if f is not None]
+    assert facets[0][0].to_json() == {"f": ["/a"]}
+
+
+@pytest.mark.asyncio
+async def test_open_loop_counts_the_time_requests_waited():
+    # The requests take 20ms one at a time, but are due every 1ms, so they queue up
+    client = SlowClient(0.02)
+    operations = [search_operation(query={"term": {"lyrics": "gold"}})] * 5
+
+    samples = await run_open_loop(client, operations, rate=1000.0, max_in_flight=1)
+
+    assert max(s.service_time for s in samples) < 0.05
+    assert max(s.latency for s in samples) >= 0.08
+
+
+def test_latency_report():
+    samples = [Sample("search", i / 1000, 0.0, i != 1) for i in range(1, 1001)]
+
+    report = latency_report("search", samples)
+
+    assert report.count == 1000
+    assert report.errors == 1
+    assert report.p50 == 0.501
+    assert report.p99 == 0.991
+    assert report.max == 1.0
+
+
+@pytest.mark.parametrize("mode", ["open", "closed"])
+def test_main_against_stand_in_server(log_file, tmp_path, mode):
+    output = tmp_path / "report.json"
+    with StandInServer() as server:
+        status = main(
+            [log_file, "--url", server.url, "--mode", mode, "--rate", "500"]
+            + ["--repeat", "2", "--output", str(output)]
+        )
+
+    report = json.loads(output.read_text())
+    assert status == 0
+    assert report["requests"] == 10
+    assert report["latency"]["errors"] == 0
+    assert sorted(report["operations"]) == ["add", "bulk", "delete", "flush", "search"]
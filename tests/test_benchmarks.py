@@ -0,0 +1,32 @@
+import requests
+
+from benchmarks.stand_in_server import StandInServer
+from benchmarks.suite import percentiles, run
+
+
+def test_stand_in_server_answers_like_toshi():
+    with StandInServer(hits=3, doc_size=5) as server:
+        resp = requests.post(f"{server.url}/bench/", data="{}")
+        assert resp.status_code == 200
+        assert resp.json()["hits"] == 3
+        assert resp.json()["docs"][0]["doc"]["lyrics"] == "xxxxx"
+        assert requests.post(f"{server.url}/bench/_bulk", data="{}").status_code == 201
+
+
+def test_percentiles():
+    stats = percentiles([float(i) for i in range(1, 101)])
+    assert stats["p50"] == 51.0
+    assert stats["p99"] == 100.0
+    assert stats["max"] == 100.0
+    assert percentiles([])["p95"] == 0.0
+
+
+def test_run_reports_both_clients():
+    report = run(num_docs=50, searches=10, concurrency=2, alloc_repeat=2)
+
+    assert report["config"]["num_docs"] == 50
+    for client in ("sync", "async"):
+        results = report["results"][client]
+        assert results["bulk_insert_documents"]["docs_per_sec"] > 0
+        assert results["bulk_insert_documents"]["alloc_bytes_per_request"] > 0
+        assert 0 < results["search"]["p50"] <= results["search"]["p99"]
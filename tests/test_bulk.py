@@ -0,0 +1,87 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from toshi_client.bulk import (
+    column_length,
+    ndjson_chunks,
+    ndjson_lines,
+    serialize_documents,
+    serialize_in_pool,
+)
+from toshi_client.index.index_builder import IndexBuilder
+
+
+def test_ndjson_lines_formats_columns(lyrics_index):
+    columns = {
+        "lyrics": ['say "hi"', "ünïcode"],
+        "year": [1991, 1992],
+        "idx": [1, None],
+        "test_facet": ["/a/b", "/c"],
+    }
+
+    lines = list(ndjson_lines(lyrics_index, columns, 2))
+
+    assert [json.loads(line) for line in lines] == [
+        {"lyrics": 'say "hi"', "year": 1991, "idx": 1, "test_facet": "/a/b"},
+        {"lyrics": "ünïcode", "year": 1992, "test_facet": "/c"},
+    ]
+
+
+def test_ndjson_lines_skips_rows(lyrics_index):
+    lines = list(ndjson_lines(lyrics_index, {"year": [1, 2, 3]}, 3, skip={1}))
+
+    assert lines == ['{"year":1}', '{"year":3}']
+
+
+def test_ndjson_lines_skips_rows_before_encoding():
+    builder = IndexBuilder()
+    builder.add_bool_filed(name="explicit", stored=True, indexed=True)
+    builder.add_text_field(name="song", stored=True)
+    index = builder.build("songs")
+    columns = {"explicit": [True, "yes", False], "song": ["a", 7, "c"]}
+
+    lines = list(ndjson_lines(index, columns, 3, skip={1}))
+
+    assert lines == ['{"explicit":true,"song":"a"}', '{"explicit":false,"song":"c"}']
+
+
+def test_ndjson_lines_with_numpy_arrays(lyrics_index):
+    np = pytest.importorskip("numpy")
+    columns = {"year": np.array([1991, 1992]), "lyrics": np.array(["a", "b"])}
+
+    lines = list(ndjson_lines(lyrics_index, columns, 2))
+
+    assert lines == ['{"year":1991,"lyrics":"a"}', '{"year":1992,"lyrics":"b"}']
+
+
+def test_ndjson_lines_rejects_unknown_columns(lyrics_index):
+    with pytest.raises(ValueError):
+        list(ndjson_lines(lyrics_index, {"unknown": [1]}, 1))
+
+
+def test_column_length_rejects_ragged_columns():
+    assert column_length({"a": [1, 2], "b": [3, 4]}) == 2
+    with pytest.raises(ValueError):
+        column_length({"a": [1, 2], "b": [3]})
+
+
+def test_ndjson_chunks():
+    lines = iter(["1", "2", "3", "4", "5"])
+
+    assert list(ndjson_chunks(lines, 2)) == ["1\n2", "3\n4", "5"]
+    assert list(ndjson_chunks(["1", "2"], None)) == ["1\n2"]
+    assert list(ndjson_chunks([], 2)) == []
+    with pytest.raises(ValueError):
+        list(ndjson_chunks(["1"], 0))
+
+
+def test_serialize_in_pool_keeps_order(lyric_documents):
+    documents = lyric_documents * 5
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        bodies = list(serialize_in_pool(executor, documents, 2, max_pending=3))
+
+    assert len(bodies) == 8
+    assert b"\n".join(bodies) == serialize_documents(documents)
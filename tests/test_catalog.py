@@ -0,0 +1,85 @@
+from unittest.mock import Mock
+
+import pytest
+
+from toshi_client.catalog import IndexCatalog, AsyncIndexCatalog
+from toshi_client.client import ToshiClient
+from toshi_client.index.index_summary import IndexSummary
+
+
+@pytest.fixture
+def client():
+    client = Mock()
+    client.list_indexes.return_value = ["lyrics"]
+    client.get_index_summary.return_value = Mock(spec=IndexSummary)
+    return client
+
+
+def test_reads_are_cached(client):
+    catalog = IndexCatalog(client, refresh_interval=60.0)
+
+    assert catalog.list_indexes() == ["lyrics"]
+    assert catalog.list_indexes() == ["lyrics"]
+    summary = catalog.get_index_summary("lyrics")
+    assert catalog.get_index_summary("lyrics") is summary
+
+    client.list_indexes.assert_called_once()
+    client.get_index_summary.assert_called_once_with("lyrics", include_size=False)
+    catalog.close()
+
+
+def test_refresh_drops_removed_indexes(client):
+    catalog = IndexCatalog(client, refresh_interval=60.0)
+    catalog.get_index_summary("lyrics")
+
+    client.list_indexes.return_value = ["books"]
+    catalog.refresh()
+
+    assert catalog.list_indexes() == ["books"]
+    catalog.get_index_summary("lyrics")
+    assert client.get_index_summary.call_count == 2
+    catalog.close()
+
+
+@pytest.mark.asyncio
+async def test_async_reads_are_cached():
+    client = Mock()
+    summary = Mock(spec=IndexSummary)
+
+    async def get_index_summary(name, include_size):
+        return summary
+
+    client.get_index_summary = Mock(side_effect=get_index_summary)
+    catalog = AsyncIndexCatalog(client, refresh_interval=60.0)
+
+    assert await catalog.get_index_summary("lyrics") is summary
+    assert await catalog.get_index_summary("lyrics") is summary
+    client.get_index_summary.assert_called_once()
+    await catalog.close()
+
+
+def test_closing_the_client_stops_the_refresher():
+    with ToshiClient("http://localhost:8080") as client:
+        refresher = client.catalog._refresher
+        assert refresher.is_alive()
+
+    assert not refresher.is_alive()
+    assert client._catalog is None
+
+
+def test_refresh_racing_an_invalidation_is_discarded(client):
+    catalog = IndexCatalog(client, refresh_interval=60.0)
+    catalog.get_index_summary("lyrics")
+    stale = Mock(spec=IndexSummary)
+
+    def get_index_summary(name, include_size):
+        # The index is recreated while the refresh loads its old summary
+        catalog.invalidate(name)
+        return stale
+
+    client.get_index_summary.side_effect = get_index_summary
+    catalog.refresh()
+
+    client.get_index_summary.side_effect = None
+    assert catalog.get_index_summary("lyrics") is not stale
+    catalog.close()
@@ -0,0 +1,141 @@
+import pytest
+
+from toshi_client.index.document_validator import DocumentValidator
+from toshi_client.index.index_builder import IndexBuilder
+from toshi_client.index.index_summary import IndexSummary
+from toshi_client.models.document import Document
+from tests.conftest import Lyrics
+
+
+def test_validate_accepts_valid_documents(lyrics_index, lyric_documents):
+    validation = DocumentValidator(lyrics_index).validate(lyric_documents)
+
+    assert validation.rejected == []
+    assert validation.documents == [doc.to_json() for doc in lyric_documents]
+
+
+def test_validate_splits_out_invalid_documents(
+    lyrics_index, black_keys_lyrics_document, nirvana_lyrics_document
+):
+    negative_idx = Lyrics("la", 2000, -1, "a", "b", "c", "/a")
+    float_year = Lyrics("la", 2000.5, 1, "a", "b", "c", "/a")
+    bad_facet = Lyrics("la", 2000, 1, "a", "b", "c", "a")
+    missing = Lyrics("la", 2000, 1, "a", "b", "c", "/a")
+    del missing.song
+
+    documents = [
+        black_keys_lyrics_document,
+        negative_idx,
+        float_year,
+        nirvana_lyrics_document,
+        bad_facet,
+        missing,
+    ]
+    validation = DocumentValidator(lyrics_index).validate(documents)
+
+    assert validation.documents == [
+        black_keys_lyrics_document.to_json(),
+        nirvana_lyrics_document.to_json(),
+    ]
+    assert [r.document for r in validation.rejected] == [
+        negative_idx,
+        float_year,
+        bad_facet,
+        missing,
+    ]
+    assert "'idx'" in validation.rejected[0].reason
+    assert "'song' is missing" in validation.rejected[3].reason
+
+
+def test_validate_coerces_values():
+    builder = IndexBuilder()
+    builder.add_u64_field(name="count", stored=True, coerce=True)
+    builder.add_text_field(name="label", stored=True, coerce=True)
+    builder.add_i64_field(name="strict", stored=False)
+    validator = DocumentValidator(builder.build("coerced"))
+
+    class Doc(Lyrics):
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    documents = [
+        Doc(count=" 42", label=True, strict=1),
+        Doc(count="x", label="a", strict=1),
+        Doc(count=1, label="b", strict="1"),
+        Doc(count=2, label=1.5),
+    ]
+    validation = validator.validate(documents)
+
+    assert validation.documents == [
+        {"count": 42, "label": "true", "strict": 1},
+        {"count": 2, "label": "1.5"},
+    ]
+    assert [r.document for r in validation.rejected] == documents[1:3]
+    assert documents[0].count == " 42"
+
+
+def test_validate_columns_with_numpy_arrays(lyrics_index):
+    np = pytest.importorskip("numpy")
+    validator = DocumentValidator(lyrics_index)
+    columns = {
+        "year": np.array([1991, 1992]),
+        "idx": np.array([1, -2]),
+    }
+
+    checked, errors = validator.validate_columns(columns, 2)
+
+    assert checked["year"] is columns["year"]
+    assert checked["idx"] == [1, -2]
+    assert set(errors) == {0, 1}
+    assert "'lyrics' is missing" in errors[0]
+    assert "'idx'" in errors[1]
+
+
+class Song(Document):
+    @staticmethod
+    def index_name() -> str:
+        return "numbers"
+
+    def __init__(self, year, explicit):
+        self.year = year
+        self.explicit = explicit
+
+
+def test_validate_with_schema_from_summary():
+    summary = IndexSummary.from_json(
+        "numbers",
+        {
+            "index_settings": {
+                "docstore_compression": "lz4",
+                "docstore_blocksize": 16384,
+            },
+            "segments": [],
+            "schema": [
+                {
+                    "name": "year",
+                    "type": "u64",
+                    "options": {"indexed": True, "fieldnorms": True, "stored": True},
+                },
+                {
+                    "name": "explicit",
+                    "type": "bool",
+                    "options": {"indexed": True, "fieldnorms": True, "stored": True},
+                },
+            ],
+            "opstamp": 0,
+        },
+    )
+
+    valid, invalid = Song(1992, True), Song("abc", False)
+
+    validation = DocumentValidator(summary.index).validate([valid, invalid])
+
+    assert validation.documents == [{"year": 1992, "explicit": True}]
+    assert [(r.document, r.reason) for r in validation.rejected] == [
+        (invalid, "The field 'year' expects u64 values, got 'abc'.")
+    ]
+
+
+def test_validate_columns_rejects_unknown_columns(lyrics_index):
+    with pytest.raises(ValueError, match="album"):
+        DocumentValidator(lyrics_index).validate_columns({"album": ["x"]}, 1)
@@ -0,0 +1,158 @@
+import json
+
+import pytest
+
+from benchmarks.engine import Engine, EngineError
+from benchmarks.stand_in_server import StandInServer
+from tests.conftest import Lyrics
+from toshi_client.client import ToshiClient
+from toshi_client.index.index_summary import IndexSummary
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.facet_query import FacetQuery
+from toshi_client.query.fuzzy_query import FuzzyQuery
+from toshi_client.query.phrase_query import PhraseQuery
+from toshi_client.query.range_query import RangeQuery
+from toshi_client.query.regex_query import RegexQuery
+from toshi_client.query.term_query import TermQuery
+
+
+@pytest.fixture
+def engine(lyrics_index, lyric_documents):
+    engine = Engine()
+    engine.create_index("lyrics", json.loads(json.dumps(lyrics_index.to_json())))
+    engine.bulk_insert("lyrics", [json.dumps(d.to_json()) for d in lyric_documents])
+    engine.flush("lyrics")
+    return engine
+
+
+def search(engine, query, facet_query=None):
+    body = query.to_json()
+    if facet_query is not None:
+        body["facets"] = {k: v for f in facet_query for k, v in f.to_json().items()}
+    return engine.search("lyrics", body)
+
+
+def songs(response):
+    return [d["doc"]["song"] for d in response["docs"]]
+
+
+def test_documents_are_visible_after_commit(engine, black_keys_lyrics_document):
+    engine.add_document("lyrics", {"document": black_keys_lyrics_document.to_json()})
+    assert search(engine, TermQuery("ceiling", "lyrics"))["hits"] == 1
+
+    engine.flush("lyrics")
+    assert search(engine, TermQuery("ceiling", "lyrics"))["hits"] == 2
+
+
+def test_term_query_scores_shorter_fields_higher(engine):
+    engine.bulk_insert("lyrics", [json.dumps({"lyrics": "creep", "song": "Short"})])
+    engine.flush("lyrics")
+
+    response = search(engine, TermQuery("creep", "lyrics"))
+
+    assert songs(response) == ["Short", "Creep"]
+    assert response["docs"][0]["score"] > response["docs"][1]["score"] > 0
+
+
+def test_term_query_on_numeric_field(engine):
+    assert songs(search(engine, TermQuery("1991", "year"))) == [
+        "Smells Like Teen Spirit"
+    ]
+
+
+def test_range_query_bounds(engine):
+    assert search(engine, RangeQuery("year", gte=1991, lte=1992))["hits"] == 2
+    assert search(engine, RangeQuery("year", gt=1991, lt=2011))["hits"] == 1
+    assert search(engine, RangeQuery("year", gte=2011))["hits"] == 1
+
+
+def test_regex_and_fuzzy_queries(engine):
+    assert songs(search(engine, RegexQuery("weird.*", "lyrics"))) == ["Creep"]
+    assert songs(search(engine, FuzzyQuery("cieling", 1, True, "lyrics"))) == [
+        "Gold on the Ceiling"
+    ]
+    assert search(engine, FuzzyQuery("cieling", 1, False, "lyrics"))["hits"] == 0
+
+
+def test_phrase_query(engine):
+    assert search(engine, PhraseQuery("lyrics", ["lights", "out"]))["hits"] == 1
+    assert search(engine, PhraseQuery("lyrics", ["out", "lights"]))["hits"] == 0
+    assert (
+        search(engine, PhraseQuery("lyrics", ["the", "out"], offsets=[0, 2]))["hits"]
+        == 1
+    )
+
+
+def test_bool_query(engine):
+    query = (
+        BoolQuery()
+        .must_match(RangeQuery("year", gte=1990))
+        .must_not_match(TermQuery("nirvana", "artist"))
+        .should_match(TermQuery("creep", "lyrics"))
+    )
+    assert songs(search(engine, query)) == ["Creep", "Gold on the Ceiling"]
+
+    should_only = (
+        BoolQuery()
+        .should_match(TermQuery("creep", "lyrics"))
+        .should_match(TermQuery("gold", "lyrics"))
+    )
+    assert search(engine, should_only)["hits"] == 2
+
+
+def test_facets_count_the_children_of_the_requested_facet(engine):
+    response = search(
+        engine,
+        RangeQuery("year", gte=1991),
+        facet_query=[FacetQuery("test_facet", ["/a"])],
+    )
+    assert response["facets"] == [{"field": "/a/b", "value": 3}]
+
+
+def test_limit(engine):
+    response = search(engine, RangeQuery("year", gte=0, limit=2))
+    assert response["hits"] == 2
+    assert len(response["docs"]) == 2
+
+
+def test_deletes_take_effect_on_commit(engine):
+    body = {"terms": {"artist": "radiohead"}, "options": {"commit": False}}
+    assert engine.delete_terms("lyrics", body) == {"docs_affected": 1}
+    assert search(engine, TermQuery("radiohead", "artist"))["hits"] == 1
+
+    engine.flush("lyrics")
+    assert search(engine, TermQuery("radiohead", "artist"))["hits"] == 0
+    assert engine.all_documents("lyrics")["hits"] == 2
+
+
+def test_errors(engine):
+    with pytest.raises(EngineError) as e:
+        engine.search("unknown", {"query": {"term": {"lyrics": "gold"}}})
+    assert e.value.status == 404
+
+    with pytest.raises(EngineError, match="Unknown field"):
+        search(engine, TermQuery("gold", "unknown"))
+
+
+def test_summary_parses_as_index_summary(engine, lyrics_index):
+    summary = IndexSummary.from_json("lyrics", engine.summary("lyrics")["summaries"])
+
+    assert summary.index.name == "lyrics"
+    assert [f.name for f in summary.index.fields] == [
+        f.name for f in lyrics_index.fields
+    ]
+    assert summary.opstamp == 1
+
+
+def test_client_against_engine_server(lyrics_index, lyric_documents):
+    with StandInServer(engine=True) as server:
+        client = ToshiClient(server.url)
+        client.create_index(lyrics_index)
+        client.bulk_insert_documents(lyric_documents, commit=True)
+
+        result = client.search(TermQuery("creep", "lyrics"), Lyrics)
+
+        assert client.list_indexes() == ["lyrics"]
+        assert [d.song for d in result] == ["Creep"]
+        assert client.delete_term([TermQuery("2", "idx")], "lyrics", commit=True) == 1
+        assert len(client.get_documents(Lyrics)) == 2
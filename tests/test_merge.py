@@ -0,0 +1,29 @@
+import pytest
+
+from toshi_client.merge import merge_top_k
+
+
+def response(*scores):
+    return {"docs": [{"score": s, "doc": {"score": s}} for s in scores]}
+
+
+def test_merge_top_k():
+    responses = [response(5.0, 3.0, 1.0), response(4.0, 2.0)]
+
+    top_k = merge_top_k(responses, k=3)
+
+    assert [(score, pos) for score, pos, _ in top_k] == [(5.0, 0), (4.0, 1), (3.0, 0)]
+
+
+def test_merge_top_k_boosts():
+    responses = [response(5.0, 3.0), response(4.0, 2.0)]
+
+    top_k = merge_top_k(responses, k=2, boosts=[1.0, 2.0])
+
+    assert [(score, pos) for score, pos, _ in top_k] == [(8.0, 1), (5.0, 0)]
+
+
+def test_merge_top_k_of_zero_hits():
+    assert merge_top_k([response(5.0)], k=0) == []
+    with pytest.raises(ValueError):
+        merge_top_k([response(5.0)], k=-1)
@@ -0,0 +1,64 @@
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from toshi_client.metrics import ClientMetrics
+
+
+def test_export_merges_threads():
+    metrics = ClientMetrics(buckets=(0.5, 1.0))
+
+    def record(status):
+        started = metrics.start("search", "lyrics")
+        metrics.finish("search", "lyrics", started, status, 10, 100)
+
+    threads = [threading.Thread(target=record, args=(s,)) for s in (200, 500, None)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    metrics.start("flush", "lyrics")
+
+    lines = metrics.export().splitlines()
+
+    labels = 'operation="search",index="lyrics"'
+    assert (
+        f'toshi_client_request_duration_seconds_bucket{{{labels},le="0.5"}} 3' in lines
+    )
+    assert (
+        f'toshi_client_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    )
+    assert f"toshi_client_request_duration_seconds_count{{{labels}}} 3" in lines
+    assert f"toshi_client_request_bytes_total{{{labels}}} 30" in lines
+    assert f"toshi_client_response_bytes_total{{{labels}}} 300" in lines
+    assert f'toshi_client_errors_total{{{labels},status="500"}} 1' in lines
+    assert f'toshi_client_errors_total{{{labels},status="none"}} 1' in lines
+    assert f"toshi_client_requests_in_flight{{{labels}}} 0" in lines
+    assert (
+        'toshi_client_requests_in_flight{operation="flush",index="lyrics"} 1' in lines
+    )
+
+
+def test_export_escapes_labels():
+    metrics = ClientMetrics()
+    metrics.finish("search", 'a"b', metrics.start("search", 'a"b'), 200)
+
+    assert 'index="a\\"b"' in metrics.export()
+
+
+def test_shards_of_finished_threads_are_folded():
+    metrics = ClientMetrics(buckets=(0.5, 1.0))
+
+    def record(_):
+        metrics.finish("search", "lyrics", metrics.start("search", "lyrics"), 200)
+
+    # Like the fan-out calls, every round starts a new pool of threads
+    for _ in range(20):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(record, range(4)))
+    gc.collect()
+
+    assert len(metrics._shards) <= 4
+    labels = 'operation="search",index="lyrics"'
+    lines = metrics.export().splitlines()
+    assert f"toshi_client_request_duration_seconds_count{{{labels}}} 80" in lines
@@ -0,0 +1,65 @@
+from benchmarks.micro import (
+    Timing,
+    cases,
+    compare,
+    load_baselines,
+    main,
+    measure,
+    run,
+    store_baselines,
+)
+
+
+def test_cases_run():
+    for call in cases().values():
+        call()
+
+
+def test_measure():
+    timing = measure(lambda: sum(range(100)), min_time=0.001, repeat=2)
+    assert timing.ns > 0
+    assert timing.relative > 0
+
+
+def test_run_selects_cases_by_name():
+    results = run(["document."], min_time=0.001, repeat=1)
+    assert sorted(results) == ["document.eq", "document.to_json"]
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baselines = {"a": Timing(ns=100, relative=1.0), "b": Timing(ns=100, relative=1.0)}
+    results = {
+        "a": Timing(ns=300, relative=1.1),
+        "b": Timing(ns=130, relative=1.3),
+        "c": Timing(ns=100, relative=1.0),
+    }
+
+    comparisons = {c.name: c for c in compare(results, baselines, threshold=0.2)}
+
+    assert not comparisons["a"].regressed
+    assert comparisons["b"].regressed
+    assert round(comparisons["b"].change, 6) == 0.3
+    assert comparisons["c"].baseline_ns is None
+    assert not comparisons["c"].regressed
+
+
+def test_baselines_round_trip(tmp_path):
+    path = str(tmp_path / "baselines.json")
+    assert load_baselines(path) == {}
+
+    store_baselines({"a": Timing(ns=1.0, relative=2.0)}, path)
+
+    assert load_baselines(path) == {"a": Timing(ns=1.0, relative=2.0)}
+
+
+def test_main_fails_on_regression(tmp_path):
+    path = str(tmp_path / "baselines.json")
+    args = ["document.to_json", "--baselines", path, "--min-time", "0.001"]
+    assert main(args + ["--update"]) == 0
+
+    store_baselines({"document.to_json": Timing(ns=1.0, relative=1e-9)}, path)
+    assert main(args + ["--retries", "0"]) == 1
+
+
+def test_stored_baselines_cover_all_cases():
+    assert sorted(load_baselines()) == sorted(cases())
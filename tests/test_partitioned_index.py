@@ -0,0 +1,190 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from toshi_client.errors import ToshiDocumentError, ToshiIndexError
+from toshi_client.index.enums import PartitionGranularity
+from toshi_client.index.index_builder import IndexBuilder
+from toshi_client.index.partitioned_index import (
+    AsyncTimePartitionedIndex,
+    TimePartitionedIndex,
+)
+from toshi_client.models.document import Document
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.range_query import RangeQuery
+from toshi_client.query.term_query import TermQuery
+
+DAY = 24 * 60 * 60
+OCT_17 = int(datetime(2026, 10, 17, tzinfo=timezone.utc).timestamp())
+
+
+class Event(Document):
+    @staticmethod
+    def index_name() -> str:
+        return "events"
+
+    def __init__(self, name: str, ts: int):
+        self.name = name
+        self.ts = ts
+
+
+@pytest.fixture
+def events_index():
+    builder = IndexBuilder()
+    builder.add_text_field(name="name", stored=True)
+    builder.add_i64_field(name="ts", stored=True, indexed=True)
+    return builder.build("events")
+
+
+@pytest.fixture
+def client():
+    client = Mock()
+    client.list_indexes.return_value = [
+        "events-2026-10-15",
+        "events-2026-10-16",
+        "lyrics",
+    ]
+    client._search_response.return_value = {"hits": 0, "docs": []}
+    return client
+
+
+def test_bulk_insert_creates_partitions(client, events_index):
+    index = TimePartitionedIndex(client, events_index, "ts")
+
+    index.bulk_insert_documents(
+        [Event("a", OCT_17 - DAY + 5), Event("b", OCT_17 + 5), Event("c", OCT_17)]
+    )
+
+    client.create_index.assert_called_once()
+    assert client.create_index.call_args.args[0].name == "events-2026-10-17"
+    assert index.partitions() == [
+        "events-2026-10-15",
+        "events-2026-10-16",
+        "events-2026-10-17",
+    ]
+
+
+def test_search_prunes_partitions(client, events_index):
+    index = TimePartitionedIndex(client, events_index, "ts")
+    query = (
+        BoolQuery()
+        .must_match(TermQuery(term="a", field_name="name"))
+        .must_match(RangeQuery(field_name="ts", gte=OCT_17 - DAY + 60))
+    )
+
+    index.search(query, Event)
+
+    searched = [c.args[1] for c in client._search_response.call_args_list]
+    assert searched == ["events-2026-10-16"]
+
+
+@pytest.mark.parametrize(
+    "bounds, searched",
+    [
+        ({"lt": OCT_17 - DAY}, ["events-2026-10-15"]),
+        ({"lte": OCT_17 - DAY}, ["events-2026-10-15", "events-2026-10-16"]),
+        ({"lte": OCT_17 - DAY, "lt": OCT_17 - DAY}, ["events-2026-10-15"]),
+    ],
+)
+def test_search_prunes_by_upper_bound(client, events_index, bounds, searched):
+    index = TimePartitionedIndex(client, events_index, "ts")
+
+    index.search(RangeQuery(field_name="ts", **bounds), Event)
+
+    assert [c.args[1] for c in client._search_response.call_args_list] == searched
+
+
+def test_hourly_partition_names(client, events_index):
+    index = TimePartitionedIndex(
+        client, events_index, "ts", granularity=PartitionGranularity.HOUR
+    )
+
+    index.add_document(Event("a", OCT_17 + 3 * 60 * 60))
+
+    assert client.add_document.call_args.kwargs["index_name"] == "events-2026-10-17-03"
+
+
+def test_drop_expired(client, events_index):
+    index = TimePartitionedIndex(
+        client, events_index, "ts", retention=timedelta(days=1)
+    )
+
+    dropped = index.drop_expired(now=datetime(2026, 10, 17, 12, tzinfo=timezone.utc))
+
+    assert dropped == ["events-2026-10-15"]
+    assert index.partitions() == ["events-2026-10-16"]
+    with pytest.raises(ToshiDocumentError):
+        index.add_document(Event("a", OCT_17 - 2 * DAY))
+
+
+def test_concurrent_writers_create_a_partition_once(client, events_index):
+    index = TimePartitionedIndex(client, events_index, "ts")
+    index.refresh()
+
+    def create_index(partition):
+        # Give the other writers time to find the partition missing
+        time.sleep(0.05)
+
+    client.create_index.side_effect = create_index
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(index.add_document, [Event("a", OCT_17)] * 4))
+
+    client.create_index.assert_called_once()
+    assert client.add_document.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_async_concurrent_writers_create_a_partition_once(events_index):
+    client = AsyncMock()
+    client.list_indexes.return_value = ["events-2026-10-16"]
+    index = AsyncTimePartitionedIndex(client, events_index, "ts")
+
+    async def create_index(partition):
+        await asyncio.sleep(0.01)
+
+    client.create_index.side_effect = create_index
+    await asyncio.gather(*[index.add_document(Event("a", OCT_17)) for _ in range(4)])
+
+    client.create_index.assert_awaited_once()
+    assert await index.partitions() == ["events-2026-10-16", "events-2026-10-17"]
+
+
+def test_writer_losing_the_creation_race_uses_the_partition(client, events_index):
+    index = TimePartitionedIndex(client, events_index, "ts")
+    index.refresh()
+    # Another process creates the partition first
+    client.list_indexes.return_value = ["events-2026-10-16", "events-2026-10-17"]
+    client.create_index.side_effect = ToshiIndexError("Index already exists")
+
+    index.add_document(Event("a", OCT_17))
+
+    assert client.add_document.call_args.kwargs["index_name"] == "events-2026-10-17"
+
+
+def test_failed_creation_of_a_missing_partition_raises(client, events_index):
+    index = TimePartitionedIndex(client, events_index, "ts")
+    client.create_index.side_effect = ToshiIndexError("Failed")
+
+    with pytest.raises(ToshiIndexError):
+        index.add_document(Event("a", OCT_17))
+    client.add_document.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_writer_losing_the_creation_race_uses_the_partition(
+    events_index,
+):
+    client = AsyncMock()
+    client.list_indexes.return_value = ["events-2026-10-16"]
+    index = AsyncTimePartitionedIndex(client, events_index, "ts")
+    await index.refresh()
+    client.list_indexes.return_value = ["events-2026-10-16", "events-2026-10-17"]
+    client.create_index.side_effect = ToshiIndexError("Index already exists")
+
+    await index.add_document(Event("a", OCT_17))
+
+    assert client.add_document.call_args.kwargs["index_name"] == "events-2026-10-17"
@@ -0,0 +1,74 @@
+from unittest.mock import Mock
+
+import pytest
+
+from tests.conftest import Lyrics
+from toshi_client.index.sharded_index import ShardedIndex
+from toshi_client.query.term_query import TermQuery
+
+
+@pytest.fixture
+def nodes():
+    return [Mock(), Mock()]
+
+
+@pytest.fixture
+def sharded_index(lyrics_index, nodes):
+    index = ShardedIndex(lyrics_index, key_field="idx", num_shards=4, nodes=nodes)
+    yield index
+    index.close()
+
+
+def test_create(sharded_index, nodes):
+    sharded_index.create()
+
+    created = [c.args[0].name for n in nodes for c in n.create_index.call_args_list]
+    assert sorted(created) == [f"lyrics-shard-{i}" for i in range(4)]
+
+
+def test_unknown_key_field(lyrics_index, nodes):
+    with pytest.raises(ValueError):
+        ShardedIndex(lyrics_index, key_field="unknown", num_shards=2, nodes=nodes)
+
+
+def test_bulk_insert_routes_by_key(sharded_index, nodes, lyric_documents):
+    sharded_index.bulk_insert_documents(lyric_documents)
+
+    for node in nodes:
+        for call in node.bulk_insert_documents.call_args_list:
+            shard = call.kwargs["index_name"]
+            assert all(
+                sharded_index.shards[sharded_index.shard_of(doc.idx)].name == shard
+                for doc in call.args[0]
+            )
+    inserted = sum(
+        len(c.args[0]) for n in nodes for c in n.bulk_insert_documents.call_args_list
+    )
+    assert inserted == len(lyric_documents)
+
+
+def test_search_merges_shards(sharded_index, nodes, black_keys_lyrics_document):
+    doc = black_keys_lyrics_document.to_json()
+    for node in nodes:
+        node._search_response.side_effect = lambda query, name, facets: {
+            "hits": 1,
+            "docs": [{"score": float(name[-1]), "doc": doc}],
+            "facets": [{"field": "/a/b", "value": 1}],
+        }
+
+    results = sharded_index.search(
+        TermQuery(term="gold", field_name="lyrics"), Lyrics, k=2
+    )
+
+    assert [r["score"] for r in results] == [3.0, 2.0]
+    assert results.hits == 4
+    assert results.facet_counts() == {"/a/b": 4}
+
+
+def test_delete_term_routes_by_key(sharded_index, nodes):
+    for node in nodes:
+        node.delete_term.return_value = 1
+
+    term_queries = [TermQuery(term="2", field_name="idx")]
+    assert sharded_index.delete_term(term_queries, key=2) == 1
+    assert sharded_index.delete_term(term_queries) == 4
@@ -0,0 +1,50 @@
+import json
+
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.range_query import RangeQuery
+from toshi_client.query.term_query import TermQuery
+from toshi_client.slow_query_log import SlowQueryLog
+
+
+def test_queries_of_one_shape_share_an_entry():
+    log = SlowQueryLog()
+    for i in range(100):
+        log.record("lyrics", TermQuery(term=str(i), field_name="song"), None, i / 100)
+    log.record("lyrics", TermQuery(term="x", field_name="artist"), None, 100.0)
+    log.record("other", TermQuery(term="x", field_name="song"), None, 0.5)
+
+    top = log.top(n=2)
+
+    assert [(s.index_name, s.count) for s in top] == [("lyrics", 1), ("lyrics", 100)]
+    song = top[1]
+    assert round(song.total, 6) == 49.5
+    assert song.p50 == 0.5
+    assert song.p99 == 0.99
+    assert song.max == 0.99
+    assert "song" in song.shape and "0" not in song.shape
+    assert log.top(by="count")[0].fingerprint == song.fingerprint
+
+
+def test_threshold_and_max_entries():
+    log = SlowQueryLog(threshold=0.1, max_entries=1)
+    log.record("lyrics", TermQuery(term="x", field_name="song"), None, 0.05)
+    log.record("lyrics", TermQuery(term="x", field_name="song"), None, 0.2)
+    log.record("lyrics", RangeQuery(field_name="year").gt(1), None, 0.2)
+
+    assert [s.count for s in log.top()] == [1]
+    assert log.dropped == 1
+
+
+def test_dump_appends_to_a_rotating_file(tmp_path):
+    path = tmp_path / "slow.log"
+    log = SlowQueryLog(path=str(path), max_bytes=1000, backup_count=1)
+    query = BoolQuery().must_match(TermQuery(term="x", field_name="song"))
+
+    for _ in range(20):
+        log.record("lyrics", query, None, 1.0)
+        log.dump(n=1)
+    log.close()
+
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[-1])["count"] == 20
+    assert (tmp_path / "slow.log.1").exists()
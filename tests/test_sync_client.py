@@ -1,13 +1,23 @@
+import json
 from unittest.mock import patch, Mock
 
 import pytest
 
+from toshi_client.cache.memory_cache import MemorySearchCache
 from toshi_client.client import ToshiClient
+from toshi_client.errors import ToshiClientError, ToshiQueryError
 from toshi_client.index.index import Index
 from toshi_client.index.index_summary import IndexSummary
+from toshi_client.metrics import ClientMetrics
+from toshi_client.slow_query_log import SlowQueryLog
+from toshi_client.timing import PhaseProfiler
+from toshi_client.tracing import RingBufferExporter, Tracer
 from toshi_client.models.document import Document
 from toshi_client.models.query import Query
+from toshi_client.query.bool_query import BoolQuery
+from toshi_client.query.range_query import RangeQuery
 from toshi_client.query.term_query import TermQuery
+from tests.conftest import Lyrics
 
 
 @pytest.fixture
@@ -153,6 +163,101 @@ def test_bulk_insert_documents(mock_post, toshi_client):
     )
 
 
+@patch("requests.post")
+def test_bulk_insert_documents_validates_documents(
+    mock_post, lyrics_index, black_keys_lyrics_document
+):
+    toshi_client = ToshiClient("http://localhost:8080")
+    toshi_client._catalog = Mock()
+    toshi_client._catalog.get_index.return_value = lyrics_index
+    invalid = Lyrics("la", 2000, -1, "a", "b", "c", "/a")
+
+    mock_response = Mock()
+    mock_response.status_code = 201
+    mock_post.return_value = mock_response
+
+    rejected = toshi_client.bulk_insert_documents(
+        [black_keys_lyrics_document, invalid], validate=True
+    )
+
+    assert [r.document for r in rejected] == [invalid]
+    mock_post.assert_called_once_with(
+        "http://localhost:8080/lyrics/_bulk",
+        data=json.dumps(black_keys_lyrics_document.to_json()),
+    )
+
+
+@patch("requests.post")
+def test_bulk_insert_columns(mock_post, lyrics_index, black_keys_lyrics_document):
+    toshi_client = ToshiClient("http://localhost:8080")
+    toshi_client._catalog = Mock()
+    toshi_client._catalog.get_index.return_value = lyrics_index
+
+    mock_response = Mock()
+    mock_response.status_code = 201
+    mock_post.return_value = mock_response
+
+    row = black_keys_lyrics_document.to_json()
+    columns = {name: [value] * 3 for name, value in row.items()}
+    columns["idx"] = [1, -1, 3]
+
+    rejected = toshi_client.bulk_insert_columns("lyrics", columns, chunk_size=1)
+
+    assert list(rejected) == [1]
+    assert mock_post.call_count == 2
+    body = mock_post.call_args.kwargs["data"]
+    assert json.loads(body) == {**row, "idx": 3}
+
+
+@patch("requests.post")
+def test_bulk_insert_columns_drops_mistyped_rows(
+    mock_post, lyrics_index, black_keys_lyrics_document
+):
+    toshi_client = ToshiClient("http://localhost:8080")
+    toshi_client._catalog = Mock()
+    toshi_client._catalog.get_index.return_value = lyrics_index
+    mock_post.return_value = Mock(status_code=201)
+
+    row = black_keys_lyrics_document.to_json()
+    columns = {name: [value] * 2 for name, value in row.items()}
+    columns["lyrics"] = [123, row["lyrics"]]
+
+    rejected = toshi_client.bulk_insert_columns("lyrics", columns)
+
+    assert list(rejected) == [0]
+    assert json.loads(mock_post.call_args.kwargs["data"]) == row
+
+
+@patch("requests.post")
+def test_bulk_insert_columns_rejects_unknown_columns(
+    mock_post, lyrics_index, black_keys_lyrics_document
+):
+    toshi_client = ToshiClient("http://localhost:8080")
+    toshi_client._catalog = Mock()
+    toshi_client._catalog.get_index.return_value = lyrics_index
+    columns = {k: [v] for k, v in black_keys_lyrics_document.to_json().items()}
+    columns["album"] = ["Brothers"]
+
+    with pytest.raises(ValueError, match="album"):
+        toshi_client.bulk_insert_columns("lyrics", columns)
+    mock_post.assert_not_called()
+
+
+@patch("requests.post")
+def test_bulk_load(mock_post, toshi_client, lyric_documents):
+    mock_response = Mock()
+    mock_response.status_code = 201
+    mock_post.return_value = mock_response
+
+    toshi_client.bulk_load("lyrics", iter(lyric_documents), chunk_size=2, max_workers=2)
+
+    bodies = [c.kwargs["data"] for c in mock_post.call_args_list]
+    assert [json.loads(line) for body in bodies for line in body.splitlines()] == [
+        doc.to_json() for doc in lyric_documents
+    ]
+    assert len(bodies) == 2
+
+
 @patch("requests.get")
 def test_get_documents(mock_get, toshi_client):
     document = Mock(spec=Document)
@@ -227,3 +332,312 @@ def test_search(mock_post, toshi_client):
         data='{"query": "data"}',
     )
     assert len(results) == 1
+
+
+@patch("requests.post")
+def test_search_cached(mock_post):
+    toshi_client = ToshiClient("http://localhost:8080", cache=MemorySearchCache())
+    query = Mock(spec=Query)
+    query.to_json.return_value = {"query": "data"}
+    document_type = Mock(spec=Document)
+    document_type.index_name.return_value = "test_index"
+
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"docs": [{"doc": {"data": "value"}}]}
+    mock_post.return_value = mock_response
+
+    toshi_client.search(query, document_type)
+    results = toshi_client.search(query, document_type)
+    assert len(results) == 1
+    assert mock_post.call_count == 1
+
+    with patch("requests.get") as mock_get:
+        mock_get.return_value = mock_response
+        toshi_client.flush("test_index")
+
+    toshi_client.search(query, document_type)
+    assert mock_post.call_count == 2
+
+
+@patch("requests.post")
+def test_msearch(mock_post, toshi_client):
+    query = Mock(spec=Query)
+    query.to_json.return_value = {"query": "data"}
+    document_type = Mock(spec=Document)
+    document_type.index_name.return_value = "test_index"
+    failing_type = Mock(spec=Document)
+    failing_type.index_name.return_value = "unknown_index"
+
+    def post(url, headers, data):
+        mock_response = Mock()
+        if url == "http://localhost:8080/unknown_index/":
+            mock_response.json.return_value = {"message": "Unknown Index"}
+        else:
+            mock_response.json.return_value = {"docs": [{"doc": {"data": "value"}}]}
+        return mock_response
+
+    mock_post.side_effect = post
+
+    results = toshi_client.msearch(
+        [(query, document_type), (query, failing_type), (query, document_type, None)]
+    )
+    assert len(results[0]) == 1
+    assert isinstance(results[1], ToshiClientError)
+    assert len(results[2]) == 1
+
+
+def test_iter_search(toshi_client):
+    keys = [1, 2, 3, 5, 8, 13, 21, 34, 55, 89]
+
+    def search(query, document_type):
+        bounds = query.to_json()["query"]["bool"]["must"][1]["range"]["idx"]
+        hits = [k for k in keys if bounds["gte"] <= k < bounds["lt"]]
+        return hits[: query.to_json()["limit"]]
+
+    with patch.object(toshi_client, "search", side_effect=search) as mock_search:
+        query = TermQuery(term="the", field_name="lyrics")
+        docs = list(
+            toshi_client.iter_search(
+                query, Mock(spec=Document), "idx", start=0, stop=100, page_size=3
+            )
+        )
+
+    assert docs == keys
+    assert all(
+        len(c.args[0].to_json()["query"]["bool"]["must"]) == 2
+        for c in mock_search.call_args_list
+    )
+
+
+class Books(Lyrics):
+    @staticmethod
+    def index_name() -> str:
+        return "books"
+
+
+@patch("requests.post")
+def test_federated_search(mock_post, toshi_client, black_keys_lyrics_document):
+    doc = black_keys_lyrics_document.to_json()
+    responses = {
+        "http://localhost:8080/lyrics/": {"docs": [{"score": 3.0, "doc": doc}] * 2},
+        "http://localhost:8080/books/": {"docs": [{"score": 2.0, "doc": doc}]},
+    }
+
+    def post(url, headers, data):
+        return Mock(status_code=200, json=Mock(return_value=responses[url]))
+
+    mock_post.side_effect = post
+    query = TermQuery(term="test", field_name="test_field")
+
+    results = toshi_client.federated_search(query, [Lyrics, (Books, 2.0)], k=2)
+
+    assert results.hits == 3
+    assert [r["score"] for r in results] == [4.0, 3.0]
+    assert isinstance(results[0]["doc"], Books)
+    assert isinstance(results[1]["doc"], Lyrics)
+    assert len(toshi_client.federated_search(query, [Lyrics, Books], k=0)) == 0
+    with pytest.raises(ValueError):
+        toshi_client.federated_search(query, [Lyrics], k=-1)
+
+
+def test_mget_searches_pushed_out_keys_again(toshi_client, lyric_documents):
+    # Key 2 is shared by two documents, like Toshi the fake reports returned hits
+    stored = [lyric_documents[0], *lyric_documents]
+
+    def search(query, document_type):
+        body = query.to_json()
+        keys = {c["term"]["idx"] for c in body["query"]["bool"]["should"]}
+        return [d for d in stored if d.idx in keys][: body["limit"]]
+
+    with patch.object(toshi_client, "search", side_effect=search) as mock_search:
+        found = toshi_client.mget(Lyrics, "idx", [3, 2, 7], batch_size=2)
+
+    assert found == {3: lyric_documents[2], 2: lyric_documents[0]}
+    retry = mock_search.call_args_list[-1].args[0].to_json()
+    assert retry["query"]["bool"]["should"] == [{"term": {"idx": 3}}]
+    assert retry["limit"] == 1
+
+
+@pytest.mark.parametrize(
+    "keys, fetches",
+    [(range(1000), 15), (range(0, 10**6, 1000), 15)],
+    ids=["dense", "sparse"],
+)
+def test_iter_search_sizes_windows_by_density(toshi_client, keys, fetches):
+    def search(query, document_type):
+        bounds = query.to_json()["query"]["bool"]["must"][1]["range"]["idx"]
+        hits = [k for k in keys if bounds["gte"] <= k < bounds["lt"]]
+        return hits[: query.to_json()["limit"]]
+
+    with patch.object(toshi_client, "search", side_effect=search) as mock_search:
+        query = TermQuery(term="the", field_name="lyrics")
+        docs = list(
+            toshi_client.iter_search(
+                query, Mock(spec=Document), "idx", 0, 10**6, page_size=100
+            )
+        )
+
+    assert docs == list(keys)
+    # Neither overflowing windows nor a long run of empty ones are fetched
+    assert mock_search.call_count <= fetches
+
+
+@pytest.mark.parametrize(
+    "merge_ranges, ranges", [(False, 2), (True, 1)], ids=["kept", "merged"]
+)
+@patch("requests.post")
+def test_search_merges_ranges_if_asked_to(mock_post, merge_ranges, ranges):
+    toshi_client = ToshiClient(
+        "http://localhost:8080", optimize_queries=True, merge_ranges=merge_ranges
+    )
+    mock_post.return_value.json.return_value = {"hits": 0, "docs": []}
+    document_type = Mock(spec=Document)
+    document_type.index_name.return_value = "test_index"
+    query = (
+        BoolQuery()
+        .must_match(RangeQuery(field_name="year", gte=1990))
+        .must_match(RangeQuery(field_name="year", lte=2000))
+    )
+
+    toshi_client.search(query, document_type)
+
+    must = json.loads(mock_post.call_args.kwargs["data"])["query"]["bool"]["must"]
+    assert len(must) == ranges
+
+
+@patch("requests.post")
+def test_search_contradiction_skips_request(mock_post):
+    toshi_client = ToshiClient("http://localhost:8080", optimize_queries=True)
+    term_query = TermQuery(term="rock", field_name="genre")
+    query = BoolQuery().must_match(term_query).must_not_match(term_query)
+    document_type = Mock(spec=Document)
+    document_type.index_name.return_value = "test_index"
+
+    assert toshi_client.search(query, document_type) == []
+    mock_post.assert_not_called()
+
+
+@patch("requests.get")
+@patch("requests.delete")
+def test_delete_terms(mock_delete, mock_get, toshi_client):
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"docs_affected": 2}
+    mock_delete.return_value = mock_response
+    mock_get.return_value = mock_response
+
+    result = toshi_client.delete_terms(
+        [("id", "1"), ("id", "2"), ("id", "1"), ("genre", "rock")],
+        "test_index",
+        commit=True,
+    )
+
+    assert mock_delete.call_count == 2
+    assert [g.terms for g in result.groups] == [
+        {"id": "1", "genre": "rock"},
+        {"id": "2"},
+    ]
+    assert result.docs_affected == 4
+    mock_get.assert_called_once_with("http://localhost:8080/test_index/_flush/")
+
+
+@patch("requests.post")
+def test_search_validates_query(mock_post, lyrics_index):
+    toshi_client = ToshiClient("http://localhost:8080", validate_queries=True)
+    toshi_client._catalog = Mock()
+    toshi_client._catalog.get_index.return_value = lyrics_index
+    document_type = Mock(spec=Document)
+    document_type.index_name.return_value = "lyrics"
+
+    with pytest.raises(ToshiQueryError):
+        toshi_client.search(TermQuery(term="x", field_name="unknown"), document_type)
+    mock_post.assert_not_called()
+
+
+@patch("requests.post")
+def test_search_records_metrics(mock_post):
+    metrics = ClientMetrics()
+    toshi_client = ToshiClient("http://localhost:8080", metrics=metrics)
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.content = b'{"hits": 0, "docs": []}'
+    mock_response.json.return_value = {"hits": 0, "docs": []}
+    mock_post.return_value = mock_response
+    document_type = Mock(spec=Document)
+    document_type.index_name.return_value = "lyrics"
+
+    toshi_client.search(TermQuery(term="x", field_name="song"), document_type)
+
+    exported = metrics.export()
+    labels = 'operation="search",index="lyrics"'
+    assert f"toshi_client_request_duration_seconds_count{{{labels}}} 1" in exported
+    assert f"toshi_client_response_bytes_total{{{labels}}} 23" in exported
+
+
+@patch("requests.post")
+def test_search_reports_phase_timings(mock_post):
+    reported = []
+    toshi_client = ToshiClient(
+        "http://localhost:8080", profiler=PhaseProfiler(hook=reported.append)
+    )
+    mock_response = Mock()
+    mock_response.json.return_value = {"hits": 0, "docs": []}
+    mock_post.return_value = mock_response
+    document_type = Mock(spec=Document)
+    document_type.index_name.return_value = "lyrics"
+
+    result = toshi_client.search(TermQuery(term="x", field_name="song"), document_type)
+
+    assert reported == [result.timings]
+    assert result.timings.operation == "search"
+    assert result.timings.index_name == "lyrics"
+    assert set(result.timings.phases) == {
+        "serialize",
+        "network",
+        "decode",
+        "materialize",
+    }
+
+
+@patch("requests.post")
+def test_msearch_emits_child_spans(mock_post):
+    exporter = RingBufferExporter()
+    toshi_client = ToshiClient("http://localhost:8080", tracer=Tracer(exporter))
+    mock_response = Mock()
+    mock_response.status_code = 200
+    mock_response.content = b"{}"
+    mock_response.json.return_value = {"hits": 1, "docs": [{"doc": {}}]}
+    mock_post.return_value = mock_response
+    document_type = Mock(spec=Document)
+    document_type.index_name.return_value = "lyrics"
+    query = TermQuery(term="x", field_name="song")
+
+    toshi_client.msearch([(query, document_type), (query, document_type)])
+
+    (msearch,) = exporter.spans("toshi.msearch")
+    searches = exporter.children(msearch)
+    assert [s.name for s in searches] == ["toshi.search", "toshi.search"]
+    for search in searches:
+        assert search.attributes["toshi.index"] == "lyrics"
+        assert search.attributes["toshi.query_type"] == "TermQuery"
+        assert search.attributes["toshi.docs_count"] == 1
+        (http,) = exporter.children(search)
+        assert http.attributes["http.response.status_code"] == 200
+
+
+@patch("requests.post")
+def test_search_records_slow_queries(mock_post, toshi_client):
+    toshi_client._slow_query_log = SlowQueryLog()
+    mock_response = Mock()
+    mock_response.json.return_value = {"hits": 0, "docs": []}
+    mock_post.return_value = mock_response
+    document_type = Mock(spec=Document)
+    document_type.index_name.return_value = "lyrics"
+
+    for term in ["a", "b"]:
+        toshi_client.search(TermQuery(term=term, field_name="song"), document_type)
+
+    (stats,) = toshi_client._slow_query_log.top()
+    assert stats.index_name == "lyrics"
+    assert stats.count == 2
@@ -0,0 +1,62 @@
+import pytest
+
+from toshi_client.timing import PhaseProfiler, profiled, timed_phase
+
+
+class Client:
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    @profiled("outer")
+    def outer(self):
+        with timed_phase("serialize"):
+            pass
+        return self.inner()
+
+    @profiled("inner")
+    def inner(self):
+        with timed_phase("network"):
+            pass
+
+    @profiled("async")
+    async def run_async(self):
+        with timed_phase("decode"):
+            pass
+
+
+def test_nested_calls_add_to_the_outer_timings():
+    reported = []
+    client = Client(PhaseProfiler(hook=reported.append))
+
+    client.outer()
+
+    assert [t.operation for t in reported] == ["outer"]
+    assert set(reported[0].phases) == {"serialize", "network"}
+    assert reported[0].total >= sum(reported[0].phases.values())
+
+
+@pytest.mark.asyncio
+async def test_profiled_coroutine():
+    reported = []
+    client = Client(PhaseProfiler(hook=reported.append))
+
+    await client.run_async()
+
+    assert set(reported[0].phases) == {"decode"}
+
+
+def test_unsampled_calls_are_not_timed():
+    reported = []
+    client = Client(PhaseProfiler(sample_rate=0.0, hook=reported.append))
+
+    client.outer()
+    Client(None).outer()
+    with timed_phase("serialize"):
+        pass
+
+    assert reported == []
+
+
+def test_sample_rate_is_checked():
+    with pytest.raises(ValueError):
+        PhaseProfiler(sample_rate=2.0)
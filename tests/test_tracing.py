@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from toshi_client.tracing import RingBufferExporter, Tracer, in_current_context
+
+
+def test_spans_are_nested():
+    exporter = RingBufferExporter()
+    tracer = Tracer(exporter)
+
+    with tracer.start_as_current_span("parent", attributes={"a": 1}) as parent:
+        with tracer.start_as_current_span("child") as child:
+            child.set_attribute("b", 2)
+
+    assert exporter.spans() == [child, parent]
+    assert exporter.children(parent) == [child]
+    assert child.trace_id == parent.trace_id
+    assert parent.parent_id is None
+    assert parent.attributes == {"a": 1}
+    assert parent.duration >= child.duration
+
+
+def test_exceptions_are_recorded():
+    exporter = RingBufferExporter()
+    tracer = Tracer(exporter)
+
+    with pytest.raises(ValueError):
+        with tracer.start_as_current_span("failing"):
+            raise ValueError("x")
+
+    assert isinstance(exporter.spans("failing")[0].exceptions[0], ValueError)
+
+
+def test_ring_buffer_keeps_the_latest_spans():
+    exporter = RingBufferExporter(max_spans=2)
+    tracer = Tracer(exporter)
+
+    for name in ["a", "b", "c"]:
+        with tracer.start_as_current_span(name):
+            pass
+
+    assert [s.name for s in exporter.spans()] == ["b", "c"]
+
+
+def test_in_current_context_propagates_to_threads():
+    exporter = RingBufferExporter()
+    tracer = Tracer(exporter)
+
+    def work():
+        with tracer.start_as_current_span("work"):
+            pass
+
+    with tracer.start_as_current_span("parent") as parent:
+        thread = threading.Thread(target=in_current_context(work))
+        thread.start()
+        thread.join()
+
+    assert [s.name for s in exporter.children(parent)] == ["work"]
@@ -0,0 +1,132 @@
+import time
+from unittest.mock import patch
+
+import aiohttp
+import pytest
+
+from benchmarks.stand_in_server import StandInServer
+from tests.conftest import Lyrics
+from toshi_client.client import AsyncToshiClient, ToshiClient
+from toshi_client.errors import ToshiClientError
+from toshi_client.query.term_query import TermQuery
+from toshi_client.transport import (
+    AsyncRecordingTransport,
+    AsyncReplayTransport,
+    RecordedExchange,
+    RecordingTransport,
+    ReplayTransport,
+    load_exchanges,
+)
+
+
+@pytest.fixture
+def recorded(tmp_path, lyrics_index, lyric_documents):
+    """Records a session against the engine and saves it."""
+    path = str(tmp_path / "session.ndjson")
+    transport = RecordingTransport()
+    with StandInServer(engine=True) as server:
+        client = ToshiClient(server.url, transport=transport)
+        client.create_index(lyrics_index)
+        client.bulk_insert_documents(lyric_documents, commit=True)
+        client.search(TermQuery("creep", "lyrics"), Lyrics)
+        client.search(TermQuery("gold", "lyrics"), Lyrics)
+    transport.save(path)
+    return path
+
+
+def test_recording_captures_requests_and_responses(recorded):
+    exchanges = load_exchanges(recorded)
+
+    assert [(e.method, e.status) for e in exchanges] == [
+        ("put", 201),
+        ("post", 201),
+        ("get", 200),
+        ("post", 200),
+        ("post", 200),
+    ]
+    assert exchanges[3].body == '{"query": {"term": {"lyrics": "creep"}}}'
+    assert '"Creep"' in exchanges[3].response
+    assert all(e.elapsed > 0 for e in exchanges)
+
+
+def test_replay_serves_recorded_responses_without_a_server(recorded):
+    client = ToshiClient("http://elsewhere:1234", transport=ReplayTransport(recorded))
+
+    assert [d.song for d in client.search(TermQuery("gold", "lyrics"), Lyrics)] == [
+        "Gold on the Ceiling"
+    ]
+    assert [d.song for d in client.search(TermQuery("creep", "lyrics"), Lyrics)] == [
+        "Creep"
+    ]
+    # Responses repeat once a request was replayed as often as recorded
+    assert len(client.search(TermQuery("gold", "lyrics"), Lyrics)) == 1
+
+
+def test_replay_rejects_unrecorded_requests(recorded):
+    client = ToshiClient("http://test.com", transport=ReplayTransport(recorded))
+
+    with pytest.raises(ToshiClientError, match="No recorded response"):
+        client.search(TermQuery("unknown", "lyrics"), Lyrics)
+
+
+def exchange(elapsed: float) -> RecordedExchange:
+    return RecordedExchange(
+        method="post",
+        url="http://test.com/lyrics/",
+        body='{"query": {"term": {"lyrics": "gold"}}}',
+        status=200,
+        response='{"hits": 0, "docs": [], "facets": []}',
+        elapsed=elapsed,
+    )
+
+
+def test_replay_simulates_latency():
+    transport = ReplayTransport([exchange(0.05)], simulate_latency=True)
+    client = ToshiClient("http://test.com", transport=transport)
+
+    started = time.perf_counter()
+    result = client.search(TermQuery("gold", "lyrics"), Lyrics)
+
+    assert time.perf_counter() - started >= 0.05
+    assert result.hits == 0
+
+
+@pytest.mark.asyncio
+async def test_async_record_and_replay(recorded, tmp_path):
+    transport = AsyncRecordingTransport(AsyncReplayTransport(recorded))
+    client = AsyncToshiClient("http://test.com", transport=transport)
+
+    result = await client.search(TermQuery("creep", "lyrics"), Lyrics)
+
+    assert [d.song for d in result] == ["Creep"]
+    assert transport.exchanges[0].status == 200
+    assert transport.exchanges[0].body == '{"query": {"term": {"lyrics": "creep"}}}'
+
+    transport.save(str(tmp_path / "replayed.ndjson"))
+    replay = AsyncReplayTransport(str(tmp_path / "replayed.ndjson"))
+    client = AsyncToshiClient("http://test.com", transport=replay)
+    assert len(await client.search(TermQuery("creep", "lyrics"), Lyrics)) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_replay_simulates_latency():
+    transport = AsyncReplayTransport([exchange(0.05)], simulate_latency=True)
+    client = AsyncToshiClient("http://test.com", transport=transport)
+
+    started = time.perf_counter()
+    await client.search(TermQuery("gold", "lyrics"), Lyrics)
+
+    assert time.perf_counter() - started >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_async_replay_opens_no_session(recorded):
+    transport = AsyncRecordingTransport(AsyncReplayTransport(recorded))
+    client = AsyncToshiClient("http://test.com", transport=transport)
+
+    with patch.object(aiohttp, "ClientSession") as session:
+        await client.search(TermQuery("creep", "lyrics"), Lyrics)
+        await client.msearch([(TermQuery("gold", "lyrics"), Lyrics)])
+
+    session.assert_not_called()
+    assert len(transport.exchanges) == 2